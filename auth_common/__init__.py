@@ -0,0 +1,6 @@
+"""
+Briques communes aux APIs d'authentification (Flask et FastAPI)
+
+Les APIs restent des scripts autonomes: chacune ajoute la racine du dépôt
+au sys.path pour pouvoir importer ce package.
+"""
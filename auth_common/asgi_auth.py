@@ -0,0 +1,151 @@
+"""
+Middleware ASGI d'authentification (alternative aux dépendances Depends/Security)
+
+Avec les dépendances FastAPI, chaque requête d'une route protégée résout un
+graphe de dépendances: classe de sécurité (HTTPBearer, OAuth2PasswordBearer,
+HTTPBasic) qui relit l'en-tête Authorization à travers l'objet Request, puis
+vérificateur, puis route. Ce middleware ASGI brut fait le même travail avant
+le routage:
+
+- les règles (chemin -> schéma et exigence) sont compilées au démarrage, avec
+  la réponse "Not authenticated" de chaque schéma déjà encodée
+- l'en-tête Authorization est lu une fois dans les en-têtes bruts du scope
+- les credentials passent par le vérificateur de l'application (le même que
+  celui des dépendances), qui renvoie un principal ou lève une exception
+- le principal est placé dans scope["state"] (request.state.principal pour
+  la route); une requête refusée n'atteint ni le routeur ni la route
+- les chemins sans règle (routes publiques, WebSocket) passent sans coût
+
+Vérificateurs (un par schéma):
+    async def verify(credential, requirement, scope) -> principal
+    credential: token (bearer) ou (username, password) (basic)
+    requirement: exigence de la règle (ex: scopes), None par défaut
+    scope: scope ASGI de la requête (ex: scope["client"] pour la détection
+    du credential stuffing)
+
+Refus:
+- credentials absents ou mal formés: 401 {"detail": "Not authenticated"} et
+  WWW-Authenticate, comme les classes de sécurité de FastAPI
+- exceptions `rejections` levées par le vérificateur (ex: HTTPException):
+  réponse JSON {"detail": ...} avec leur status_code et leurs headers
+- autres exceptions de `handlers` (ex: KDFOverloaded): réponse ASGI construite
+  par le handler (les exception handlers de l'application ne s'appliquent pas
+  avant le routage)
+
+Usage (FastAPI):
+    app.add_middleware(
+        AuthMiddleware,
+        rules={"/secured": AuthRule("bearer", ["resource"])},
+        verifiers={"bearer": verify_bearer},
+        rejections=(HTTPException,),
+    )
+"""
+
+import json
+from collections import namedtuple
+
+from auth_common.ws_auth import decode_basic
+
+# Schéma d'authentification d'une route ("basic" ou "bearer") et exigence
+# transmise au vérificateur (ex: scopes)
+AuthRule = namedtuple("AuthRule", "scheme requirement", defaults=(None,))
+
+# schéma -> valeur de l'en-tête WWW-Authenticate
+SCHEMES = {"basic": "Basic", "bearer": "Bearer"}
+
+
+def _credential(headers, scheme: str):
+    """Credentials d'un schéma dans les en-têtes bruts d'un scope (None si absents)"""
+    for name, value in headers:
+        if name == b"authorization":
+            request_scheme, _, param = value.decode("latin-1").partition(" ")
+            if request_scheme.lower() != scheme or not param:
+                return None
+            return param if scheme == "bearer" else decode_basic(param)
+    return None
+
+
+def _json_response(status: int, detail, headers=None) -> tuple:
+    """Message de début de réponse et corps JSON {"detail": ...}, encodés"""
+    body = json.dumps({"detail": detail}, ensure_ascii=False, separators=(",", ":")).encode()
+    raw_headers = [(b"content-length", str(len(body)).encode()), (b"content-type", b"application/json")]
+    raw_headers.extend((name.lower().encode("latin-1"), value.encode("latin-1"))
+                       for name, value in (headers or {}).items())
+    return {"type": "http.response.start", "status": status, "headers": raw_headers}, body
+
+
+class AuthMiddleware:
+    """
+    Authentifie les requêtes HTTP avant le routage
+
+    Args:
+        app: Application ASGI protégée
+        rules: Chemin -> AuthRule (les chemins absents sont publics)
+        verifiers: Schéma -> coroutine (credential, requirement, scope) -> principal
+        rejections: Types d'exceptions de refus (attributs status_code, detail, headers)
+        handlers: Type d'exception -> fonction (scope, exc) -> réponse ASGI
+        response_headers: Fonction principal -> en-têtes [(nom, valeur)] à
+                          ajouter à la réponse (ou None), optionnelle
+
+    Raises:
+        ValueError: Si une règle utilise un schéma inconnu ou sans vérificateur
+    """
+
+    def __init__(self, app, rules: dict, verifiers: dict, rejections=(), handlers=None,
+                 response_headers=None):
+        self.app = app
+        self.rejections = tuple(rejections)
+        self.handlers = handlers or {}
+        self.response_headers = response_headers
+        # Compilation des règles: vérificateur et réponse "Not authenticated"
+        # du schéma résolus une fois
+        not_authenticated = {
+            scheme: _json_response(401, "Not authenticated", {"WWW-Authenticate": challenge})
+            for scheme, challenge in SCHEMES.items()
+        }
+        self._rules = {}
+        for path, rule in rules.items():
+            if rule.scheme not in SCHEMES:
+                raise ValueError(f"{path}: schéma {rule.scheme!r} inconnu ({', '.join(SCHEMES)})")
+            if rule.scheme not in verifiers:
+                raise ValueError(f"{path}: pas de vérificateur pour le schéma {rule.scheme!r}")
+            self._rules[path] = (rule.scheme, verifiers[rule.scheme], rule.requirement,
+                                 not_authenticated[rule.scheme])
+
+    async def __call__(self, scope, receive, send):
+        rule = self._rules.get(scope["path"]) if scope["type"] == "http" else None
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        scheme, verify, requirement, not_authenticated = rule
+        credential = _credential(scope["headers"], scheme)
+        if credential is None:
+            return await self._send(send, *not_authenticated)
+        try:
+            principal = await verify(credential, requirement, scope)
+        except self.rejections as exc:
+            return await self._send(send, *_json_response(exc.status_code, exc.detail, exc.headers))
+        except Exception as exc:
+            handler = next((self.handlers[cls] for cls in type(exc).__mro__ if cls in self.handlers), None)
+            if handler is None:
+                raise
+            return await handler(scope, exc)(scope, receive, send)
+
+        scope.setdefault("state", {})["principal"] = principal
+        headers = self.response_headers(principal) if self.response_headers is not None else None
+        if not headers:
+            return await self.app(scope, receive, send)
+
+        extra = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *extra]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    async def _send(send, start: dict, body: bytes):
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,206 @@
+"""
+Liste de mots de passe compromis, hors ligne et projetée en mémoire (mmap)
+
+Refuser à l'inscription un mot de passe déjà publié dans une fuite de données
+sans appeler d'API distante: la liste (SHA-1 des mots de passe, plusieurs
+centaines de millions d'entrées) est un fichier binaire trié, converti une
+fois par build_breached_passwords.py, puis projeté en mémoire par chaque
+worker. Aucun chargement: l'ouverture ne lit que l'en-tête, et un lookup ne
+touche que les quelques pages visitées par la recherche (mémoire résidente
+quasi nulle, pages partagées par les workers via le page cache).
+
+Format (entiers little-endian):
+    en-tête    magic, version, taille d'un digest, nombre d'entrées,
+               position des entrées
+    entrées    digests SHA-1 (éventuellement tronqués à `digest_size` octets),
+               triés et uniques, de taille fixe
+
+Recherche par interpolation: les SHA-1 sont uniformément répartis, la
+position d'un digest est estimée à partir de sa valeur (quelques sondes
+pour un milliard d'entrées, au lieu d'une trentaine en recherche
+dichotomique: 4 à 5 sondes mesurées pour un million d'entrées). Après
+INTERPOLATION_PROBES sondes sans résultat (liste mal répartie), la recherche
+continue par dichotomie: le pire cas reste logarithmique.
+
+Troncature: avec des digests de `digest_size` octets et n entrées, un mot
+de passe absent de la liste est refusé à tort avec une probabilité d'environ
+n / 2^(8 x digest_size) (5e-11 pour 8 octets et un milliard d'entrées).
+
+Usage:
+    write_breached("pwned.bin", sorted_sha1_digests, digest_size=8)
+    breached = BreachedPasswords("pwned.bin")
+    breached.is_breached("password123")    # True
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+
+MAGIC = b"BREACHPW"
+VERSION = 1
+
+# magic, version, taille d'un digest, entrées, position des entrées
+HEADER = struct.Struct("<8sIIQQ")
+SHA1_SIZE = 20
+MIN_DIGEST_SIZE = 4
+# Octets de poids fort d'un digest utilisés pour l'interpolation
+_PREFIX = 8
+# Sondes par interpolation avant de passer à la dichotomie
+INTERPOLATION_PROBES = 8
+
+
+def password_digest(password: str) -> bytes:
+    """SHA-1 d'un mot de passe (UTF-8), format des listes publiées"""
+    return hashlib.sha1(password.encode("utf-8")).digest()
+
+
+def write_breached(path: str, digests, digest_size: int = SHA1_SIZE) -> int:
+    """
+    Écrit une liste en flux (fichier temporaire puis renommage atomique)
+
+    Rien n'est gardé en mémoire: les digests doivent arriver triés (ordre
+    des listes publiées "ordered by hash"). Les doublons créés par la
+    troncature sont écrits une seule fois.
+
+    Args:
+        path: Fichier de destination
+        digests: Itérable de digests SHA-1 (bytes) en ordre croissant
+        digest_size: Octets gardés par digest (4 à 20)
+
+    Returns:
+        int: Nombre d'entrées écrites
+
+    Raises:
+        ValueError: Si digest_size sort de [4, 20] ou si les digests ne sont
+                    pas triés
+    """
+    if not MIN_DIGEST_SIZE <= digest_size <= SHA1_SIZE:
+        raise ValueError(f"digest_size doit être entre {MIN_DIGEST_SIZE} et {SHA1_SIZE}")
+    count = 0
+    previous = b""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, VERSION, digest_size, 0, HEADER.size))
+        for digest in digests:
+            entry = digest[:digest_size]
+            if entry <= previous:
+                if entry == previous:
+                    continue
+                raise ValueError(f"digests non triés ({digest.hex()} après {previous.hex()})")
+            output.write(entry)
+            previous = entry
+            count += 1
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, VERSION, digest_size, count, HEADER.size))
+    os.replace(tmp_path, path)
+    return count
+
+
+class BreachedPasswords:
+    """
+    Liste de mots de passe compromis lue dans un fichier projeté en mémoire
+
+    Args:
+        path: Fichier écrit par write_breached
+
+    Raises:
+        ValueError: Si le fichier n'est pas une liste de ce format
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as source:
+            self._mm = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.digest_size, self._count, self._offset = HEADER.unpack_from(self._mm, 0)
+        if (magic != MAGIC or version != VERSION
+                or len(self._mm) != self._offset + self._count * self.digest_size):
+            self._mm.close()
+            raise ValueError(f"{path}: liste de mots de passe compromis invalide")
+        # Accès aléatoires: pas de lecture anticipée des pages voisines
+        if hasattr(mmap, "MADV_RANDOM"):
+            self._mm.madvise(mmap.MADV_RANDOM)
+
+        self._prefix = min(_PREFIX, self.digest_size)
+        self.checks = 0
+        self.hits = 0
+
+    def _find(self, entry: bytes) -> bool:
+        mm = self._mm
+        size = self.digest_size
+        base = self._offset
+        prefix = self._prefix
+        target = int.from_bytes(entry[:prefix], "big")
+        # Les entrées de [low, high) ont un préfixe dans [low_value, high_value)
+        low, high = 0, self._count
+        low_value, high_value = 0, 1 << (8 * prefix)
+        probes = 0
+        while low < high:
+            if not low_value <= target < high_value:
+                return False
+            if probes < INTERPOLATION_PROBES:
+                probe = low + (target - low_value) * (high - low) // (high_value - low_value)
+            else:
+                probe = (low + high) // 2
+            probes += 1
+            start = base + probe * size
+            candidate = mm[start:start + size]
+            if candidate == entry:
+                return True
+            if candidate < entry:
+                low = probe + 1
+                low_value = int.from_bytes(candidate[:prefix], "big")
+            else:
+                high = probe
+                high_value = int.from_bytes(candidate[:prefix], "big") + 1
+        return False
+
+    def contains_digest(self, digest: bytes) -> bool:
+        """
+        Cherche un SHA-1 dans la liste
+
+        Args:
+            digest: SHA-1 complet (20 octets), tronqué à la taille de la liste
+
+        Returns:
+            bool: True si le digest est dans la liste
+        """
+        return self._find(digest[:self.digest_size])
+
+    def is_breached(self, password: str) -> bool:
+        """
+        Indique si un mot de passe figure dans la liste
+
+        Args:
+            password: Mot de passe en clair
+
+        Returns:
+            bool: True si son SHA-1 est dans la liste
+        """
+        self.checks += 1
+        found = self._find(password_digest(password)[:self.digest_size])
+        if found:
+            self.hits += 1
+        return found
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """Libère la projection (les lookups suivants échouent)"""
+        self._mm.close()
+
+    def snapshot(self) -> dict:
+        """
+        Exporte la taille de la liste et les compteurs
+
+        Returns:
+            dict: Entrées, taille d'un digest, mots de passe vérifiés et refusés
+        """
+        return {
+            "entries": self._count,
+            "digest_size": self.digest_size,
+            "checks": self.checks,
+            "hits": self.hits,
+        }
@@ -0,0 +1,359 @@
+"""
+Table d'utilisateurs compacte pour les grands annuaires en mémoire
+
+Un dict de dicts coûte environ 1 Ko par utilisateur (dict par utilisateur,
+clés répétées, une chaîne Python par valeur), avant même le hash. Ici les
+utilisateurs sont rangés en colonnes:
+- un seul bytearray contient, pour chaque utilisateur, son username, le sel
+  et la valeur de son hash en binaire (et non en texte modular crypt), puis
+  ses champs texte (name, email...) séparés par un octet nul
+- les paramètres des hashes ("$pbkdf2-sha256$29000$") sont internés: un
+  octet par utilisateur
+- les champs à faible cardinalité (rôles, ressource, scopes) sont internés:
+  un entier par utilisateur dans un array
+- l'index username -> ligne est une table de hachage à adressage ouvert
+  dans un array d'entiers, sans objet Python par utilisateur
+- l'ordre des usernames (GET /users, iter_usernames) est un array de lignes
+  triées, construit au premier parcours ordonné puis tenu à jour par les
+  écritures (recherche dichotomique)
+
+La table se comporte comme le dict d'origine (users.get(username) renvoie un
+dict au format de l'API, hash texte compris): les APIs l'utilisent sans
+autre changement. Les valeurs internées sont renvoyées en tuples (partagés).
+
+Usage:
+    users = CompactUserTable("hashed_password", text_fields=("username", "name", "email"),
+                             interned_fields=("resource", "scopes"))
+    users.update(users_db)
+    users.get("daniel")["hashed_password"]   # "$pbkdf2-sha256$29000$..."
+"""
+
+import base64
+import binascii
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableMapping
+
+# Codecs de la partie binaire du hash
+CODEC_TEXT = 0     # format inconnu: hash conservé en texte UTF-8
+CODEC_AB64 = 1     # passlib: sel et valeur en base64 "adaptée"
+CODEC_HEX = 2      # werkzeug: sel texte, valeur hexadécimale
+
+_EMPTY = 0
+_DELETED = -1
+
+MIN_INDEX_SIZE = 8
+
+
+def _ab64_encode(data: bytes) -> str:
+    return binascii.b2a_base64(data, newline=False).rstrip(b"=").replace(b"+", b".").decode("ascii")
+
+
+def _ab64_decode(value: str) -> bytes:
+    value = value.replace(".", "+")
+    return base64.b64decode(value + "=" * (-len(value) % 4))
+
+
+def encode_hash(hashed: str):
+    """
+    Découpe un hash texte en (paramètres, codec, sel, valeur)
+
+    Le découpage n'est retenu que si le hash se reconstruit à l'identique;
+    sinon le hash est conservé tel quel (CODEC_TEXT).
+
+    Args:
+        hashed: Hash modular crypt (passlib pbkdf2_sha256, werkzeug pbkdf2/scrypt...)
+
+    Returns:
+        tuple: (paramètres, codec, sel en bytes, valeur en bytes)
+    """
+    try:
+        if hashed.startswith("$pbkdf2-sha256$"):
+            _, _, rounds, salt, checksum = hashed.split("$")
+            parts = (f"$pbkdf2-sha256${rounds}$", CODEC_AB64, _ab64_decode(salt), _ab64_decode(checksum))
+        elif hashed.startswith(("pbkdf2:", "scrypt:")):
+            method, salt, checksum = hashed.split("$")
+            parts = (f"{method}$", CODEC_HEX, salt.encode("ascii"), bytes.fromhex(checksum))
+        else:
+            parts = None
+        if parts is not None and decode_hash(*parts) == hashed:
+            return parts
+    except ValueError:
+        pass
+    return "", CODEC_TEXT, b"", hashed.encode("utf-8")
+
+
+def decode_hash(setting: str, codec: int, salt: bytes, checksum: bytes) -> str:
+    """Reconstruit le hash texte à partir de sa forme binaire (inverse de encode_hash)"""
+    if codec == CODEC_AB64:
+        return f"{setting}{_ab64_encode(salt)}${_ab64_encode(checksum)}"
+    if codec == CODEC_HEX:
+        return f"{setting}{salt.decode('ascii')}${checksum.hex()}"
+    return checksum.decode("utf-8")
+
+
+class InternTable:
+    """Valeurs distinctes d'un champ; l'identifiant 0 signifie "absent" (partagé avec user_snapshot)"""
+
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values = [None]
+        self.ids = {}
+
+    def intern(self, value) -> int:
+        if value is None:
+            return 0
+        if isinstance(value, list):
+            value = tuple(value)
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.values.append(value)
+            self.ids[value] = value_id
+        return value_id
+
+
+class CompactUserTable(MutableMapping):
+    """
+    Utilisateurs rangés en colonnes, indexés par username
+
+    Args:
+        hash_field: Champ qui porte le hash ("password" pour Flask Basic,
+                    "hashed_password" ailleurs)
+        text_fields: Champs texte propres à chaque utilisateur (name, email...).
+                     "username" est reconstitué à partir de la clé.
+        interned_fields: Champs à faible cardinalité (rôles, ressource, scopes)
+
+    Les champs non déclarés ne sont pas conservés. Une chaîne vide est
+    restituée comme un champ absent.
+    """
+
+    def __init__(self, hash_field: str = "hashed_password", text_fields=(), interned_fields=()):
+        self.hash_field = hash_field
+        self.text_fields = tuple(field for field in text_fields if field != "username")
+        self.include_username = "username" in text_fields
+        self.interned_fields = tuple(interned_fields)
+
+        self._blob = bytearray()
+        self._offsets = array("Q", [0])       # début de chaque ligne (+ fin de la dernière)
+        self._username_sizes = array("H")
+        self._salt_sizes = array("B")
+        self._checksum_sizes = array("H")
+        self._settings = InternTable()
+        self._setting_ids = array("B")
+        self._codecs = {}                      # identifiant de paramètres -> codec
+        self._interned = {field: InternTable() for field in self.interned_fields}
+        self._columns = {field: array("I") for field in self.interned_fields}
+
+        self._index = array("q", bytes(8 * MIN_INDEX_SIZE))
+        self._count = 0
+        self._used_slots = 0                  # slots occupés ou supprimés
+        self._order = None                    # lignes triées par username (à la demande)
+        self._order_lock = threading.Lock()
+
+    # Index à adressage ouvert (sondage linéaire, taux de remplissage <= 2/3).
+    # Un slot contient la ligne + 1, 0 s'il est vide et -1 si l'utilisateur a
+    # été supprimé.
+
+    def _find_slot(self, key: bytes):
+        index = self._index
+        mask = len(index) - 1
+        slot = hash(key) & mask
+        free = None
+        while True:
+            row = index[slot]
+            if row == _EMPTY:
+                return (free if free is not None else slot), -1
+            if row == _DELETED:
+                if free is None:
+                    free = slot
+            elif self._username(row - 1) == key:
+                return slot, row - 1
+            slot = (slot + 1) & mask
+
+    def _username(self, row: int) -> bytes:
+        start = self._offsets[row]
+        return bytes(self._blob[start:start + self._username_sizes[row]])
+
+    def _resize(self, size: int):
+        # Le nouvel index est rempli à part puis publié en une affectation:
+        # un lecteur concurrent ne voit jamais un index vide ou partiel (un
+        # faux "inconnu" serait mis en cache négatif par UserCache)
+        rows = [row for row in self._index if row > 0]
+        index = array("q", bytes(8 * size))
+        mask = size - 1
+        for row in rows:
+            slot = hash(self._username(row - 1)) & mask
+            while index[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            index[slot] = row
+        self._index = index
+        self._used_slots = len(rows)
+
+    def __setitem__(self, username: str, user: dict):
+        key = username.encode("utf-8")
+        setting, codec, salt, checksum = encode_hash(user[self.hash_field])
+        setting_id = self._settings.intern(setting)
+        self._codecs[setting_id] = codec
+        text = b"\x00".join(
+            str(user.get(field) or "").encode("utf-8") for field in self.text_fields
+        )
+
+        row = len(self._username_sizes)
+        self._blob += key
+        self._blob += salt
+        self._blob += checksum
+        self._blob += text
+        self._offsets.append(len(self._blob))
+        self._username_sizes.append(len(key))
+        self._salt_sizes.append(len(salt))
+        self._checksum_sizes.append(len(checksum))
+        self._setting_ids.append(setting_id)
+        for field in self.interned_fields:
+            self._columns[field].append(self._interned[field].intern(user.get(field)))
+
+        # Le remplacement d'un utilisateur laisse l'ancienne ligne inutilisée
+        slot, previous = self._find_slot(key)
+        if previous < 0:
+            self._count += 1
+            if self._index[slot] == _EMPTY:
+                self._used_slots += 1
+        self._index[slot] = row + 1
+        if self._used_slots * 3 > len(self._index) * 2:
+            self._resize(len(self._index) * 2)
+        self._update_order(key, row)
+
+    def _row(self, username: str) -> int:
+        try:
+            key = username.encode("utf-8")
+        except AttributeError:
+            return -1
+        return self._find_slot(key)[1]
+
+    def _materialize(self, username: str, row: int) -> dict:
+        blob = self._blob
+        start = self._offsets[row] + self._username_sizes[row]
+        salt_end = start + self._salt_sizes[row]
+        checksum_end = salt_end + self._checksum_sizes[row]
+        setting_id = self._setting_ids[row]
+
+        user = {"username": username} if self.include_username else {}
+        user[self.hash_field] = decode_hash(
+            self._settings.values[setting_id], self._codecs[setting_id],
+            bytes(blob[start:salt_end]), bytes(blob[salt_end:checksum_end]),
+        )
+        if self.text_fields:
+            values = bytes(blob[checksum_end:self._offsets[row + 1]]).decode("utf-8").split("\x00")
+            for field, value in zip(self.text_fields, values):
+                if value:
+                    user[field] = value
+        for field in self.interned_fields:
+            value_id = self._columns[field][row]
+            if value_id:
+                user[field] = self._interned[field].values[value_id]
+        return user
+
+    def get(self, username, default=None):
+        row = self._row(username)
+        if row < 0:
+            return default
+        return self._materialize(username, row)
+
+    def __getitem__(self, username):
+        row = self._row(username)
+        if row < 0:
+            raise KeyError(username)
+        return self._materialize(username, row)
+
+    def __contains__(self, username):
+        return self._row(username) >= 0
+
+    def __delitem__(self, username):
+        slot, row = self._find_slot(username.encode("utf-8"))
+        if row < 0:
+            raise KeyError(username)
+        self._index[slot] = _DELETED
+        self._count -= 1
+        self._update_order(username.encode("utf-8"), None)
+
+    # Ordre des usernames: array de lignes triées par username. Une écriture
+    # le met à jour sous verrou (insertion, remplacement de la ligne ou
+    # suppression); si elle a déjà été vue par la construction, la ligne en
+    # place est simplement remplacée.
+
+    def _sorted_rows(self) -> array:
+        # Appelé sous _order_lock
+        if self._order is None:
+            rows = [row - 1 for row in self._index if row > 0]
+            rows.sort(key=self._username)
+            self._order = array("I", rows)
+        return self._order
+
+    def _update_order(self, key: bytes, row):
+        with self._order_lock:
+            order = self._order
+            if order is None:
+                return
+            position = bisect_left(order, key, key=self._username)
+            present = position < len(order) and self._username(order[position]) == key
+            if row is None:
+                if present:
+                    del order[position]
+            elif present:
+                order[position] = row
+            else:
+                order.insert(position, row)
+
+    def iter_usernames(self, after: str = "", batch: int = 500):
+        """
+        Parcourt les usernames par ordre croissant, à partir d'un username
+
+        Chaque lot est repris par recherche dichotomique après le dernier
+        username lu: les écritures concurrentes ne décalent pas le parcours.
+
+        Args:
+            after: Username exclu à partir duquel reprendre ("" pour commencer)
+            batch: Nombre de usernames lus par lot
+
+        Yields:
+            str: Usernames strictement après `after`
+        """
+        key = after.encode("utf-8")
+        while True:
+            with self._order_lock:
+                order = self._sorted_rows()
+                start = bisect_right(order, key, key=self._username)
+                keys = [self._username(row) for row in order[start:start + batch]]
+            if not keys:
+                return
+            for key in keys:
+                yield key.decode("utf-8")
+
+    def __iter__(self):
+        for row in self._index:
+            if row > 0:
+                yield self._username(row - 1).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def nbytes(self) -> int:
+        """
+        Mémoire occupée par la table (buffers et valeurs internées)
+
+        Returns:
+            int: Taille en octets
+        """
+        size = sys.getsizeof(self._blob) + sys.getsizeof(self._index)
+        if self._order is not None:
+            size += sys.getsizeof(self._order)
+        for column in (self._offsets, self._username_sizes, self._salt_sizes,
+                       self._checksum_sizes, self._setting_ids, *self._columns.values()):
+            size += sys.getsizeof(column)
+        for interned in (self._settings, *self._interned.values()):
+            size += sys.getsizeof(interned.values) + sys.getsizeof(interned.ids)
+            size += sum(sys.getsizeof(value) for value in interned.values)
+        return size
@@ -0,0 +1,189 @@
+"""
+Renforcement hors ligne des hashes existants (hash-of-hash, en oignon)
+
+Un hash ancien (pbkdf2 werkzeug, pbkdf2_sha256 passlib à 29000 tours) ne
+peut être recalculé avec des paramètres plus forts qu'au prochain login de
+l'utilisateur. Pour renforcer tous les hashes sans connaître les mots de
+passe, on enveloppe le hash existant dans une seconde couche KDF:
+
+    externe = PBKDF2-HMAC-SHA256(hash interne brut, sel neuf, tours cibles)
+
+Le hash interne (sa valeur brute) n'est plus stocké, seulement ses
+paramètres (algorithme, sel, coût). À la vérification, le hash interne est
+recalculé depuis le mot de passe, puis la couche externe.
+
+Format (les paramètres internes sont ceux du hash d'origine, sans sa valeur):
+    $wrapped$<tours>$<sel base64>$<hash base64>|<paramètres internes>
+    ex: $wrapped$600000$q1C...$Zt0...|$pbkdf2-sha256$29000$yVmLMaY05nwP4bw3Zqw15g
+
+Formats internes supportés:
+- passlib pbkdf2_sha256: $pbkdf2-sha256$<tours>$<sel>$<hash>
+- werkzeug pbkdf2:       pbkdf2:<digest>:<tours>$<sel>$<hash hexa>
+- werkzeug scrypt:       scrypt:<n>:<r>:<p>$<sel>$<hash hexa>
+Les coûts doivent être explicites: "pbkdf2:sha256$..." (coût par défaut de
+werkzeug, variable selon sa version) est refusé par wrap().
+
+Usage:
+    stored = wrap(user["hashed_password"])
+    verify("secret", stored, pwd_context.verify)   # fallback pour les hashes non enveloppés
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+
+PREFIX = "$wrapped$"
+
+# Coût cible de la couche externe (recommandation OWASP pour PBKDF2-HMAC-SHA256)
+DEFAULT_ROUNDS = 600000
+SALT_SIZE = 16
+
+
+def _ab64_decode(value: str) -> bytes:
+    # Base64 "adaptée" de passlib: "." à la place de "+", sans padding
+    value = value.replace(".", "+")
+    return base64.b64decode(value + "=" * (-len(value) % 4))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.b64decode(value + "=" * (-len(value) % 4))
+
+
+def split_inner(hashed: str):
+    """
+    Sépare un hash d'origine en (paramètres, valeur brute)
+
+    Args:
+        hashed: Hash passlib pbkdf2_sha256 ou werkzeug (pbkdf2, scrypt)
+
+    Returns:
+        tuple: (paramètres sans la valeur, valeur brute en bytes)
+
+    Raises:
+        ValueError: Si le format n'est pas supporté
+    """
+    if hashed.startswith("$pbkdf2-sha256$"):
+        setting, _, checksum = hashed.rpartition("$")
+        return setting, _ab64_decode(checksum)
+    if hashed.startswith(("pbkdf2:", "scrypt:")):
+        setting, _, checksum = hashed.rpartition("$")
+        _werkzeug_params(setting)
+        return setting, bytes.fromhex(checksum)
+    raise ValueError("Format de hash non supporté")
+
+
+def _werkzeug_params(setting: str):
+    # Werkzeug accepte "pbkdf2:sha256" ou "scrypt" sans coût (valeurs par
+    # défaut de sa version courante, qui ont changé d'une version à l'autre):
+    # on exige des paramètres explicites pour ne jamais deviner le coût
+    method, _, salt = setting.partition("$")
+    params = method.split(":")
+    if params[0] == "pbkdf2" and len(params) == 3:
+        return params[0], (params[1], int(params[2])), salt
+    if params[0] == "scrypt" and len(params) == 4:
+        return params[0], tuple(int(value) for value in params[1:]), salt
+    raise ValueError("Format de hash non supporté")
+
+
+def inner_digest(setting: str, password: str) -> bytes:
+    """
+    Recalcule la valeur brute du hash interne à partir du mot de passe
+
+    Args:
+        setting: Paramètres du hash interne (sans sa valeur)
+        password: Mot de passe en clair
+
+    Returns:
+        bytes: Valeur brute du hash interne
+
+    Raises:
+        ValueError: Si le format n'est pas supporté
+    """
+    secret = password.encode("utf-8")
+    if setting.startswith("$pbkdf2-sha256$"):
+        _, _, rounds, salt = setting.split("$")
+        return hashlib.pbkdf2_hmac("sha256", secret, _ab64_decode(salt), int(rounds))
+    method, params, salt = _werkzeug_params(setting)
+    if method == "pbkdf2":
+        digest, rounds = params
+        return hashlib.pbkdf2_hmac(digest, secret, salt.encode("utf-8"), rounds)
+    n, r, p = params
+    return hashlib.scrypt(secret, salt=salt.encode("utf-8"), n=n, r=r, p=p,
+                          maxmem=132 * n * r * p)
+
+
+def _outer(digest: bytes, salt: bytes, rounds: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", digest, salt, rounds)
+
+
+def is_wrapped(hashed: str) -> bool:
+    """Indique si un hash est déjà enveloppé"""
+    return hashed.startswith(PREFIX)
+
+
+def wrap(hashed: str, rounds: int = DEFAULT_ROUNDS) -> str:
+    """
+    Enveloppe un hash existant dans une couche PBKDF2-HMAC-SHA256
+
+    Args:
+        hashed: Hash d'origine (voir split_inner)
+        rounds: Tours de la couche externe
+
+    Returns:
+        str: Hash enveloppé
+
+    Raises:
+        ValueError: Si le format n'est pas supporté ou déjà enveloppé
+    """
+    if is_wrapped(hashed):
+        raise ValueError("Hash déjà enveloppé")
+    setting, digest = split_inner(hashed)
+    # Un paramètre que la vérification ne saurait pas recalculer (digest
+    # inconnu de hashlib, coût invalide) est refusé ici plutôt qu'au login
+    inner_digest(setting, "")
+    salt = os.urandom(SALT_SIZE)
+    checksum = _outer(digest, salt, rounds)
+    return f"{PREFIX}{rounds}${_b64encode(salt)}${_b64encode(checksum)}|{setting}"
+
+
+def verify_wrapped(password: str, hashed: str) -> bool:
+    """
+    Vérifie un mot de passe contre un hash enveloppé
+
+    Args:
+        password: Mot de passe en clair
+        hashed: Hash enveloppé
+
+    Returns:
+        bool: True si le mot de passe correspond
+    """
+    try:
+        outer, _, setting = hashed[len(PREFIX):].partition("|")
+        rounds, salt, checksum = outer.split("$")
+        digest = inner_digest(setting, password)
+        expected = _b64decode(checksum)
+        return hmac.compare_digest(_outer(digest, _b64decode(salt), int(rounds)), expected)
+    except ValueError:
+        return False
+
+
+def verify(password: str, hashed: str, fallback) -> bool:
+    """
+    Vérifie un mot de passe, que son hash soit enveloppé ou non
+
+    Args:
+        password: Mot de passe en clair
+        hashed: Hash stocké
+        fallback: Vérificateur des hashes non enveloppés, (password, hashed) -> bool
+
+    Returns:
+        bool: True si le mot de passe correspond
+    """
+    if is_wrapped(hashed):
+        return verify_wrapped(password, hashed)
+    return fallback(password, hashed)
@@ -0,0 +1,129 @@
+"""
+Admission control pour le travail KDF (vérification pbkdf2 des mots de passe)
+
+Par défaut, les dépendances synchrones de FastAPI tournent dans le pool de
+threads partagé de Starlette (40 jetons). Une rafale d'authentifications
+Basic remplit ce pool de hashs pbkdf2 et affame toutes les autres routes
+synchrones, et les requêtes s'accumulent sans limite.
+
+KDFLimiter exécute le travail KDF dans son propre pool borné:
+- au plus `max_concurrency` vérifications en parallèle
+- au plus `max_queue` requêtes en attente d'un jeton
+- au plus `max_wait` secondes d'attente
+
+Au-delà, KDFOverloaded est levée immédiatement: l'API répond 503 avec un
+en-tête Retry-After au lieu de laisser le client attendre son timeout.
+
+Usage:
+    kdf_limiter = KDFLimiter(max_concurrency=4, max_queue=32, max_wait=2.0)
+    ok = await kdf_limiter.run(pwd_context.verify, password, hashed)
+"""
+
+import math
+import os
+
+import anyio
+import anyio.to_thread
+
+
+class KDFOverloaded(Exception):
+    """
+    Levée quand une vérification KDF est refusée (file pleine ou attente trop longue)
+
+    Attributes:
+        retry_after: Délai conseillé au client avant de réessayer (secondes)
+        reason: "queue_full" ou "timeout"
+    """
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(f"KDF capacity exceeded ({reason})")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class KDFLimiter:
+    """
+    Limiteur de capacité dédié aux fonctions de dérivation de clé
+
+    Args:
+        max_concurrency: Vérifications simultanées (défaut: nombre de cœurs)
+        max_queue: Nombre maximum de requêtes en attente d'un jeton
+        max_wait: Attente maximum d'un jeton en secondes
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue: int = 64, max_wait: float = 2.0):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        # Deux limiteurs de même taille: le premier sert de porte d'entrée
+        # (attente bornée), le second remplace le pool partagé de Starlette
+        # lors de l'exécution dans un thread. La porte garantit que le second
+        # a toujours un jeton libre.
+        self._gate = anyio.CapacityLimiter(self.max_concurrency)
+        self._threads = anyio.CapacityLimiter(self.max_concurrency)
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    def _retry_after(self) -> int:
+        # Estimation grossière: temps pour vider la file à raison de
+        # max_concurrency vérifications par max_wait
+        return max(1, math.ceil(self.max_wait * (self.waiting + 1) / self.max_concurrency))
+
+    async def run(self, func, *args):
+        """
+        Exécute une fonction KDF bloquante dans le pool dédié
+
+        Args:
+            func: Fonction synchrone (ex: pwd_context.verify)
+            *args: Arguments de la fonction
+
+        Returns:
+            Le résultat de func(*args)
+
+        Raises:
+            KDFOverloaded: Si la file est pleine ou si l'attente dépasse max_wait
+        """
+        if self._gate.available_tokens == 0 and self.waiting >= self.max_queue:
+            self.shed_queue_full += 1
+            raise KDFOverloaded(self._retry_after(), "queue_full")
+
+        self.waiting += 1
+        try:
+            with anyio.fail_after(self.max_wait):
+                await self._gate.acquire()
+        except TimeoutError:
+            self.shed_timeout += 1
+            raise KDFOverloaded(self._retry_after(), "timeout") from None
+        finally:
+            self.waiting -= 1
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            return await anyio.to_thread.run_sync(func, *args, limiter=self._threads)
+        finally:
+            self.in_flight -= 1
+            self._gate.release()
+
+    def snapshot(self) -> dict:
+        """
+        Exporte les compteurs du limiteur
+
+        Returns:
+            dict: Capacité, profondeur de file courante et compteurs de rejets
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
@@ -0,0 +1,313 @@
+"""
+Trousseau de clés de signature JWT (HS256) avec identifiant de clé (kid)
+
+Changer la clé de signature d'un coup invalide tous les tokens en circulation:
+tous les clients se reconnectent en même temps et la vague de vérifications
+pbkdf2 sature les workers. Avec un trousseau, chaque token porte dans son
+en-tête le `kid` de la clé qui l'a signé, et plusieurs clés de vérification
+restent actives pendant la fenêtre de recouvrement: les anciens tokens restent
+valides jusqu'à leur expiration, les nouveaux sont signés avec la clé active.
+
+- l'HMAC de chaque clé est initialisé une fois (signature: un copy() puis
+  update), l'en-tête encodé de chaque clé est précalculé et reconnu sans
+  parsing JSON
+- le trousseau est remplacé d'un bloc (affectation de référence): une requête
+  voit l'ancien trousseau ou le nouveau, jamais un mélange
+- un token sans `kid` (émis avant le trousseau) est vérifié avec la clé
+  LEGACY_KID si elle est présente
+- seul l'algorithme HS256 est accepté (pas de confusion d'algorithmes)
+
+Les erreurs sont celles de PyJWT (DecodeError, InvalidSignatureError,
+ExpiredSignatureError...): le code appelant garde ses `except PyJWTError`.
+
+Fichier de clés (variable JWT_KEYS_FILE), rechargé à chaud quand il change:
+    {"active": "2026-10", "keys": {"2026-10": "<secret>", "2026-07": "<secret>"}}
+
+Rotation sans redémarrage (workers rechargés en quelques secondes):
+1. ajouter la nouvelle clé au fichier (vérification seulement), attendre que
+   tous les workers l'aient chargée
+2. la rendre active: les nouveaux tokens portent son kid
+3. retirer l'ancienne clé après la durée de vie maximale d'un token
+
+Usage:
+    keyring = create_keyring(os.environ.get("JWT_KEYS_FILE"), default_secret=SECRET_KEY)
+    token = keyring.encode({"sub": "daniel", "exp": expire})
+    payload = keyring.decode(token)
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
+from collections import namedtuple
+from datetime import datetime
+
+from jwt import DecodeError, ExpiredSignatureError, ImmatureSignatureError, InvalidSignatureError
+
+from auth_common.user_reloader import ReloadableFile
+
+ALGORITHM = "HS256"
+LEGACY_KID = "default"  # clé des tokens sans kid (et du trousseau à clé unique)
+MIN_SECRET_LENGTH = 32  # caractères: 256 bits en hexadécimal ou base64
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+# État immuable d'un trousseau: kid actif, en-tête encodé, secrets et HMAC par
+# kid, HMAC par en-tête encodé
+_KeyState = namedtuple("_KeyState", "active header secrets macs by_header")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _header(kid: str) -> str:
+    return _b64encode(json.dumps({"alg": ALGORITHM, "kid": kid, "typ": "JWT"},
+                                 separators=(",", ":")).encode())
+
+
+def compile_keys(keys: dict, active: str) -> _KeyState:
+    """
+    Valide un jeu de clés et prépare l'HMAC de chacune
+
+    Args:
+        keys: kid -> secret
+        active: kid de la clé de signature
+
+    Returns:
+        _KeyState: État immuable du trousseau
+
+    Raises:
+        ValueError: Si le jeu de clés est invalide
+    """
+    if not isinstance(keys, dict) or not keys:
+        raise ValueError("Au moins une clé attendue (objet {kid: secret})")
+    if active not in keys:
+        raise ValueError(f"Clé active {active!r} absente du trousseau")
+    macs = {}
+    for kid, secret in keys.items():
+        if not isinstance(kid, str) or not isinstance(secret, str):
+            raise ValueError("kid et secret doivent être des chaînes")
+        if len(secret) < MIN_SECRET_LENGTH:
+            raise ValueError(f"Clé {kid!r} trop courte ({MIN_SECRET_LENGTH} caractères minimum)")
+        macs[kid] = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+    by_header = {_header(kid): mac for kid, mac in macs.items()}
+    return _KeyState(active, _header(active), dict(keys), macs, by_header)
+
+
+def read_keys_file(path: str) -> tuple:
+    """
+    Lit et valide un fichier de clés
+
+    Args:
+        path: Fichier JSON {"active": kid, "keys": {kid: secret}}
+
+    Returns:
+        tuple: (keys, active)
+
+    Raises:
+        ValueError: Si le fichier est invalide
+    """
+    with open(path, encoding="utf-8") as source:
+        config = json.load(source)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: objet JSON {{\"active\": kid, \"keys\": {{kid: secret}}}} attendu")
+    keys, active = config.get("keys"), config.get("active")
+    compile_keys(keys, active)
+    return keys, active
+
+
+def _kid(kid) -> str:
+    """
+    Clé du trousseau d'un kid d'en-tête (LEGACY_KID pour un token sans kid)
+
+    Raises:
+        DecodeError: Si le kid n'est pas une chaîne (ex: liste, objet), comme PyJWT
+    """
+    if kid is None:
+        return LEGACY_KID
+    if not isinstance(kid, str):
+        raise DecodeError("Key ID header parameter must be a string")
+    return kid
+
+
+class KeyRing:
+    """
+    Clés de signature JWT HS256 identifiées par kid
+
+    Args:
+        keys: kid -> secret
+        active: kid de la clé qui signe les nouveaux tokens
+
+    Raises:
+        ValueError: Si le jeu de clés est invalide
+    """
+
+    def __init__(self, keys: dict, active: str):
+        self._state = compile_keys(keys, active)
+        self.rotations = 0
+        self.watcher = None
+
+    def rotate(self, keys: dict, active: str):
+        """
+        Remplace le jeu de clés (sans redémarrage)
+
+        Args:
+            keys: kid -> secret, clés de vérification de la fenêtre de recouvrement comprises
+            active: kid de la nouvelle clé de signature
+
+        Raises:
+            ValueError: Si le jeu de clés est invalide (trousseau inchangé)
+        """
+        self._state = compile_keys(keys, active)
+        self.rotations += 1
+
+    @property
+    def active(self) -> str:
+        return self._state.active
+
+    def active_key(self) -> tuple:
+        """Clé de signature: (kid, secret), lus dans le même trousseau"""
+        state = self._state
+        return state.active, state.secrets[state.active]
+
+    def secret(self, kid):
+        """
+        Secret de vérification d'un kid (None: token sans kid)
+
+        Raises:
+            DecodeError: Si le kid n'est pas une chaîne
+            InvalidSignatureError: Si le kid n'est pas dans le trousseau
+        """
+        secret = self._state.secrets.get(_kid(kid))
+        if secret is None:
+            raise InvalidSignatureError(f"Unknown signing key {kid!r}")
+        return secret
+
+    def encode(self, claims: dict) -> str:
+        """
+        Signe un JWT avec la clé active
+
+        Args:
+            claims: Claims du token (exp, iat, nbf: datetime UTC ou timestamp)
+
+        Returns:
+            str: Token JWT, kid de la clé active dans l'en-tête
+        """
+        state = self._state
+        payload = dict(claims)
+        for claim in TIME_CLAIMS:
+            value = payload.get(claim)
+            if isinstance(value, datetime):
+                payload[claim] = timegm(value.utctimetuple())
+        signing_input = state.header + "." + _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        mac = state.macs[state.active].copy()
+        mac.update(signing_input.encode())
+        return signing_input + "." + _b64encode(mac.digest())
+
+    def decode(self, token: str) -> dict:
+        """
+        Vérifie la signature et les dates d'un JWT
+
+        Args:
+            token: Token JWT
+
+        Returns:
+            dict: Claims du token
+
+        Raises:
+            DecodeError: Token mal formé
+            InvalidSignatureError: Signature invalide ou kid inconnu
+            ExpiredSignatureError, ImmatureSignatureError: Token expiré ou pas encore valide
+        """
+        state = self._state
+        try:
+            signing_input, _, encoded_signature = token.rpartition(".")
+            encoded_header, _, encoded_payload = signing_input.partition(".")
+            signature = _b64decode(encoded_signature)
+        except (AttributeError, ValueError, TypeError) as exc:
+            raise DecodeError("Invalid token") from exc
+
+        # En-tête produit par encode: reconnu sans parsing
+        mac = state.by_header.get(encoded_header)
+        if mac is None:
+            mac = self._verification_mac(state, encoded_header)
+        mac = mac.copy()
+        mac.update(signing_input.encode())
+        if not hmac.compare_digest(signature, mac.digest()):
+            raise InvalidSignatureError("Signature verification failed")
+
+        try:
+            payload = json.loads(_b64decode(encoded_payload))
+        except ValueError as exc:
+            raise DecodeError("Invalid payload") from exc
+        if not isinstance(payload, dict):
+            raise DecodeError("Invalid payload")
+
+        now = time.time()
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise DecodeError("Expiration Time claim (exp) must be an integer.")
+            if exp <= now:
+                raise ExpiredSignatureError("Signature has expired")
+        nbf = payload.get("nbf")
+        if isinstance(nbf, (int, float)) and nbf > now:
+            raise ImmatureSignatureError("The token is not yet valid (nbf)")
+        return payload
+
+    @staticmethod
+    def _verification_mac(state, encoded_header):
+        """HMAC d'un en-tête non précalculé (autre encodeur, token sans kid)"""
+        try:
+            header = json.loads(_b64decode(encoded_header))
+        except ValueError as exc:
+            raise DecodeError("Invalid header") from exc
+        if not isinstance(header, dict) or header.get("alg") != ALGORITHM:
+            raise InvalidSignatureError("The specified alg value is not allowed")
+        mac = state.macs.get(_kid(header.get("kid")))
+        if mac is None:
+            raise InvalidSignatureError(f"Unknown signing key {header.get('kid')!r}")
+        return mac
+
+    def snapshot(self) -> dict:
+        """
+        Exporte l'état du trousseau (sans les secrets)
+
+        Returns:
+            dict: kid actif, kids de vérification, rotations et rechargements du fichier
+        """
+        state = self._state
+        snapshot = {"active": state.active, "kids": sorted(state.macs), "rotations": self.rotations}
+        if self.watcher is not None:
+            snapshot["file"] = self.watcher.snapshot()
+        return snapshot
+
+
+def create_keyring(path: str = None, default_secret: str = None, interval: float = 2.0) -> KeyRing:
+    """
+    Construit le trousseau d'une API
+
+    Args:
+        path: Fichier de clés rechargé à chaud (JWT_KEYS_FILE), optionnel
+        default_secret: Clé unique (kid LEGACY_KID) quand aucun fichier n'est donné
+        interval: Période de vérification du fichier (secondes)
+
+    Returns:
+        KeyRing
+
+    Raises:
+        ValueError, OSError: Si le fichier de clés est invalide (au démarrage)
+    """
+    if not path:
+        return KeyRing({LEGACY_KID: default_secret}, LEGACY_KID)
+    watcher = ReloadableFile(path, read_keys_file, interval)
+    keyring = KeyRing(*watcher.current)
+    keyring.watcher = watcher
+    watcher.subscribe(lambda: keyring.rotate(*watcher.current))
+    return keyring
@@ -0,0 +1,169 @@
+"""
+Surveillance du retard de la boucle d'événements (event-loop lag)
+
+Une sonde périodique est planifiée sur la boucle asyncio: le retard avec
+lequel elle s'exécute mesure le temps pendant lequel la boucle était bloquée
+(hash pbkdf2, décodage lourd... exécutés directement dans une route async).
+Les retards sont comptés dans un histogramme.
+
+Comme la sonde ne peut pas tourner tant que la boucle est bloquée, un thread
+de surveillance vérifie son dernier passage: au-delà du seuil, il capture la
+pile du thread de la boucle (donc la coroutine fautive) et la journalise;
+seuls la durée et l'instant du dernier blocage sont exportés.
+
+Usage (lifespan FastAPI):
+    loop_monitor = LoopLagMonitor()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        loop_monitor.start()
+        yield
+        await loop_monitor.stop()
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("auth_common.loop_monitor")
+
+# Bornes supérieures des buckets de l'histogramme (millisecondes)
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class LoopLagMonitor:
+    """
+    Mesure le retard de la boucle d'événements et signale les blocages
+
+    Args:
+        interval: Période de la sonde en secondes
+        threshold: Retard (secondes) à partir duquel la pile est capturée
+        buckets_ms: Bornes des buckets de l'histogramme en millisecondes
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1,
+                 buckets_ms=DEFAULT_BUCKETS_MS):
+        self.interval = interval
+        self.threshold = threshold
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)  # dernier bucket: +Inf
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall = None
+
+        self._task = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+
+    def record(self, lag: float):
+        """
+        Ajoute une mesure de retard à l'histogramme
+
+        Args:
+            lag: Retard de la sonde en secondes
+        """
+        lag_ms = lag * 1000
+        for index, bound in enumerate(self.buckets_ms):
+            if lag_ms <= bound:
+                break
+        else:
+            index = len(self.buckets_ms)
+        self.counts[index] += 1
+        self.samples += 1
+        self.total_lag += lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - expected))
+            self._last_beat = time.monotonic()
+
+    def _watch(self):
+        """Thread de surveillance: capture la pile quand la sonde ne passe plus"""
+        reported = False
+        while not self._stopping.wait(self.threshold / 2):
+            late = time.monotonic() - self._last_beat - self.interval
+            if late < self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue  # un seul rapport par blocage
+            reported = True
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.stalls += 1
+            # La pile (chemins et lignes de code) reste dans le journal:
+            # snapshot() est servi sur /metrics, sans authentification
+            self.last_stall = {
+                "blocked_ms": round(late * 1000, 1),
+                "at": time.time(),
+            }
+            logger.warning(
+                "Boucle d'événements bloquée depuis %.0f ms, pile du thread de la boucle:\n%s",
+                late * 1000, stack,
+            )
+
+    def start(self):
+        """Démarre la sonde et le thread de surveillance (depuis la boucle en cours)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        """Arrête la sonde et le thread de surveillance"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join(timeout=1)
+        self._watchdog = None
+
+    def snapshot(self) -> dict:
+        """
+        Exporte l'état de l'histogramme
+
+        Returns:
+            dict: Compteurs par bucket (cumulatifs, style Prometheus),
+                  moyenne, maximum et dernier blocage détecté
+        """
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.buckets_ms, self.counts):
+            cumulative += count
+            buckets[f"le_{bound}ms"] = cumulative
+        buckets["le_inf"] = cumulative + self.counts[-1]
+
+        return {
+            "samples": self.samples,
+            "mean_lag_ms": round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "buckets": buckets,
+            "stalls": self.stalls,
+            "last_stall": self.last_stall,
+        }
@@ -0,0 +1,185 @@
+"""
+Moteur RBAC compilé (rôles et permissions sous forme de bitsets)
+
+Le modèle de rôles est compilé une seule fois au chargement:
+- chaque rôle et chaque permission reçoit un bit
+- la hiérarchie est pré-développée (admin implique user => le masque
+  d'admin contient aussi le bit de user, transitivement)
+- les exigences des routes (login_required(role=...)) sont compilées en masques
+
+Un contrôle d'accès devient un simple ET binaire: `user_mask & required == required`,
+quel que soit le nombre de rôles (3 ou 3 000).
+
+Usage:
+    model = RoleModel({"admin": ["user"], "user": []})
+    requirement = model.compile("admin")
+    requirement.allows(model.mask(["user"]))   # False
+    requirement.allows(model.mask("admin"))    # True
+"""
+
+
+class RoleRequirement:
+    """
+    Exigence de rôles compilée
+
+    Sémantique identique à Flask-HTTPAuth: l'exigence est satisfaite si
+    l'une des alternatives l'est; une alternative peut exiger plusieurs
+    rôles à la fois.
+
+    Attributes:
+        masks: Tuple de masques, un par alternative
+    """
+
+    __slots__ = ("masks",)
+
+    def __init__(self, masks):
+        self.masks = tuple(masks)
+
+    def allows(self, user_mask: int) -> bool:
+        """
+        Vérifie qu'un masque utilisateur satisfait l'exigence
+
+        Args:
+            user_mask: Masque (rôles développés) de l'utilisateur
+
+        Returns:
+            bool: True si l'accès est autorisé
+        """
+        for mask in self.masks:
+            if user_mask & mask == mask:
+                return True
+        return False
+
+
+class RoleModel:
+    """
+    Modèle de rôles compilé en bitsets
+
+    Args:
+        hierarchy: Rôle -> rôles qu'il implique (ex: {"admin": ["user"]})
+        permissions: Rôle -> permissions accordées (optionnel)
+    """
+
+    def __init__(self, hierarchy: dict, permissions: dict = None):
+        permissions = permissions or {}
+        roles = dict.fromkeys(hierarchy)
+        for implied in hierarchy.values():
+            roles.update(dict.fromkeys(implied))
+        roles = list(roles)
+
+        self.role_bits = {role: 1 << index for index, role in enumerate(roles)}
+
+        names = sorted({name for granted in permissions.values() for name in granted})
+        self.permission_bits = {name: 1 << index for index, name in enumerate(names)}
+
+        own_permissions = {}
+        for role in roles:
+            mask = 0
+            for name in permissions.get(role, ()):
+                mask |= self.permission_bits[name]
+            own_permissions[role] = mask
+
+        # Développement de la hiérarchie (fermeture transitive)
+        self._expanded = {}
+        self._permissions = {}
+        for role in roles:
+            self._expand(role, hierarchy, own_permissions)
+        self._mask_cache = {}
+
+    def _expand(self, root, hierarchy, own_permissions):
+        """
+        Parcours en profondeur itératif (pas de limite de récursion), mémoïsé:
+        chaque rôle n'est développé qu'une fois. Les cycles sont ignorés.
+        """
+        if root in self._expanded:
+            return
+        visiting = {root}
+        stack = [(root, iter(hierarchy.get(root, ())))]
+        while stack:
+            role, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                visiting.discard(role)
+                mask = self.role_bits[role]
+                granted = own_permissions[role]
+                for implied in hierarchy.get(role, ()):
+                    mask |= self._expanded.get(implied, 0)
+                    granted |= self._permissions.get(implied, 0)
+                self._expanded[role] = mask
+                self._permissions[role] = granted
+            elif child not in self._expanded and child not in visiting:
+                visiting.add(child)
+                stack.append((child, iter(hierarchy.get(child, ()))))
+
+    @staticmethod
+    def _normalize(roles) -> tuple:
+        if roles is None:
+            return ()
+        if isinstance(roles, str):
+            return (roles,)
+        return tuple(roles)
+
+    def mask(self, roles) -> int:
+        """
+        Calcule (et met en cache) le masque développé d'un ensemble de rôles
+
+        Args:
+            roles: Rôle (str), liste de rôles ou None
+
+        Returns:
+            int: Bitset des rôles, hiérarchie incluse. Les rôles inconnus sont ignorés.
+        """
+        key = self._normalize(roles)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = 0
+            for role in key:
+                mask |= self._expanded.get(role, 0)
+            self._mask_cache[key] = mask
+        return mask
+
+    def permissions(self, roles) -> int:
+        """
+        Calcule le bitset des permissions accordées par un ensemble de rôles
+
+        Args:
+            roles: Rôle (str) ou liste de rôles
+
+        Returns:
+            int: Bitset des permissions
+        """
+        mask = 0
+        for role in self._normalize(roles):
+            mask |= self._permissions.get(role, 0)
+        return mask
+
+    def permission_mask(self, *names) -> int:
+        """Masque requis pour un ensemble de permissions"""
+        mask = 0
+        for name in names:
+            mask |= self.permission_bits[name]
+        return mask
+
+    def compile(self, role) -> RoleRequirement:
+        """
+        Compile une exigence au format Flask-HTTPAuth
+
+        Args:
+            role: "admin", ["admin", "user"] (l'un ou l'autre)
+                  ou [("admin", "user")] (les deux)
+
+        Returns:
+            RoleRequirement: Exigence compilée
+
+        Raises:
+            KeyError: Si un rôle exigé n'existe pas dans le modèle
+        """
+        alternatives = role if isinstance(role, (list, tuple)) else [role]
+        masks = []
+        for alternative in alternatives:
+            mask = 0
+            for name in self._normalize(alternative):
+                mask |= self.role_bits[name]
+            masks.append(mask)
+        return RoleRequirement(masks)
@@ -0,0 +1,128 @@
+"""
+Scopes OAuth2 encodés en bitmask
+
+Chaque scope reçoit un bit selon son ordre de déclaration (n'ajouter de
+nouveaux scopes qu'à la fin pour que les tokens déjà émis restent valides).
+Les scopes accordés à /token sont encodés dans le JWT sous forme d'un
+entier, et les exigences des routes sont compilées en masques au démarrage:
+à chaque requête, le contrôle est un ET binaire, sans construire d'ensemble
+de chaînes ni relire la base utilisateurs.
+
+Usage:
+    matcher = ScopeMatcher(["profile", "resource"])
+    granted = matcher.encode(["profile"])          # 0b01
+    matcher.allows(granted, ["profile"])           # True
+"""
+
+
+class ScopeMatcher:
+    """
+    Correspondance scopes <-> bits et vérification des exigences
+
+    Args:
+        scopes: Noms des scopes, dans un ordre stable
+    """
+
+    def __init__(self, scopes):
+        self.bits = {name: 1 << index for index, name in enumerate(scopes)}
+        self._by_tuple = {}
+        # Cache indexé par identité de la liste de scopes: FastAPI réutilise
+        # la même liste (Dependant.oauth_scopes) à chaque requête d'une route.
+        # La liste est conservée dans l'entrée pour que son id reste valide.
+        self._by_id = {}
+
+    def encode(self, names) -> int:
+        """
+        Encode une liste de scopes en bitmask
+
+        Args:
+            names: Noms de scopes (les scopes inconnus sont ignorés)
+
+        Returns:
+            int: Bitmask des scopes
+        """
+        mask = 0
+        for name in names:
+            mask |= self.bits.get(name, 0)
+        return mask
+
+    def decode(self, mask: int) -> list:
+        """
+        Décode un bitmask en liste de scopes
+
+        Args:
+            mask: Bitmask des scopes
+
+        Returns:
+            list: Noms des scopes, dans l'ordre de déclaration
+        """
+        return [name for name, bit in self.bits.items() if mask & bit]
+
+    def required(self, scopes) -> int:
+        """
+        Masque exigé par une liste de scopes (compilé une fois, puis mis en cache)
+
+        Args:
+            scopes: Liste des scopes exigés (SecurityScopes.scopes)
+
+        Returns:
+            int: Bitmask exigé
+
+        Raises:
+            KeyError: Si un scope exigé n'est pas déclaré
+        """
+        entry = self._by_id.get(id(scopes))
+        if entry is not None and entry[0] is scopes:
+            return entry[1]
+
+        key = tuple(scopes)
+        mask = self._by_tuple.get(key)
+        if mask is None:
+            mask = 0
+            for name in key:
+                mask |= self.bits[name]
+            self._by_tuple[key] = mask
+        if isinstance(scopes, list):
+            self._by_id[id(scopes)] = (scopes, mask)
+        return mask
+
+    def allows(self, granted: int, scopes) -> bool:
+        """
+        Vérifie que les scopes accordés couvrent les scopes exigés
+
+        Args:
+            granted: Bitmask accordé (claim du token)
+            scopes: Liste des scopes exigés
+
+        Returns:
+            bool: True si tous les scopes exigés sont accordés
+        """
+        required = self.required(scopes)
+        return granted & required == required
+
+    def precompile(self, routes) -> int:
+        """
+        Compile les exigences de scopes de toutes les routes FastAPI
+
+        Parcourt l'arbre des dépendances de chaque route et compile la liste
+        oauth_scopes de chaque dépendance qui reçoit SecurityScopes.
+
+        Args:
+            routes: app.routes
+
+        Returns:
+            int: Nombre d'exigences compilées
+
+        Raises:
+            KeyError: Si une route exige un scope non déclaré (erreur au démarrage
+                      plutôt qu'à la première requête)
+        """
+        count = 0
+        stack = [route.dependant for route in routes if getattr(route, "dependant", None)]
+        while stack:
+            dependant = stack.pop()
+            if dependant.security_scopes_param_name:
+                self.required(dependant.oauth_scopes)
+                count += 1
+            stack.extend(dependant.dependencies)
+        return count
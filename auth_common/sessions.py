@@ -0,0 +1,383 @@
+"""
+Sessions côté serveur à token opaque (alternative au JWT pour les clients internes)
+
+Le client reçoit un identifiant aléatoire de 128 bits, sans contenu: vérifier
+une requête revient à une lecture dans une table de hachage, au lieu du
+décodage base64, du parsing JSON et du HMAC d'un JWT. La session vit sur le
+serveur: la déconnexion est immédiate (plus de token valide jusqu'à son
+expiration) et les sessions d'un utilisateur peuvent être listées et révoquées.
+
+- expiration glissante: chaque utilisation repousse l'expiration à `ttl`
+  secondes (au plus une écriture par demi-TTL), dans la limite de `max_age`
+  secondes après la connexion
+- seul le hash SHA-256 du token est stocké: une copie du stockage ne permet
+  pas de réutiliser les sessions
+
+Stockages (URL, variable SESSION_STORE_URL):
+    memory://              -> SessionStore, mémoire du processus (défaut)
+    sqlite:///sessions.db  -> SQLiteSessionStore, partagé par les workers d'une machine
+    redis://host:6379/0    -> SharedSessionStore sur le backend d'état (auth_common.state)
+
+Usage:
+    sessions = create_session_store(os.environ.get("SESSION_STORE_URL"), ttl=1800)
+    token = sessions.create("daniel", {"scp": 3})
+    sessions.get(token)            # {"username": "daniel", "data": {"scp": 3}, ...} ou None
+    sessions.list_sessions("daniel")
+    sessions.revoke(token)
+"""
+
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+
+from auth_common.state import create_backend
+
+TOKEN_BYTES = 16  # 128 bits d'aléa
+PURGE_INTERVAL = 60.0  # secondes entre deux purges des sessions expirées
+
+
+def session_id(token: str) -> str:
+    """Identifiant stocké d'une session: hash SHA-256 du token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionStore:
+    """
+    Sessions en mémoire du processus
+
+    Args:
+        ttl: Durée d'inactivité avant expiration (secondes)
+        max_age: Durée de vie maximum d'une session, renouvellements compris (secondes)
+
+    Attributes:
+        blocking: True si les opérations font des I/O (à sortir de la boucle asyncio)
+    """
+
+    blocking = False
+
+    def __init__(self, ttl: float = 1800, max_age: float = 86400):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._last_purge = time.time()
+        self._sessions = {}  # id -> session
+        self._by_user = {}   # username -> ids
+        self._lock = threading.Lock()
+
+    # Stockage (redéfini par les autres stockages)
+
+    def _load(self, sid):
+        return self._sessions.get(sid)
+
+    def _save(self, sid, session):
+        with self._lock:
+            self._sessions[sid] = session
+            self._by_user.setdefault(session["username"], set()).add(sid)
+
+    def _touch(self, sid, session):
+        pass  # session modifiée en place
+
+    def _delete(self, sid, username):
+        with self._lock:
+            self._sessions.pop(sid, None)
+            ids = self._by_user.get(username)
+            if ids is not None:
+                ids.discard(sid)
+                if not ids:
+                    del self._by_user[username]
+
+    def _user_sessions(self, username) -> dict:
+        with self._lock:
+            return {sid: self._sessions[sid] for sid in self._by_user.get(username, ())}
+
+    def purge(self) -> int:
+        """
+        Supprime les sessions expirées
+
+        Returns:
+            int: Nombre de sessions supprimées
+        """
+        now = time.time()
+        with self._lock:
+            expired = [(sid, session["username"]) for sid, session in self._sessions.items()
+                       if session["expires_at"] <= now]
+        for sid, username in expired:
+            self._delete(sid, username)
+        return len(expired)
+
+    # API
+
+    def create(self, username: str, data: dict = None) -> str:
+        """
+        Ouvre une session
+
+        Args:
+            username: Utilisateur authentifié
+            data: Données de la session (ex: scopes accordés)
+
+        Returns:
+            str: Token opaque à renvoyer au client (jamais stocké en clair)
+        """
+        now = time.time()
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = now
+            self.purge()
+        token = secrets.token_urlsafe(TOKEN_BYTES)
+        self._save(session_id(token), {
+            "username": username,
+            "data": data or {},
+            "created_at": now,
+            "expires_at": now + min(self.ttl, self.max_age),
+        })
+        return token
+
+    def get(self, token):
+        """
+        Vérifie un token et renouvelle sa session
+
+        Args:
+            token: Token opaque présenté par le client
+
+        Returns:
+            dict or None: La session (username, data, created_at, expires_at),
+            None si le token est inconnu, révoqué ou expiré
+        """
+        if not token:
+            return None
+        sid = session_id(token)
+        session = self._load(sid)
+        if session is None:
+            return None
+        now = time.time()
+        if session["expires_at"] <= now:
+            self._delete(sid, session["username"])
+            return None
+        # Expiration glissante: au plus une écriture par demi-TTL
+        if session["expires_at"] - now < self.ttl / 2:
+            expires_at = min(now + self.ttl, session["created_at"] + self.max_age)
+            if expires_at > session["expires_at"]:
+                session["expires_at"] = expires_at
+                self._touch(sid, session)
+        return session
+
+    def revoke(self, token) -> bool:
+        """
+        Ferme une session (déconnexion)
+
+        Returns:
+            bool: True si la session existait
+        """
+        sid = session_id(token)
+        session = self._load(sid)
+        if session is None:
+            return False
+        self._delete(sid, session["username"])
+        return True
+
+    def list_sessions(self, username: str) -> list:
+        """
+        Sessions actives d'un utilisateur
+
+        Returns:
+            list: Dicts id (préfixe du hash), data, created_at, expires_at
+        """
+        now = time.time()
+        sessions = []
+        for sid, session in self._user_sessions(username).items():
+            if session["expires_at"] <= now:
+                self._delete(sid, username)
+                continue
+            sessions.append({
+                "id": sid[:16],
+                "data": session["data"],
+                "created_at": session["created_at"],
+                "expires_at": session["expires_at"],
+            })
+        return sorted(sessions, key=lambda session: session["created_at"])
+
+    def revoke_user(self, username: str, session_prefix: str = None) -> int:
+        """
+        Ferme les sessions d'un utilisateur
+
+        Args:
+            username: Utilisateur
+            session_prefix: Identifiant donné par list_sessions (toutes si absent)
+
+        Returns:
+            int: Nombre de sessions fermées
+        """
+        revoked = 0
+        for sid in list(self._user_sessions(username)):
+            if session_prefix is None or sid.startswith(session_prefix):
+                self._delete(sid, username)
+                revoked += 1
+        return revoked
+
+    def snapshot(self) -> dict:
+        """
+        Exporte l'état du stockage
+
+        Returns:
+            dict: Type de stockage et nombre de sessions (mémoire uniquement)
+        """
+        return {"store": "memory", "sessions": len(self._sessions)}
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_username ON sessions (username);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions dans une base SQLite (partagées par les workers d'une même machine)
+
+    Args:
+        path: Chemin du fichier SQLite (créé si absent)
+        ttl, max_age: Voir SessionStore
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float = 1800, max_age: float = 86400):
+        super().__init__(ttl, max_age)
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, sid):
+        row = self._connect().execute(
+            "SELECT username, data, created_at, expires_at FROM sessions WHERE id = ?", (sid,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"username": row[0], "data": json.loads(row[1]), "created_at": row[2], "expires_at": row[3]}
+
+    def _save(self, sid, session):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (id, username, data, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (sid, session["username"], json.dumps(session["data"]),
+                 session["created_at"], session["expires_at"]),
+            )
+
+    def _touch(self, sid, session):
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (session["expires_at"], sid))
+
+    def _delete(self, sid, username):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def _user_sessions(self, username) -> dict:
+        rows = self._connect().execute(
+            "SELECT id, data, created_at, expires_at FROM sessions WHERE username = ?", (username,)
+        ).fetchall()
+        return {
+            sid: {"username": username, "data": json.loads(data), "created_at": created_at, "expires_at": expires_at}
+            for sid, data, created_at, expires_at in rows
+        }
+
+    def purge(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def snapshot(self) -> dict:
+        count = self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"store": "sqlite", "sessions": count}
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Sessions dans un backend d'état synchrone (auth_common.state): Redis pour
+    les partager entre workers et nœuds
+
+    Une session est une clé "session:<id>" (JSON) dont le TTL Redis suit
+    l'expiration; "user_sessions:<username>" liste les ids d'un utilisateur.
+
+    Args:
+        backend: Backend d'état synchrone (MemoryBackend, RedisBackend)
+        ttl, max_age: Voir SessionStore
+    """
+
+    blocking = True
+
+    def __init__(self, backend, ttl: float = 1800, max_age: float = 86400):
+        super().__init__(ttl, max_age)
+        self.backend = backend
+
+    @staticmethod
+    def _ttl(session) -> int:
+        return max(1, int(session["expires_at"] - time.time()) + 1)
+
+    def _load(self, sid):
+        value = self.backend.get(f"session:{sid}")
+        return json.loads(value) if value is not None else None
+
+    def _save(self, sid, session):
+        self.backend.set(f"session:{sid}", json.dumps(session), ttl=self._ttl(session))
+        self.backend.sadd(f"user_sessions:{session['username']}", sid)
+
+    def _touch(self, sid, session):
+        # SET XX: une session révoquée pendant la requête (revoke, revoke_user
+        # sur un autre worker) n'est jamais recréée par son renouvellement
+        self.backend.set_if_present(f"session:{sid}", json.dumps(session), ttl=self._ttl(session))
+
+    def _delete(self, sid, username):
+        self.backend.delete(f"session:{sid}")
+        self.backend.srem(f"user_sessions:{username}", sid)
+
+    def _user_sessions(self, username) -> dict:
+        ids = sorted(self.backend.smembers(f"user_sessions:{username}"))
+        values = self.backend.get_many([f"session:{sid}" for sid in ids])
+        # Sessions expirées par le TTL du backend: retirées de l'index
+        expired = [sid for sid, value in zip(ids, values) if value is None]
+        self.backend.srem(f"user_sessions:{username}", *expired)
+        return {sid: json.loads(value) for sid, value in zip(ids, values) if value is not None}
+
+    def purge(self) -> int:
+        return 0  # expiration assurée par le TTL des clés
+
+    def snapshot(self) -> dict:
+        return {"store": "shared", "shared": self.backend.shared}
+
+
+def create_session_store(url=None, ttl: float = 1800, max_age: float = 86400):
+    """
+    Construit le stockage de sessions correspondant à une URL
+
+    Args:
+        url: "memory://" (ou None), "sqlite:///chemin.db" ou une URL de backend
+             d'état ("redis://...")
+        ttl, max_age: Voir SessionStore
+
+    Returns:
+        SessionStore, SQLiteSessionStore ou SharedSessionStore
+
+    Raises:
+        ValueError: Si le schéma de l'URL n'est pas supporté
+    """
+    if not url or url.startswith("memory://"):
+        return SessionStore(ttl, max_age)
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):], ttl, max_age)
+    return SharedSessionStore(create_backend(url), ttl, max_age)
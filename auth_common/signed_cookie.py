@@ -0,0 +1,95 @@
+"""
+Cookie de session signé par HMAC
+
+Après une première authentification réussie (coûteuse: hash du mot de
+passe), le serveur remet un cookie court contenant le nom d'utilisateur,
+ses rôles et une date d'expiration, signé par HMAC-SHA256. Les requêtes
+suivantes sont authentifiées par une seule vérification HMAC.
+
+Format: base64url(payload JSON) "." base64url(signature)
+
+Usage:
+    signer = CookieSigner(secret, ttl=300)
+    value = signer.sign("daniel", ["admin", "user"])
+    session = signer.verify(value)   # {"u": ..., "r": [...], "exp": ...} ou None
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class CookieSigner:
+    """
+    Signe et vérifie les cookies de session
+
+    Args:
+        secret: Clé HMAC (str ou bytes)
+        ttl: Durée de validité du cookie en secondes
+    """
+
+    def __init__(self, secret, ttl: int = 300):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        # HMAC pré-initialisé avec la clé: chaque signature ne fait qu'un copy()
+        self._mac = hmac.new(secret, digestmod=hashlib.sha256)
+        self.ttl = ttl
+
+    def _signature(self, payload: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(payload)
+        return mac.digest()
+
+    def sign(self, username: str, roles) -> str:
+        """
+        Crée la valeur du cookie
+
+        Args:
+            username: Nom d'utilisateur authentifié
+            roles: Rôle (str) ou liste de rôles
+
+        Returns:
+            str: Valeur du cookie signée
+        """
+        payload = json.dumps(
+            {"u": username, "r": roles, "exp": int(time.time()) + self.ttl},
+            separators=(",", ":"),
+        ).encode()
+        return _b64encode(payload) + "." + _b64encode(self._signature(payload))
+
+    def verify(self, value: str):
+        """
+        Vérifie la signature et l'expiration d'un cookie
+
+        Args:
+            value: Valeur du cookie reçue
+
+        Returns:
+            dict or None: Le payload ({"u", "r", "exp"}) si valide, None sinon
+        """
+        if not value or "." not in value:
+            return None
+        encoded_payload, _, encoded_signature = value.partition(".")
+        try:
+            payload = _b64decode(encoded_payload)
+            signature = _b64decode(encoded_signature)
+        except (ValueError, TypeError):
+            return None
+
+        if not hmac.compare_digest(signature, self._signature(payload)):
+            return None
+
+        session = json.loads(payload)
+        if session["exp"] < time.time():
+            return None
+        return session
@@ -0,0 +1,90 @@
+"""
+Coalescence "single-flight" des vérifications de credentials identiques
+
+Quand un client lance 50 requêtes parallèles avec les mêmes credentials
+Basic (ou rejoue un login en boucle), 50 hashs pbkdf2 identiques tournent en
+même temps. Ici, le premier appel exécute la vérification et les appels
+concurrents avec les mêmes (username, password) attendent le même résultat.
+
+Aucun cache: dès que la vérification est terminée, l'entrée disparaît et la
+requête suivante refait le calcul. Ce qui est accepté ou refusé ne change pas.
+
+Les mots de passe ne sont jamais conservés en clair: la clé est un HMAC de
+(username, password) avec un secret aléatoire propre au processus.
+
+Usage:
+    verify_flight = SingleFlight()
+    key = verify_flight.credential_key(username, password)
+    ok = await verify_flight.do(key, lambda: kdf_limiter.run(verify, password, hashed))
+"""
+
+import asyncio
+import hashlib
+import hmac
+import secrets
+
+
+class SingleFlight:
+    """
+    Regroupe les appels asynchrones concurrents partageant la même clé
+    """
+
+    def __init__(self):
+        self._secret = secrets.token_bytes(32)
+        self._in_flight = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def credential_key(self, username: str, password: str) -> bytes:
+        """
+        Calcule la clé de coalescence d'un couple de credentials
+
+        Args:
+            username: Nom d'utilisateur
+            password: Mot de passe en clair
+
+        Returns:
+            bytes: HMAC-SHA256 de (username, password)
+        """
+        message = username.encode() + b"\x00" + password.encode()
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    async def do(self, key, func):
+        """
+        Exécute func() une seule fois pour tous les appels concurrents de même clé
+
+        Args:
+            key: Clé de coalescence (voir credential_key)
+            func: Fonction sans argument retournant un awaitable
+
+        Returns:
+            Le résultat partagé de func()
+
+        Raises:
+            Toute exception levée par func(), propagée à chaque appelant
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # shield: l'annulation d'un appelant (client déconnecté) n'annule
+        # pas la vérification partagée avec les autres
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> dict:
+        """
+        Exporte les compteurs de coalescence
+
+        Returns:
+            dict: Vérifications réellement exécutées, appels coalescés, en cours
+        """
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,363 @@
+"""
+Backend d'état partagé (compteurs, sessions, révocations, caches)
+
+Deux implémentations interchangeables, chacune en version synchrone (Flask)
+et asyncio (FastAPI):
+- mémoire (MemoryBackend / AsyncMemoryBackend): état propre au processus,
+  parfait en développement ou avec un seul worker
+- Redis (RedisBackend / AsyncRedisBackend): état partagé par tous les
+  workers et tous les nœuds, via redis-py (pool de connexions, pipelining)
+
+Les opérations atomiques n'utilisent pas de scripts Lua:
+- incr avec TTL: MULTI { SET key 0 EX ttl NX ; INCRBY key n } EXEC
+- set_if_absent: SET key value NX EX ttl
+- set_if_present: SET key value XX EX ttl (renouvellement qui ne recrée
+  jamais une clé supprimée entre-temps)
+
+La sélection se fait par URL (variable STATE_BACKEND_URL):
+    memory://                  -> mémoire (défaut)
+    redis://host:6379/0        -> Redis (nécessite `pip install redis`)
+
+Usage:
+    state = create_backend(os.environ.get("STATE_BACKEND_URL"))                  # Flask
+    state = create_backend(os.environ.get("STATE_BACKEND_URL"), use_asyncio=True) # FastAPI
+    state.incr("login_attempts:1.2.3.4", ttl=60)
+
+Les valeurs sont des chaînes; les compteurs sont des entiers.
+"""
+
+import threading
+import time
+
+
+class MemoryBackend:
+    """
+    Backend en mémoire du processus (thread-safe)
+
+    Attributes:
+        shared: False, l'état n'est pas partagé entre processus
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key, now):
+        # Appelé sous verrou: purge paresseuse des clés expirées
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= now:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _set_ttl(self, key, ttl, now):
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = now + ttl
+
+    def get(self, key):
+        """Valeur d'une clé (None si absente ou expirée)"""
+        with self._lock:
+            return self._data[key] if self._alive(key, time.monotonic()) else None
+
+    def get_many(self, keys):
+        """Valeurs de plusieurs clés, dans l'ordre (None pour les absentes)"""
+        now = time.monotonic()
+        with self._lock:
+            return [self._data[key] if self._alive(key, now) else None for key in keys]
+
+    def set(self, key, value, ttl=None):
+        """Écrit une valeur, avec une durée de vie optionnelle (secondes)"""
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = str(value)
+            self._set_ttl(key, ttl, now)
+
+    def set_if_absent(self, key, value, ttl=None) -> bool:
+        """Écrit la valeur seulement si la clé n'existe pas; True si écrite"""
+        now = time.monotonic()
+        with self._lock:
+            if self._alive(key, now):
+                return False
+            self._data[key] = str(value)
+            self._set_ttl(key, ttl, now)
+            return True
+
+    def set_if_present(self, key, value, ttl=None) -> bool:
+        """Écrit la valeur seulement si la clé existe encore; True si écrite"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._alive(key, now):
+                return False
+            self._data[key] = str(value)
+            self._set_ttl(key, ttl, now)
+            return True
+
+    def delete(self, *keys):
+        """Supprime des clés"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None) -> int:
+        """
+        Incrémente un compteur de façon atomique
+
+        Args:
+            key: Clé du compteur
+            amount: Incrément
+            ttl: Durée de vie fixée à la création du compteur (fenêtre fixe)
+
+        Returns:
+            int: Nouvelle valeur
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self._alive(key, now):
+                self._data[key] = "0"
+                self._set_ttl(key, ttl, now)
+            value = int(self._data[key]) + amount
+            self._data[key] = str(value)
+            return value
+
+    def hincrby(self, name, field, amount=1) -> int:
+        """Incrémente un champ d'un hash de compteurs"""
+        with self._lock:
+            table = self._data.setdefault(name, {})
+            table[field] = table.get(field, 0) + amount
+            return table[field]
+
+    def hgetall(self, name) -> dict:
+        """Tous les champs d'un hash de compteurs"""
+        with self._lock:
+            return dict(self._data.get(name, {}))
+
+    def sadd(self, key, *members):
+        """Ajoute des membres à un ensemble"""
+        with self._lock:
+            self._data.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        """Retire des membres d'un ensemble"""
+        with self._lock:
+            self._data.get(key, set()).difference_update(members)
+
+    def smembers(self, key) -> set:
+        """Membres d'un ensemble"""
+        with self._lock:
+            return set(self._data.get(key, ()))
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+
+class AsyncMemoryBackend:
+    """
+    Version asyncio du backend mémoire (mêmes méthodes, en coroutines)
+
+    Aucune I/O: chaque appel délègue directement à MemoryBackend.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._backend = MemoryBackend()
+
+    def __getattr__(self, name):
+        method = getattr(self._backend, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+def _redis_module(use_asyncio):
+    try:
+        if use_asyncio:
+            import redis.asyncio as redis_module
+        else:
+            import redis as redis_module
+    except ImportError as exc:
+        raise ImportError(
+            "STATE_BACKEND_URL=redis://... nécessite le paquet redis (pip install redis)"
+        ) from exc
+    return redis_module
+
+
+class RedisBackend:
+    """
+    Backend Redis synchrone (Flask), avec pool de connexions
+
+    Args:
+        url: URL Redis (redis://host:port/db)
+        client: Client redis-py déjà construit (ex: fakeredis.FakeRedis en test)
+        max_connections: Taille du pool de connexions
+    """
+
+    shared = True
+
+    def __init__(self, url=None, client=None, max_connections=50):
+        if client is None:
+            redis_module = _redis_module(use_asyncio=False)
+            pool = redis_module.ConnectionPool.from_url(
+                url, max_connections=max_connections, decode_responses=True
+            )
+            client = redis_module.Redis(connection_pool=pool)
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def get_many(self, keys):
+        return self.client.mget(keys) if keys else []
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl)
+
+    def set_if_absent(self, key, value, ttl=None) -> bool:
+        return bool(self.client.set(key, value, ex=ttl, nx=True))
+
+    def set_if_present(self, key, value, ttl=None) -> bool:
+        return bool(self.client.set(key, value, ex=ttl, xx=True))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def incr(self, key, amount=1, ttl=None) -> int:
+        if ttl is None:
+            return self.client.incrby(key, amount)
+        # Transaction MULTI/EXEC en un seul aller-retour: la clé est créée avec
+        # son TTL si elle n'existe pas, puis incrémentée (INCRBY conserve le TTL)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(key, 0, ex=ttl, nx=True)
+        pipe.incrby(key, amount)
+        return pipe.execute()[-1]
+
+    def hincrby(self, name, field, amount=1) -> int:
+        return self.client.hincrby(name, field, amount)
+
+    def hgetall(self, name) -> dict:
+        return {field: int(value) for field, value in self.client.hgetall(name).items()}
+
+    def sadd(self, key, *members):
+        if members:
+            self.client.sadd(key, *members)
+
+    def srem(self, key, *members):
+        if members:
+            self.client.srem(key, *members)
+
+    def smembers(self, key) -> set:
+        return set(self.client.smembers(key))
+
+    def ping(self) -> bool:
+        return bool(self.client.ping())
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncRedisBackend:
+    """
+    Backend Redis asyncio (FastAPI), avec pool de connexions
+
+    Args:
+        url: URL Redis (redis://host:port/db)
+        client: Client redis.asyncio déjà construit (ex: fakeredis.FakeAsyncRedis)
+        max_connections: Taille du pool de connexions
+    """
+
+    shared = True
+
+    def __init__(self, url=None, client=None, max_connections=50):
+        if client is None:
+            redis_module = _redis_module(use_asyncio=True)
+            pool = redis_module.ConnectionPool.from_url(
+                url, max_connections=max_connections, decode_responses=True
+            )
+            client = redis_module.Redis(connection_pool=pool)
+        self.client = client
+
+    async def get(self, key):
+        return await self.client.get(key)
+
+    async def get_many(self, keys):
+        return await self.client.mget(keys) if keys else []
+
+    async def set(self, key, value, ttl=None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def set_if_absent(self, key, value, ttl=None) -> bool:
+        return bool(await self.client.set(key, value, ex=ttl, nx=True))
+
+    async def set_if_present(self, key, value, ttl=None) -> bool:
+        return bool(await self.client.set(key, value, ex=ttl, xx=True))
+
+    async def delete(self, *keys):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key, amount=1, ttl=None) -> int:
+        if ttl is None:
+            return await self.client.incrby(key, amount)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(key, 0, ex=ttl, nx=True)
+            pipe.incrby(key, amount)
+            results = await pipe.execute()
+        return results[-1]
+
+    async def hincrby(self, name, field, amount=1) -> int:
+        return await self.client.hincrby(name, field, amount)
+
+    async def hgetall(self, name) -> dict:
+        return {field: int(value) for field, value in (await self.client.hgetall(name)).items()}
+
+    async def sadd(self, key, *members):
+        if members:
+            await self.client.sadd(key, *members)
+
+    async def srem(self, key, *members):
+        if members:
+            await self.client.srem(key, *members)
+
+    async def smembers(self, key) -> set:
+        return set(await self.client.smembers(key))
+
+    async def ping(self) -> bool:
+        return bool(await self.client.ping())
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_backend(url=None, use_asyncio=False, **options):
+    """
+    Construit le backend d'état correspondant à une URL
+
+    Args:
+        url: "memory://" (ou None) pour la mémoire, "redis://..." / "rediss://..." pour Redis
+        use_asyncio: True pour la version asyncio (FastAPI)
+        **options: Options du backend Redis (max_connections, client)
+
+    Returns:
+        Backend synchrone ou asyncio
+
+    Raises:
+        ValueError: Si le schéma de l'URL n'est pas supporté
+    """
+    if not url or url.startswith("memory://"):
+        return AsyncMemoryBackend() if use_asyncio else MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        backend_class = AsyncRedisBackend if use_asyncio else RedisBackend
+        return backend_class(url, **options)
+    raise ValueError(f"Backend d'état non supporté: {url}")
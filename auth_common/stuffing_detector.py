@@ -0,0 +1,231 @@
+"""
+Détection du credential stuffing par client (sketches HyperLogLog)
+
+Une attaque par credential stuffing se voit comme un client (adresse IP) qui
+essaie beaucoup de usernames différents sur /token, /login ou les routes
+Basic. Garder l'ensemble exact des usernames essayés par client épuiserait la
+mémoire pendant une attaque distribuée sur des milliers d'adresses: chaque
+client n'a ici qu'un sketch HyperLogLog de taille fixe qui estime le nombre
+de usernames distincts.
+
+- 2^precision registres d'un octet par sketch (1 Ko avec precision=10, erreur
+  type 3 %; comptage linéaire exact à quelques unités près sous le seuil)
+- fenêtre glissante: deux sketches par client, la demi-fenêtre courante et la
+  précédente. L'estimation porte sur leur union (entre window/2 et window
+  secondes d'historique), maintenue au fil des ajouts: un ajout coûte un hash
+  et une mise à jour de registre, sans parcourir le sketch
+- usernames hachés avec une clé aléatoire du processus (BLAKE2b): un
+  attaquant ne peut pas choisir des usernames qui tombent dans le même
+  registre pour rester sous le seuil
+- clients dans une table LRU bornée (`max_clients`, environ 3 Ko chacun)
+
+La vérification passe avant le hash du mot de passe: un client au-dessus du
+seuil est refusé (StuffingBlocked, réponse 429 avec Retry-After) sans
+consommer de calcul pbkdf2. Ses tentatives restent comptées: il reste bloqué
+tant qu'il continue.
+
+Chaque worker a ses propres sketches (pas d'état partagé): avec N workers,
+un client réparti sur tous peut essayer jusqu'à N x seuil usernames.
+
+Réglages (variables d'environnement lues par les APIs):
+    STUFFING_THRESHOLD=50   usernames distincts par client et par fenêtre (0: désactivé)
+    STUFFING_WINDOW=600     durée de la fenêtre (secondes)
+
+Usage:
+    stuffing = StuffingDetector(threshold=50, window=600)
+    stuffing.check(client_ip, username)    # StuffingBlocked si le client dépasse le seuil
+    stuffing.snapshot()                    # compteurs, sans adresse de client
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Puissances de 2 négatives des rangs possibles (registres de 0 à 64)
+_INV_POW = [2.0 ** -rank for rank in range(66)]
+
+
+class StuffingBlocked(Exception):
+    """
+    Levée quand un client essaie trop de usernames distincts
+
+    Attributes:
+        retry_after: Délai conseillé au client avant de réessayer (secondes)
+        distinct: Estimation des usernames distincts essayés dans la fenêtre
+    """
+
+    def __init__(self, retry_after: int, distinct: int):
+        super().__init__(f"Too many distinct usernames ({distinct})")
+        self.retry_after = retry_after
+        self.distinct = distinct
+
+
+class _WindowSketch:
+    """Sketches d'un client: demi-fenêtres précédente et courante, et leur union"""
+
+    __slots__ = ("epoch", "previous", "current", "union", "inverse_sum", "zeros")
+
+    def __init__(self, registers: int, epoch: int):
+        self.epoch = epoch
+        self.previous = bytearray(registers)
+        self.current = bytearray(registers)
+        self.union = bytearray(registers)
+        # Somme des 2^-registre de l'union et registres nuls (estimation en O(1))
+        self.inverse_sum = float(registers)
+        self.zeros = registers
+
+    def advance(self, epoch: int):
+        """Fait glisser la fenêtre jusqu'à la demi-fenêtre `epoch`"""
+        if epoch <= self.epoch:
+            return
+        registers = len(self.current)
+        if epoch == self.epoch + 1:
+            self.previous, self.current = self.current, self.previous
+            self.current[:] = bytes(registers)
+            self.union[:] = self.previous
+            self.inverse_sum = math.fsum(_INV_POW[rank] for rank in self.union)
+            self.zeros = self.union.count(0)
+        else:
+            # Plus d'une demi-fenêtre sans tentative: historique vide
+            self.previous[:] = self.current[:] = self.union[:] = bytes(registers)
+            self.inverse_sum = float(registers)
+            self.zeros = registers
+        self.epoch = epoch
+
+    def add(self, index: int, rank: int):
+        if rank > self.current[index]:
+            self.current[index] = rank
+            old = self.union[index]
+            if rank > old:
+                self.union[index] = rank
+                self.inverse_sum += _INV_POW[rank] - _INV_POW[old]
+                if old == 0:
+                    self.zeros -= 1
+
+
+class StuffingDetector:
+    """
+    Compte les usernames distincts essayés par client sur une fenêtre glissante
+
+    Args:
+        threshold: Usernames distincts au-delà desquels le client est bloqué
+        window: Durée de la fenêtre (secondes)
+        precision: log2 du nombre de registres par sketch (4 à 16)
+        max_clients: Nombre maximum de clients suivis (LRU)
+
+    Raises:
+        ValueError: Si precision sort de [4, 16]
+    """
+
+    def __init__(self, threshold: int = 50, window: float = 600.0, precision: int = 10,
+                 max_clients: int = 4096):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision doit être entre 4 et 16")
+        self.threshold = threshold
+        self.window = window
+        self.precision = precision
+        self.max_clients = max_clients
+        self._registers = 1 << precision
+        self._alpha = 0.7213 / (1 + 1.079 / self._registers)
+        self._period = window / 2  # une demi-fenêtre par sketch
+        self._key = os.urandom(16)
+        self._clients = OrderedDict()  # client -> _WindowSketch
+        self._lock = threading.Lock()
+
+        self.checks = 0
+        self.blocked = 0
+        self.evictions = 0
+
+    def _hash(self, username: str) -> tuple:
+        """Registre et rang d'un username (hash à clé de 64 bits)"""
+        value = int.from_bytes(hashlib.blake2b(username.encode(), digest_size=8, key=self._key).digest(), "big")
+        index = value & (self._registers - 1)
+        rest = value >> self.precision
+        return index, (64 - self.precision) - rest.bit_length() + 1
+
+    def _estimate(self, sketch: _WindowSketch) -> int:
+        registers = self._registers
+        estimate = self._alpha * registers * registers / sketch.inverse_sum
+        if estimate <= 2.5 * registers and sketch.zeros:
+            # Petits effectifs: comptage linéaire sur les registres nuls
+            estimate = registers * math.log(registers / sketch.zeros)
+        return round(estimate)
+
+    def record(self, client: str, username: str) -> int:
+        """
+        Enregistre une tentative d'authentification
+
+        Args:
+            client: Clé du client (adresse IP)
+            username: Username essayé
+
+        Returns:
+            int: Estimation des usernames distincts essayés par le client dans la fenêtre
+        """
+        index, rank = self._hash(username)
+        epoch = int(time.time() // self._period)
+        with self._lock:
+            sketch = self._clients.get(client)
+            if sketch is None:
+                sketch = self._clients[client] = _WindowSketch(self._registers, epoch)
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._clients.move_to_end(client)
+                sketch.advance(epoch)
+            sketch.add(index, rank)
+            return self._estimate(sketch)
+
+    def check(self, client: str, username: str):
+        """
+        Enregistre une tentative et refuse les clients au-dessus du seuil (avant le hash)
+
+        Args:
+            client: Clé du client (adresse IP)
+            username: Username essayé
+
+        Raises:
+            StuffingBlocked: Si le client a essayé plus de `threshold` usernames distincts
+        """
+        self.checks += 1
+        distinct = self.record(client, username)
+        if distinct > self.threshold:
+            self.blocked += 1
+            # Fin de la demi-fenêtre suivante: les tentatives actuelles sortent de l'union
+            now = time.time()
+            retry_after = math.ceil((int(now // self._period) + 2) * self._period - now)
+            raise StuffingBlocked(retry_after, distinct)
+
+    def snapshot(self) -> dict:
+        """
+        Exporte les compteurs (servis sur /metrics, sans authentification)
+
+        Les adresses des clients et leurs estimations ne sont pas exportées:
+        elles révéleraient les adresses des autres utilisateurs, et à un
+        attaquant la distance qui le sépare du seuil.
+
+        Returns:
+            dict: Réglages, clients suivis, vérifications, refus, évictions et
+            nombre de clients au-dessus du seuil (fenêtre courante)
+        """
+        epoch = int(time.time() // self._period)
+        with self._lock:
+            over_threshold = 0
+            for sketch in self._clients.values():
+                sketch.advance(epoch)
+                if sketch.zeros < self._registers and self._estimate(sketch) > self.threshold:
+                    over_threshold += 1
+        return {
+            "threshold": self.threshold,
+            "window": self.window,
+            "clients": len(self._clients),
+            "sketch_bytes": 3 * self._registers,
+            "checks": self.checks,
+            "blocked": self.blocked,
+            "evictions": self.evictions,
+            "clients_over_threshold": over_threshold,
+        }
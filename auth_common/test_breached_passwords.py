@@ -0,0 +1,104 @@
+"""
+Tests de la liste de mots de passe compromis (auth_common/breached_passwords.py)
+
+Recherche par interpolation aux extrémités de la liste, sur des doublons
+(troncature), sur une liste mal répartie (repli sur la dichotomie) et
+refus des listes non triées ou invalides.
+
+Usage:
+    python -m pytest auth_common/test_breached_passwords.py
+"""
+
+import random
+
+import pytest
+
+from auth_common.breached_passwords import BreachedPasswords, password_digest, write_breached
+
+PASSWORDS = ["password123", "123456", "qwerty", "letmein", "dragon"]
+
+
+def open_list(tmp_path, digests, digest_size=20):
+    path = str(tmp_path / "breached.bin")
+    write_breached(path, digests, digest_size)
+    return BreachedPasswords(path)
+
+
+def random_digests(count, seed=0):
+    generator = random.Random(seed)
+    return sorted({generator.randbytes(20) for _ in range(count)})
+
+
+@pytest.mark.parametrize("digest_size", [20, 8, 4])
+def test_passwords(tmp_path, digest_size):
+    digests = [password_digest(password) for password in PASSWORDS]
+    breached = open_list(tmp_path, sorted(digests + random_digests(1000)), digest_size)
+    for password in PASSWORDS:
+        assert breached.is_breached(password)
+    assert not breached.is_breached("correct horse battery staple")
+    assert breached.snapshot()["checks"] == len(PASSWORDS) + 1
+    assert breached.snapshot()["hits"] == len(PASSWORDS)
+
+
+def test_ends_of_list(tmp_path):
+    first, last = b"\x00" * 20, b"\xff" * 20
+    digests = [first] + random_digests(1000) + [last]
+    breached = open_list(tmp_path, digests)
+    assert breached.contains_digest(first)
+    assert breached.contains_digest(last)
+    assert breached.contains_digest(digests[1])
+    assert breached.contains_digest(digests[-2])
+    assert not breached.contains_digest(b"\x00" * 19 + b"\x01")
+    assert not breached.contains_digest(b"\xff" * 19 + b"\xfe")
+
+
+def test_outside_of_list(tmp_path):
+    digests = [b"\x40" + bytes(19), b"\x80" + bytes(19)]
+    breached = open_list(tmp_path, digests)
+    assert not breached.contains_digest(bytes(20))
+    assert not breached.contains_digest(b"\xff" * 20)
+    assert not breached.contains_digest(b"\x60" + bytes(19))
+
+
+def test_duplicates_after_truncation(tmp_path):
+    # Digests distincts qui partagent leurs 4 premiers octets
+    digests = [b"\x10\x20\x30\x40" + bytes([i]) * 16 for i in range(5)]
+    digests += [b"\x10\x20\x30\x41" + bytes(16)]
+    breached = open_list(tmp_path, digests, digest_size=4)
+    assert len(breached) == 2
+    assert breached.contains_digest(digests[0])
+    assert breached.contains_digest(b"\x10\x20\x30\x40" + b"\xff" * 16)
+    assert breached.contains_digest(digests[-1])
+    assert not breached.contains_digest(b"\x10\x20\x30\x42" + bytes(16))
+
+
+def test_skewed_list_falls_back_to_bisection(tmp_path):
+    # Toutes les entrées dans un intervalle étroit, plus une valeur isolée:
+    # l'interpolation se trompe et la dichotomie prend le relais
+    digests = [bytes(12) + i.to_bytes(8, "big") for i in range(0, 20000, 2)] + [b"\xff" * 20]
+    breached = open_list(tmp_path, digests)
+    for digest in digests[::97] + [digests[-2]]:
+        assert breached.contains_digest(digest)
+    for i in range(1, 20000, 194):
+        assert not breached.contains_digest(bytes(12) + i.to_bytes(8, "big"))
+
+
+def test_empty_list(tmp_path):
+    breached = open_list(tmp_path, [])
+    assert len(breached) == 0
+    assert not breached.is_breached("password123")
+
+
+def test_write_rejects_unsorted(tmp_path):
+    with pytest.raises(ValueError):
+        write_breached(str(tmp_path / "breached.bin"), [b"\x02" * 20, b"\x01" * 20])
+    with pytest.raises(ValueError):
+        write_breached(str(tmp_path / "breached.bin"), [], digest_size=3)
+
+
+def test_open_rejects_truncated_file(tmp_path):
+    path = tmp_path / "breached.bin"
+    write_breached(str(path), random_digests(10))
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        BreachedPasswords(str(path))
@@ -0,0 +1,135 @@
+"""
+Tests de la table d'utilisateurs compacte (auth_common/compact_users.py)
+
+Insertion, remplacement, suppression, agrandissement de l'index et
+lecture au format de l'API, hash texte compris (passlib, werkzeug et
+format inconnu conservé tel quel).
+
+Usage:
+    python -m pytest auth_common/test_compact_users.py
+"""
+
+import threading
+
+import pytest
+
+from auth_common.compact_users import CODEC_AB64, CODEC_HEX, CODEC_TEXT, CompactUserTable, encode_hash
+
+PASSLIB_HASH = "$pbkdf2-sha256$29000$yVmLMaY05nwP4bw3Zqw15g$2hHSbFmOBYVYdWrVQMfL.zCCKWVqpzz4xuRU0a9WJZc"
+WERKZEUG_HASH = "pbkdf2:sha256:260000$KzDqPSf1mLnFBvHn$0b6e1ff4c49c6f8f2d2bd5c1c7d6bd1d0d8e9a4c1f2b3a4d5e6f708192a3b4c5"
+
+
+def make_table():
+    return CompactUserTable("hashed_password", text_fields=("username", "name", "email"),
+                            interned_fields=("resource", "scopes"))
+
+
+def make_user(username, hashed=PASSLIB_HASH, **fields):
+    return {"username": username, "hashed_password": hashed, **fields}
+
+
+@pytest.mark.parametrize("hashed, codec", [
+    (PASSLIB_HASH, CODEC_AB64),
+    (WERKZEUG_HASH, CODEC_HEX),
+    ("$2b$12$R9h/cIPz0gi.URNNX3kh2OPST9/PgBkqquzi.Ss7KIUgO2t0jWMUW", CODEC_TEXT),
+    ("pbkdf2:sha256:1000$salt$NOT-HEX", CODEC_TEXT),
+], ids=["passlib", "werkzeug", "unknown", "malformed"])
+def test_hash_round_trip(hashed, codec):
+    assert encode_hash(hashed)[1] == codec
+    table = make_table()
+    table["daniel"] = make_user("daniel", hashed)
+    assert table["daniel"]["hashed_password"] == hashed
+
+
+def test_insert_and_lookup():
+    table = make_table()
+    table["daniel"] = make_user("daniel", name="Daniel", email="daniel@example.com",
+                                resource="admin", scopes=["read", "write"])
+    table["john"] = make_user("john", WERKZEUG_HASH, resource="admin")
+    assert len(table) == 2
+    assert table["daniel"] == {
+        "username": "daniel",
+        "hashed_password": PASSLIB_HASH,
+        "name": "Daniel",
+        "email": "daniel@example.com",
+        "resource": "admin",
+        "scopes": ("read", "write"),
+    }
+    # Champ vide ou absent: non restitué; valeurs internées partagées
+    assert "name" not in table["john"]
+    assert table["john"]["resource"] is table["daniel"]["resource"]
+    assert "daniel" in table
+    assert "unknown" not in table
+    assert None not in table
+    assert table.get("unknown") is None
+    with pytest.raises(KeyError):
+        table["unknown"]
+
+
+def test_replace_and_delete():
+    table = make_table()
+    table["daniel"] = make_user("daniel", name="Daniel")
+    table["daniel"] = make_user("daniel", WERKZEUG_HASH, name="Dan")
+    assert len(table) == 1
+    assert table["daniel"]["hashed_password"] == WERKZEUG_HASH
+    assert table["daniel"]["name"] == "Dan"
+    del table["daniel"]
+    assert len(table) == 0
+    assert table.get("daniel") is None
+    with pytest.raises(KeyError):
+        del table["daniel"]
+    # Réinsertion dans le slot libéré
+    table["daniel"] = make_user("daniel")
+    assert len(table) == 1
+    assert list(table) == ["daniel"]
+
+
+def test_resize_keeps_every_user():
+    table = make_table()
+    initial_size = len(table._index)
+    users = {f"user{i:05d}": make_user(f"user{i:05d}", email=f"user{i}@example.com") for i in range(5000)}
+    table.update(users)
+    assert len(table._index) > initial_size
+    assert len(table) == 5000
+    assert sorted(table) == sorted(users)
+    for username in ("user00000", "user02500", "user04999"):
+        assert table[username]["email"] == users[username]["email"]
+    for username in list(users)[::2]:
+        del table[username]
+    assert len(table) == 2500
+    assert table.get("user00000") is None
+    assert table["user00001"]["username"] == "user00001"
+
+
+def test_resize_never_hides_existing_users_from_readers():
+    table = make_table()
+    table["daniel"] = make_user("daniel")
+    missed = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            if table.get("daniel") is None:
+                missed.append(True)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for i in range(20000):
+            table[f"user{i}"] = make_user(f"user{i}")
+    finally:
+        done.set()
+        thread.join()
+    assert not missed
+
+
+def test_iter_usernames_follows_writes():
+    table = make_table()
+    table.update({username: make_user(username) for username in ("carol", "alice", "bob")})
+    assert list(table.iter_usernames()) == ["alice", "bob", "carol"]
+    assert list(table.iter_usernames(after="alice", batch=1)) == ["bob", "carol"]
+    table["aaron"] = make_user("aaron")
+    table["bob"] = make_user("bob", WERKZEUG_HASH)
+    del table["carol"]
+    assert list(table.iter_usernames()) == ["aaron", "alice", "bob"]
+    assert list(table.iter_usernames(after="bob")) == []
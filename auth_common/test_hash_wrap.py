@@ -0,0 +1,102 @@
+"""
+Tests du renforcement hors ligne des hashes (auth_common/hash_wrap.py)
+
+Aller-retour wrap/verify pour chaque format interne supporté (passlib
+pbkdf2_sha256, werkzeug pbkdf2 et scrypt) et refus des paramètres
+malformés, au moment de wrap() comme au login.
+
+Usage:
+    python -m pytest auth_common/test_hash_wrap.py
+"""
+
+import hashlib
+
+import pytest
+
+from auth_common import hash_wrap
+
+# Couche externe réduite: les tests vérifient le format, pas le coût
+ROUNDS = 1000
+
+
+def passlib_hash(password):
+    pbkdf2_sha256 = pytest.importorskip("passlib.hash").pbkdf2_sha256
+    return pbkdf2_sha256.using(rounds=1000).hash(password)
+
+
+def werkzeug_pbkdf2_hash(password):
+    security = pytest.importorskip("werkzeug.security")
+    return security.generate_password_hash(password, method="pbkdf2:sha256:1000")
+
+
+def werkzeug_scrypt_hash(password):
+    # Même format que werkzeug >= 2.3, calculé directement
+    salt = "c2FsdHNhbHQ"
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt.encode("utf-8"), n=1024, r=8, p=1)
+    return f"scrypt:1024:8:1${salt}${digest.hex()}"
+
+
+@pytest.mark.parametrize("make_hash", [passlib_hash, werkzeug_pbkdf2_hash, werkzeug_scrypt_hash],
+                         ids=["passlib", "werkzeug-pbkdf2", "werkzeug-scrypt"])
+def test_wrap_round_trip(make_hash):
+    original = make_hash("secret")
+    wrapped = hash_wrap.wrap(original, rounds=ROUNDS)
+    assert hash_wrap.is_wrapped(wrapped)
+    assert wrapped.startswith(f"$wrapped${ROUNDS}$")
+    # Seuls les paramètres du hash interne sont conservés, pas sa valeur
+    setting, _ = hash_wrap.split_inner(original)
+    assert wrapped.endswith("|" + setting)
+    assert original.rpartition("$")[2] not in wrapped
+    assert hash_wrap.verify_wrapped("secret", wrapped) is True
+    assert hash_wrap.verify_wrapped("wrong", wrapped) is False
+
+
+def test_wrap_refuses_wrapped_hash():
+    wrapped = hash_wrap.wrap(werkzeug_scrypt_hash("secret"), rounds=ROUNDS)
+    with pytest.raises(ValueError):
+        hash_wrap.wrap(wrapped)
+
+
+def test_verify_falls_back_for_unwrapped_hash():
+    calls = []
+
+    def fallback(password, hashed):
+        calls.append((password, hashed))
+        return True
+
+    assert hash_wrap.verify("secret", "plain-hash", fallback) is True
+    assert calls == [("secret", "plain-hash")]
+    wrapped = hash_wrap.wrap(werkzeug_scrypt_hash("secret"), rounds=ROUNDS)
+    assert hash_wrap.verify("secret", wrapped, fallback) is True
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("hashed", [
+    "bcrypt$2b$12$abc",
+    "pbkdf2$salt$00ff",
+    "pbkdf2:sha256$salt$00ff",
+    "pbkdf2:sha256:abc$salt$00ff",
+    "scrypt:1024:8$salt$00ff",
+    "pbkdf2:sha256:1000$salt$not-hex",
+    "pbkdf2:nodigest:1000$salt$00ff",
+    "pbkdf2:sha256:0$salt$00ff",
+], ids=["unknown", "pbkdf2-bare", "pbkdf2-no-rounds", "pbkdf2-bad-rounds", "scrypt-short",
+        "bad-checksum", "unknown-digest", "zero-rounds"])
+def test_wrap_refuses_malformed_settings(hashed):
+    with pytest.raises(ValueError):
+        hash_wrap.wrap(hashed, rounds=ROUNDS)
+
+
+@pytest.mark.parametrize("hashed", [
+    "$wrapped$1000$AAAA$AAAA|pbkdf2:sha256",
+    "$wrapped$1000$AAAA$AAAA|pbkdf2$salt",
+    "$wrapped$1000$AAAA$AAAA|pbkdf2:nodigest:1000$salt",
+    "$wrapped$1000$AAAA$AAAA|scrypt$salt",
+    "$wrapped$1000$AAAA$AAAA|$pbkdf2-sha256$1000",
+    "$wrapped$1000$AAAA|pbkdf2:sha256:1000$salt",
+    "$wrapped$abc$AAAA$AAAA|pbkdf2:sha256:1000$salt",
+    "$wrapped$1000$!!$AAAA|pbkdf2:sha256:1000$salt",
+], ids=["no-rounds", "bare", "unknown-digest", "scrypt-bare", "passlib-no-salt",
+        "outer-short", "outer-rounds", "outer-salt"])
+def test_verify_wrapped_rejects_malformed(hashed):
+    assert hash_wrap.verify_wrapped("x", hashed) is False
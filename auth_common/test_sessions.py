@@ -0,0 +1,122 @@
+"""
+Tests des sessions à token opaque (auth_common/sessions.py)
+
+Expiration, renouvellement glissant borné par max_age et révocation, sur les
+trois stockages: mémoire, SQLite et backend d'état (mémoire et fakeredis).
+L'horloge est simulée (time.time remplacé dans le module).
+
+Usage:
+    python -m pytest auth_common/test_sessions.py
+"""
+
+import pytest
+
+from auth_common import sessions as sessions_module
+from auth_common.sessions import SessionStore, SharedSessionStore, SQLiteSessionStore, session_id
+from auth_common.state import MemoryBackend, RedisBackend
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions_module.time, "time", clock)
+    return clock
+
+
+def shared_backends():
+    backends = [MemoryBackend()]
+    try:
+        import fakeredis
+    except ImportError:
+        return backends
+    return backends + [RedisBackend(client=fakeredis.FakeRedis(decode_responses=True))]
+
+
+@pytest.fixture(params=["memory", "sqlite", "shared-memory", "shared-fakeredis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return SessionStore(ttl=100, max_age=250)
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=100, max_age=250)
+    backends = shared_backends()
+    if request.param == "shared-fakeredis" and len(backends) < 2:
+        pytest.skip("fakeredis non installé")
+    return SharedSessionStore(backends[-1] if request.param == "shared-fakeredis" else backends[0],
+                              ttl=100, max_age=250)
+
+
+def test_create_and_get(store, clock):
+    token = store.create("daniel", {"scp": 3})
+    session = store.get(token)
+    assert session["username"] == "daniel"
+    assert session["data"] == {"scp": 3}
+    assert session["expires_at"] == clock.now + 100
+    assert store.get("unknown") is None
+    assert store.get("") is None
+
+
+def test_expiry(store, clock):
+    token = store.create("daniel")
+    clock.now += 101
+    assert store.get(token) is None
+
+
+def test_sliding_renewal_bounded_by_max_age(store, clock):
+    token = store.create("daniel")
+    created = clock.now
+    # Première moitié du TTL: pas d'écriture
+    clock.now += 40
+    assert store.get(token)["expires_at"] == created + 100
+    # Seconde moitié: expiration repoussée à now + ttl
+    clock.now += 20
+    assert store.get(token)["expires_at"] == clock.now + 100
+    # Renouvellements successifs, jamais au-delà de created_at + max_age
+    clock.now += 90
+    assert store.get(token)["expires_at"] == clock.now + 100
+    clock.now += 90
+    assert store.get(token)["expires_at"] == created + 250
+    clock.now = created + 251
+    assert store.get(token) is None
+
+
+def test_revoke(store, clock):
+    token = store.create("daniel")
+    assert store.revoke(token) is True
+    assert store.get(token) is None
+    assert store.revoke(token) is False
+
+
+def test_list_and_revoke_user(store, clock):
+    first = store.create("daniel", {"scp": 1})
+    clock.now += 1
+    second = store.create("daniel", {"scp": 2})
+    store.create("john")
+    listed = store.list_sessions("daniel")
+    assert [session["data"] for session in listed] == [{"scp": 1}, {"scp": 2}]
+    assert store.revoke_user("daniel", listed[0]["id"]) == 1
+    assert store.get(first) is None
+    assert store.get(second) is not None
+    assert store.revoke_user("daniel") == 1
+    assert store.get(second) is None
+    assert len(store.list_sessions("john")) == 1
+
+
+def test_renewal_never_resurrects_revoked_session(store, clock):
+    """Un renouvellement concurrent d'une déconnexion ne recrée pas la session"""
+    token = store.create("daniel")
+    sid = session_id(token)
+    clock.now += 60
+    # get() a lu la session avant la révocation (autre worker), puis la renouvelle
+    session = store._load(sid)
+    store.revoke(token)
+    session["expires_at"] = clock.now + 100
+    store._touch(sid, session)
+    assert store.get(token) is None
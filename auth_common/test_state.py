@@ -0,0 +1,103 @@
+"""
+Tests du backend d'état partagé (auth_common/state.py)
+
+Les opérations atomiques (incr avec TTL, set_if_absent, set_if_present,
+hincrby) sont vérifiées sur le backend mémoire et sur le backend Redis
+branché sur fakeredis (pas de serveur Redis nécessaire), en version
+synchrone (Flask) et asyncio (FastAPI).
+
+Usage:
+    pip install redis fakeredis
+    python -m pytest auth_common/test_state.py
+"""
+
+import asyncio
+
+import pytest
+
+from auth_common.state import AsyncRedisBackend, MemoryBackend, RedisBackend, create_backend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def sync_backends():
+    return [
+        MemoryBackend(),
+        RedisBackend(client=fakeredis.FakeRedis(decode_responses=True)),
+    ]
+
+
+@pytest.mark.parametrize("backend", sync_backends(), ids=["memory", "fakeredis"])
+def test_incr_with_ttl(backend):
+    assert backend.incr("attempts:1.2.3.4", ttl=60) == 1
+    assert backend.incr("attempts:1.2.3.4", 2, ttl=60) == 3
+    assert backend.get("attempts:1.2.3.4") == "3"
+    assert backend.incr("counter") == 1
+
+
+def test_incr_keeps_creation_ttl():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    backend = RedisBackend(client=client)
+    backend.incr("window", ttl=60)
+    backend.incr("window", ttl=600)
+    assert 0 < client.ttl("window") <= 60
+
+
+@pytest.mark.parametrize("backend", sync_backends(), ids=["memory", "fakeredis"])
+def test_set_if_absent(backend):
+    assert backend.set_if_absent("revoked:abc", "1", ttl=60) is True
+    assert backend.set_if_absent("revoked:abc", "2", ttl=60) is False
+    assert backend.get("revoked:abc") == "1"
+
+
+@pytest.mark.parametrize("backend", sync_backends(), ids=["memory", "fakeredis"])
+def test_set_if_present(backend):
+    assert backend.set_if_present("session:abc", "1", ttl=60) is False
+    assert backend.get("session:abc") is None
+    backend.set("session:abc", "1", ttl=60)
+    assert backend.set_if_present("session:abc", "2", ttl=60) is True
+    assert backend.get("session:abc") == "2"
+    backend.delete("session:abc")
+    assert backend.set_if_present("session:abc", "3", ttl=60) is False
+    assert backend.get("session:abc") is None
+
+
+@pytest.mark.parametrize("backend", sync_backends(), ids=["memory", "fakeredis"])
+def test_hincrby(backend):
+    assert backend.hincrby("user_versions", "daniel") == 1
+    assert backend.hincrby("user_versions", "daniel", 2) == 3
+    assert backend.hincrby("user_versions", "john") == 1
+    assert backend.hgetall("user_versions") == {"daniel": 3, "john": 1}
+
+
+def test_state_shared_between_clients():
+    server = fakeredis.FakeServer()
+    first = RedisBackend(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+    second = RedisBackend(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+    first.incr("attempts", ttl=60)
+    assert second.incr("attempts", ttl=60) == 2
+    assert second.set_if_absent("revoked:abc", "1") is True
+    assert first.get("revoked:abc") == "1"
+
+
+def test_async_backend():
+    async def scenario():
+        backend = AsyncRedisBackend(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert await backend.incr("attempts", ttl=60) == 1
+        assert await backend.incr("attempts", ttl=60) == 2
+        assert await backend.set_if_absent("lock", "1", ttl=5) is True
+        assert await backend.set_if_absent("lock", "1", ttl=5) is False
+        assert await backend.set_if_present("lock", "2", ttl=5) is True
+        assert await backend.set_if_present("missing", "1", ttl=5) is False
+        assert await backend.hincrby("user_versions", "daniel") == 1
+        assert await backend.hgetall("user_versions") == {"daniel": 1}
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_create_backend():
+    assert isinstance(create_backend(None), MemoryBackend)
+    assert create_backend("memory://").shared is False
+    with pytest.raises(ValueError):
+        create_backend("memcached://localhost")
@@ -0,0 +1,97 @@
+"""
+Tests de la détection du credential stuffing (auth_common/stuffing_detector.py)
+
+Précision de l'estimation HyperLogLog (petits et grands effectifs),
+blocage au-delà du seuil, glissement de la fenêtre (horloge simulée) et
+éviction LRU des clients.
+
+Usage:
+    python -m pytest auth_common/test_stuffing_detector.py
+"""
+
+import pytest
+
+from auth_common import stuffing_detector
+from auth_common.stuffing_detector import StuffingBlocked, StuffingDetector
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(stuffing_detector.time, "time", clock)
+    return clock
+
+
+def test_repeated_username_counts_once(clock):
+    detector = StuffingDetector(threshold=50)
+    for _ in range(100):
+        assert detector.record("1.2.3.4", "daniel") == 1
+
+
+@pytest.mark.parametrize("distinct, tolerance", [(10, 1), (50, 3), (1000, 0.1), (20000, 0.1)],
+                         ids=["10", "50", "1000", "20000"])
+def test_estimate(clock, distinct, tolerance):
+    detector = StuffingDetector(threshold=distinct * 2)
+    for i in range(distinct):
+        estimate = detector.record("1.2.3.4", f"user{i}")
+    # Comptage linéaire à quelques unités près (registres partagés par deux
+    # usernames), erreur relative au-delà
+    margin = tolerance * distinct if isinstance(tolerance, float) else tolerance
+    assert abs(estimate - distinct) <= margin
+
+
+def test_check_blocks_over_threshold(clock):
+    detector = StuffingDetector(threshold=20, window=600)
+    for i in range(20):
+        detector.check("1.2.3.4", f"user{i}")
+    # Un autre client n'est pas concerné
+    detector.check("5.6.7.8", "user0")
+    with pytest.raises(StuffingBlocked) as blocked:
+        for i in range(20, 40):
+            detector.check("1.2.3.4", f"user{i}")
+    assert blocked.value.distinct > 20
+    assert 300 < blocked.value.retry_after <= 600
+    snapshot = detector.snapshot()
+    assert snapshot["blocked"] == 1
+    assert snapshot["clients"] == 2
+    assert snapshot["clients_over_threshold"] == 1
+
+
+def test_window_rotation(clock):
+    detector = StuffingDetector(threshold=1000, window=600)
+    clock.now = 300 * 4000
+    for i in range(30):
+        detector.record("1.2.3.4", f"old{i}")
+    # Demi-fenêtre suivante: l'historique précédent compte encore
+    clock.now += 300
+    assert abs(detector.record("1.2.3.4", "new0") - 31) <= 2
+    # Encore une demi-fenêtre: seules les tentatives de la précédente restent
+    clock.now += 300
+    assert detector.record("1.2.3.4", "new1") <= 2
+    # Plus d'une demi-fenêtre sans tentative: historique vide
+    clock.now += 900
+    assert detector.record("1.2.3.4", "new2") == 1
+    assert detector.snapshot()["clients_over_threshold"] == 0
+
+
+def test_lru_eviction(clock):
+    detector = StuffingDetector(max_clients=2)
+    detector.record("1.1.1.1", "a")
+    detector.record("2.2.2.2", "a")
+    detector.record("1.1.1.1", "b")
+    detector.record("3.3.3.3", "a")
+    assert list(detector._clients) == ["1.1.1.1", "3.3.3.3"]
+    assert detector.snapshot()["evictions"] == 1
+
+
+def test_invalid_precision():
+    with pytest.raises(ValueError):
+        StuffingDetector(precision=3)
@@ -0,0 +1,116 @@
+"""
+Tests de la liste paginée des utilisateurs (auth_common/user_pages.py)
+
+Curseurs opaques (aller-retour, refus des curseurs invalides) et parcours
+page par page de plusieurs sources (dict, CompactUserTable, snapshot,
+stockage SQLite) avec dédoublonnage des usernames communs.
+
+Usage:
+    python -m pytest auth_common/test_user_pages.py
+"""
+
+import json
+
+import pytest
+
+from auth_common import user_pages
+from auth_common.compact_users import CompactUserTable
+from auth_common.user_pages import UserDirectory, decode_cursor, encode_cursor
+from auth_common.user_snapshot import UserSnapshot, write_snapshot
+from auth_common.user_store import UserStore
+
+HASH = "$pbkdf2-sha256$29000$yVmLMaY05nwP4bw3Zqw15g$2hHSbFmOBYVYdWrVQMfL.zCCKWVqpzz4xuRU0a9WJZc"
+
+
+def read_page(directory, cursor=None, limit=user_pages.DEFAULT_PAGE_SIZE):
+    return json.loads("".join(directory.page(cursor, limit)))
+
+
+def read_all(directory, limit):
+    usernames, cursor = [], None
+    while True:
+        page = read_page(directory, cursor, limit)
+        assert len(page["users"]) <= limit
+        usernames += page["users"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return usernames
+
+
+@pytest.mark.parametrize("username", ["daniel", "", "zoé", "a/b+c?", "用户"])
+def test_cursor_round_trip(username):
+    cursor = encode_cursor(username)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == username
+
+
+@pytest.mark.parametrize("cursor", ["!!", "a", "ZGFuaWVs=x", "_w"],
+                         ids=["alphabet", "length", "padding", "not-utf8"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+    with pytest.raises(ValueError):
+        UserDirectory({"builtin": {}}).page(cursor)
+
+
+@pytest.mark.parametrize("limit", [0, user_pages.MAX_PAGE_SIZE + 1])
+def test_invalid_limit(limit):
+    with pytest.raises(ValueError):
+        UserDirectory({"builtin": {}}).page(None, limit)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    builtin = {"daniel": {"hashed_password": HASH}, "john": {"hashed_password": HASH}}
+    compact = CompactUserTable("hashed_password")
+    compact.update({f"compact{i:03d}": {"hashed_password": HASH} for i in range(120)})
+    compact["daniel"] = {"hashed_password": HASH}
+
+    snapshot_users = {f"snap{i:03d}": {"hashed_password": HASH} for i in range(80)}
+    snapshot_users["john"] = {"hashed_password": HASH}
+    snapshot_path = str(tmp_path / "users.snap")
+    write_snapshot(snapshot_path, sorted(snapshot_users.items()))
+    snapshot = UserSnapshot(snapshot_path)
+
+    store = UserStore(str(tmp_path / "users.db"))
+    store.upsert_many([(f"store{i:04d}", HASH, {}) for i in range(1200)] + [("daniel", HASH, {})])
+
+    yield UserDirectory({"builtin": builtin, "compact": compact, "snapshot": snapshot,
+                         "store": store, "reloaded": None})
+    snapshot.close()
+    store.close()
+
+
+def expected_usernames():
+    return sorted({"daniel", "john"}
+                  | {f"compact{i:03d}" for i in range(120)}
+                  | {f"snap{i:03d}" for i in range(80)}
+                  | {f"store{i:04d}" for i in range(1200)})
+
+
+def test_counts(directory):
+    assert directory.counts() == {"builtin": 2, "compact": 121, "snapshot": 81, "store": 1201}
+
+
+@pytest.mark.parametrize("limit", [1, 7, 100, 1000, user_pages.MAX_PAGE_SIZE])
+def test_pages_merge_sources_without_duplicates(directory, limit):
+    assert read_all(directory, limit) == expected_usernames()
+
+
+def test_cursor_resumes_strictly_after(directory):
+    first = read_page(directory, limit=3)
+    assert first["users"] == ["compact000", "compact001", "compact002"]
+    assert decode_cursor(first["next_cursor"]) == "compact002"
+    second = read_page(directory, first["next_cursor"], limit=3)
+    assert second["users"] == ["compact003", "compact004", "compact005"]
+    # Curseur forgé sur un username absent: reprise au suivant
+    assert read_page(directory, encode_cursor("danie"), limit=2)["users"] == ["daniel", "john"]
+    assert read_page(directory, encode_cursor("zzz")) == {"users": [], "next_cursor": None}
+
+
+def test_page_follows_new_users(directory):
+    first = read_page(directory, limit=2)
+    directory.sources["builtin"]["compact000a"] = {"hashed_password": HASH}
+    assert read_page(directory, first["next_cursor"], limit=2)["users"] == ["compact002", "compact003"]
+    directory.sources["builtin"]["compact001a"] = {"hashed_password": HASH}
+    assert read_page(directory, first["next_cursor"], limit=2)["users"] == ["compact001a", "compact002"]
@@ -0,0 +1,108 @@
+"""
+Tests du snapshot binaire des utilisateurs (auth_common/user_snapshot.py)
+
+Écriture puis ouverture d'un snapshot, lookups au format de l'API (mêmes
+dicts que CompactUserTable), collisions dans l'index (hash forcé),
+parcours ordonné et refus des fichiers invalides.
+
+Usage:
+    python -m pytest auth_common/test_user_snapshot.py
+"""
+
+import pytest
+
+from auth_common import user_snapshot
+from auth_common.compact_users import CompactUserTable
+from auth_common.user_snapshot import UserSnapshot, write_snapshot
+
+PASSLIB_HASH = "$pbkdf2-sha256$29000$yVmLMaY05nwP4bw3Zqw15g$2hHSbFmOBYVYdWrVQMfL.zCCKWVqpzz4xuRU0a9WJZc"
+WERKZEUG_HASH = "pbkdf2:sha256:260000$KzDqPSf1mLnFBvHn$0b6e1ff4c49c6f8f2d2bd5c1c7d6bd1d0d8e9a4c1f2b3a4d5e6f708192a3b4c5"
+
+FIELDS = dict(text_fields=("username", "name", "email"), interned_fields=("resource", "scopes"))
+
+USERS = {
+    "daniel": {"username": "daniel", "hashed_password": PASSLIB_HASH, "name": "Daniel",
+               "email": "daniel@example.com", "resource": "admin", "scopes": ["read", "write"]},
+    "john": {"username": "john", "hashed_password": WERKZEUG_HASH, "resource": "admin"},
+    "zoé": {"username": "zoé", "hashed_password": "$2b$12$opaque", "name": "Zoé"},
+}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "users.snap")
+    assert write_snapshot(path, sorted(USERS.items()), "hashed_password", **FIELDS) == 3
+    users = UserSnapshot(path)
+    yield users
+    users.close()
+
+
+def test_lookup_matches_compact_table(snapshot):
+    table = CompactUserTable("hashed_password", **FIELDS)
+    table.update(USERS)
+    assert len(snapshot) == 3
+    for username in USERS:
+        assert snapshot[username] == table[username]
+    assert snapshot["daniel"]["scopes"] == ("read", "write")
+    assert snapshot["john"]["hashed_password"] == WERKZEUG_HASH
+    assert "name" not in snapshot["john"]
+
+
+def test_unknown_users(snapshot):
+    assert snapshot.get("unknown") is None
+    assert "unknown" not in snapshot
+    assert None not in snapshot
+    with pytest.raises(KeyError):
+        snapshot["unknown"]
+
+
+def test_hash_collisions(tmp_path, monkeypatch):
+    # Tous les usernames dans le même slot: le sondage linéaire départage
+    monkeypatch.setattr(user_snapshot, "key_hash", lambda key: 5)
+    users = {f"user{i:03d}": {"hashed_password": PASSLIB_HASH, "name": f"User {i}"} for i in range(50)}
+    path = str(tmp_path / "collisions.snap")
+    write_snapshot(path, sorted(users.items()), "hashed_password", text_fields=("name",))
+    snapshot = UserSnapshot(path)
+    try:
+        for username, user in users.items():
+            assert snapshot[username] == user
+        assert snapshot.get("user050") is None
+        assert snapshot.get("user") is None
+    finally:
+        snapshot.close()
+
+
+def test_iter_usernames(snapshot):
+    assert list(snapshot) == ["daniel", "john", "zoé"]
+    assert list(snapshot.iter_usernames()) == ["daniel", "john", "zoé"]
+    assert list(snapshot.iter_usernames(after="daniel")) == ["john", "zoé"]
+    assert list(snapshot.iter_usernames(after="k")) == ["zoé"]
+    assert list(snapshot.iter_usernames(after="zoé")) == []
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "empty.snap")
+    assert write_snapshot(path, [], "hashed_password") == 0
+    snapshot = UserSnapshot(path)
+    try:
+        assert len(snapshot) == 0
+        assert snapshot.get("daniel") is None
+        assert list(snapshot.iter_usernames()) == []
+    finally:
+        snapshot.close()
+
+
+@pytest.mark.parametrize("usernames", [["john", "daniel"], ["daniel", "daniel"]],
+                         ids=["unsorted", "duplicate"])
+def test_write_requires_sorted_unique_usernames(tmp_path, usernames):
+    path = tmp_path / "users.snap"
+    with pytest.raises(ValueError):
+        write_snapshot(str(path), [(username, USERS["daniel"]) for username in usernames])
+    assert not path.exists()
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_bytes(b"{}" + b"\x00" * 128)
+    with pytest.raises(ValueError):
+        UserSnapshot(str(path))
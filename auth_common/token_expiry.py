@@ -0,0 +1,125 @@
+"""
+Expiration des tokens avec jitter et indication de renouvellement
+
+Des clients connectés ensemble (reprise après une panne, déploiement) ont des
+tokens de même durée: ils expirent ensemble et se reconnectent ensemble, à
+chaque période, avec la même vague de hashs pbkdf2. Deux leviers étalent ces
+reconnexions:
+- jitter: la durée de chaque token est tirée au hasard dans
+  [durée x (1 - jitter), durée]. Le jitter ne fait que raccourcir: un token ne
+  vit jamais plus longtemps que la durée configurée. Les vagues s'étalent un
+  peu plus à chaque cycle.
+- indication de renouvellement: quand il reste moins de `refresh_window` x
+  durée, les réponses des routes protégées portent l'en-tête
+  X-Token-Expires-In (secondes restantes). Le client renouvelle son token à
+  un instant tiré au hasard avant cette échéance, au lieu d'attendre le
+  premier 401: les reconnexions se répartissent sur toute la fenêtre.
+
+Réglages (variables d'environnement lues par les APIs):
+    TOKEN_EXPIRY_JITTER=0.1      fraction de la durée (0: désactivé)
+    TOKEN_REFRESH_WINDOW=0.2     fraction de la durée (0: pas d'en-tête)
+
+Usage:
+    token_expiry = ExpiryPolicy(1800, jitter=0.1, refresh_window=0.2)
+    lifetime = token_expiry.lifetime()             # secondes, pour un nouveau token
+    token_expiry.refresh_hint(payload["exp"])      # secondes restantes ou None
+"""
+
+import random
+import time
+
+REFRESH_HEADER = "X-Token-Expires-In"
+
+
+class ExpiryPolicy:
+    """
+    Durée des tokens émis et fenêtre d'indication de renouvellement
+
+    Args:
+        lifetime: Durée configurée d'un token (secondes)
+        jitter: Fraction maximale retirée au hasard à chaque token (0 à 1)
+        refresh_window: Fraction de la durée, avant expiration, pendant
+                        laquelle le renouvellement est indiqué (0 à 1)
+        seed: Graine du tirage (simulations reproductibles)
+
+    Raises:
+        ValueError: Si jitter ou refresh_window sort de [0, 1)
+    """
+
+    def __init__(self, lifetime: float, jitter: float = 0.1, refresh_window: float = 0.2, seed=None):
+        if not 0 <= jitter < 1 or not 0 <= refresh_window < 1:
+            raise ValueError("jitter et refresh_window doivent être dans [0, 1)")
+        self.base_lifetime = lifetime
+        self.jitter = jitter
+        self.refresh_window = refresh_window
+        self._window_seconds = lifetime * refresh_window
+        self._random = random.Random(seed)
+
+    def lifetime(self) -> float:
+        """
+        Durée d'un nouveau token
+
+        Returns:
+            float: Secondes, entre lifetime x (1 - jitter) et lifetime
+        """
+        if not self.jitter:
+            return self.base_lifetime
+        return self.base_lifetime * (1 - self.jitter * self._random.random())
+
+    def refresh_hint(self, expires_at: float, now: float = None):
+        """
+        Indication de renouvellement d'un token valide
+
+        Args:
+            expires_at: Expiration du token (timestamp)
+            now: Instant courant (défaut: time.time())
+
+        Returns:
+            int or None: Secondes restantes si le token est dans la fenêtre
+            de renouvellement, None sinon
+        """
+        remaining = expires_at - (time.time() if now is None else now)
+        if remaining > self._window_seconds:
+            return None
+        return max(0, int(remaining))
+
+    def hint_headers(self, expires_at):
+        """
+        En-têtes de réponse d'un token valide (middleware ASGI)
+
+        Args:
+            expires_at: Expiration du token (timestamp, None: sans expiration)
+
+        Returns:
+            list or None: [(X-Token-Expires-In, secondes restantes)] dans la
+            fenêtre de renouvellement, None sinon
+        """
+        if expires_at is None:
+            return None
+        expires_in = self.refresh_hint(expires_at)
+        return None if expires_in is None else [(REFRESH_HEADER, str(expires_in))]
+
+    def refresh_at(self, expires_at: float) -> float:
+        """
+        Début de la fenêtre de renouvellement d'un token
+
+        Args:
+            expires_at: Expiration du token (timestamp)
+
+        Returns:
+            float: Timestamp à partir duquel refresh_hint indique le renouvellement
+        """
+        return expires_at - self._window_seconds
+
+    def snapshot(self) -> dict:
+        """
+        Exporte les réglages
+
+        Returns:
+            dict: Durée, jitter et fenêtre de renouvellement
+        """
+        return {
+            "lifetime": self.base_lifetime,
+            "jitter": self.jitter,
+            "refresh_window": self.refresh_window,
+        }
@@ -0,0 +1,182 @@
+"""
+Cache de lecture des utilisateurs (read-through) avec cache négatif
+
+Placé devant le stockage des utilisateurs, il évite un accès au stockage à
+chaque requête authentifiée:
+- TTL: une entrée est fraîche pendant `ttl` secondes
+- stale-while-revalidate: pendant `stale_ttl` secondes de plus, l'entrée
+  périmée est servie immédiatement et rafraîchie en arrière-plan
+- cache négatif: un utilisateur inconnu (énumération de usernames) est
+  mémorisé comme absent pendant `negative_ttl` secondes
+- taille bornée: au-delà de `max_size`, les entrées les moins récemment
+  utilisées sont évincées (LRU)
+
+Les statistiques sont comptées par résultat (hit, negative_hit, stale,
+miss, negative_miss).
+
+Usage:
+    user_cache = UserCache(lambda username: users_db.get(username))
+    user = user_cache.get("daniel")      # dict ou None
+    user_cache.invalidate("daniel")      # à appeler quand l'utilisateur change
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Résultats possibles d'une lecture
+OUTCOMES = ("hit", "negative_hit", "stale", "miss", "negative_miss")
+
+
+class UserCache:
+    """
+    Cache LRU des utilisateurs avec TTL, cache négatif et rafraîchissement asynchrone
+
+    Args:
+        loader: Fonction username -> utilisateur (ou None si inconnu)
+        ttl: Durée de fraîcheur d'un utilisateur trouvé (secondes)
+        negative_ttl: Durée de mémorisation d'un utilisateur inconnu (secondes)
+        stale_ttl: Durée supplémentaire pendant laquelle une entrée périmée est
+                   servie pendant son rafraîchissement (secondes)
+        max_size: Nombre maximum d'entrées
+    """
+
+    def __init__(self, loader, ttl: float = 60.0, negative_ttl: float = 5.0,
+                 stale_ttl: float = 30.0, max_size: int = 10000):
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+
+        # username -> (utilisateur ou None, expire_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        # Incrémenté par invalidate() et clear(): un chargement commencé avant
+        # n'est pas mis en cache (il peut avoir lu l'ancien utilisateur)
+        self._generation = 0
+
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.refreshes = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _store(self, username, user, generation):
+        expires_at = time.monotonic() + (self.ttl if user is not None else self.negative_ttl)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[username] = (user, expires_at)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _refresh(self, username):
+        try:
+            generation = self._generation
+            self._store(username, self.loader(username), generation)
+            self.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(username)
+
+    def get(self, username):
+        """
+        Lit un utilisateur (depuis le cache ou le stockage)
+
+        Args:
+            username: Nom d'utilisateur
+
+        Returns:
+            dict or None: L'utilisateur, ou None s'il n'existe pas
+        """
+        now = time.monotonic()
+        refresh = False
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                user, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(username)
+                    self.outcomes["hit" if user is not None else "negative_hit"] += 1
+                    return user
+                if user is not None and now < expires_at + self.stale_ttl:
+                    self.outcomes["stale"] += 1
+                    if username not in self._refreshing:
+                        self._refreshing.add(username)
+                        refresh = True
+                else:
+                    entry = None
+
+        if entry is not None:
+            if refresh:
+                threading.Thread(target=self._refresh, args=(username,), daemon=True).start()
+            return user
+
+        generation = self._generation
+        user = self.loader(username)
+        self._store(username, user, generation)
+        with self._lock:
+            self.outcomes["miss" if user is not None else "negative_miss"] += 1
+        return user
+
+    def preload(self, usernames) -> int:
+        """
+        Charge des utilisateurs dans le cache (préchauffage au démarrage),
+        sans les compter dans les statistiques par résultat
+
+        Args:
+            usernames: Itérable de noms d'utilisateur
+
+        Returns:
+            int: Nombre d'utilisateurs trouvés et mis en cache
+        """
+        loaded = 0
+        for username in usernames:
+            generation = self._generation
+            user = self.loader(username)
+            if user is not None:
+                self._store(username, user, generation)
+                loaded += 1
+        return loaded
+
+    def invalidate(self, username):
+        """
+        Retire un utilisateur du cache (hook à appeler quand il est modifié)
+
+        Args:
+            username: Nom de l'utilisateur modifié, créé ou supprimé
+        """
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(username, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Exporte les statistiques du cache
+
+        Returns:
+            dict: Taille, compteurs et taux par résultat
+        """
+        total = sum(self.outcomes.values())
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "outcomes": dict(self.outcomes),
+            "rates": {
+                outcome: round(count / total, 4) if total else 0.0
+                for outcome, count in self.outcomes.items()
+            },
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
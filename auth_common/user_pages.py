@@ -0,0 +1,158 @@
+"""
+Liste paginée des utilisateurs (curseurs opaques, réponse en flux)
+
+Renvoyer tous les usernames sur une route publique coûte une allocation et
+une réponse proportionnelles à l'annuaire. UserDirectory parcourt les
+sources d'utilisateurs d'une API (dict du code, fichier rechargé, snapshot,
+stockage SQLite) par ordre de username, une page à la fois:
+
+- curseur opaque: dernier username de la page, encodé en base64 URL; la page
+  suivante reprend strictement après (pagination par clé: stable quand des
+  utilisateurs sont ajoutés, sans OFFSET)
+- sources ordonnées (iter_usernames): reprise après le curseur sur leur
+  index trié, sans parcourir l'annuaire
+  - stockage SQLite: plages sur l'index de la clé primaire
+    (username > curseur ORDER BY username LIMIT n), par lots
+  - snapshot: records triés par username, recherche dichotomique
+  - CompactUserTable: array de lignes triées, recherche dichotomique
+  - fichier JSON rechargé: liste triée construite une fois par rechargement
+- petits dicts du code (utilisateurs intégrés): les `limit` plus petits
+  usernames après le curseur (heapq.nsmallest, un passage sur le dict)
+- fusion des sources en flux (heapq.merge), un username présent dans
+  plusieurs sources n'est listé qu'une fois
+- la page est produite en morceaux JSON (réponse en flux): une grande page
+  n'est jamais construite en entier en mémoire
+
+Les routes publiques n'exposent plus que le nombre d'utilisateurs par source
+(counts(), COUNT(*) SQLite mis en cache COUNT_TTL secondes).
+
+Usage:
+    directory = UserDirectory({"builtin": users_db, "store": user_store})
+    directory.counts()                         # {"builtin": 2, "store": 100000}
+    chunks = directory.page(cursor, limit)     # morceaux JSON, ValueError si curseur invalide
+"""
+
+import base64
+import binascii
+import heapq
+import itertools
+import json
+import threading
+import time
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+STREAM_CHUNK = 500  # usernames par morceau de réponse (et par lecture SQLite)
+COUNT_TTL = 10.0  # secondes
+
+
+def encode_cursor(username: str) -> str:
+    """Curseur opaque d'une page: dernier username listé, en base64 URL sans padding"""
+    return base64.urlsafe_b64encode(username.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Décode un curseur renvoyé par une page précédente
+
+    Returns:
+        str: Username après lequel reprendre la liste
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        padded = (cursor + "=" * (-len(cursor) % 4)).encode("ascii")
+        return base64.b64decode(padded, altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("invalid cursor") from None
+
+
+class UserDirectory:
+    """
+    Union des sources d'utilisateurs d'une API, parcourue par ordre de username
+
+    Args:
+        sources: Nom -> source (Mapping username -> utilisateur, ou UserStore),
+                 None pour une source non configurée
+    """
+
+    def __init__(self, sources: dict):
+        self.sources = {name: source for name, source in sources.items() if source is not None}
+        self._counts = None
+        self._counted_at = 0.0
+        self._lock = threading.Lock()
+
+    def counts(self) -> dict:
+        """
+        Nombre d'utilisateurs par source (un username peut figurer dans plusieurs)
+
+        Returns:
+            dict: Nom de la source -> nombre d'utilisateurs, recompté au plus
+            toutes les COUNT_TTL secondes
+        """
+        with self._lock:
+            if self._counts is None or time.monotonic() - self._counted_at > COUNT_TTL:
+                self._counts = {name: len(source) for name, source in self.sources.items()}
+                self._counted_at = time.monotonic()
+            return dict(self._counts)
+
+    @staticmethod
+    def _after(source, after: str, limit: int):
+        # Sources ordonnées: reprise sur leur index trié; petits dicts: un passage
+        if hasattr(source, "iter_usernames"):
+            return source.iter_usernames(after, batch=min(limit, STREAM_CHUNK))
+        return heapq.nsmallest(limit, (username for username in source if username > after))
+
+    def usernames(self, after: str = "", limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Usernames après `after`, en ordre croissant, sans doublons
+
+        Args:
+            after: Dernier username déjà listé ("" pour commencer)
+            limit: Nombre maximum de usernames
+
+        Returns:
+            Iterator[str]: Usernames, produits au fil de la fusion des sources
+        """
+        merged = heapq.merge(*(self._after(source, after, limit) for source in self.sources.values()))
+        unique = (username for username, _ in itertools.groupby(merged))
+        return itertools.islice(unique, limit)
+
+    def page(self, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Page de la liste au format JSON, en morceaux
+
+        Le curseur est vérifié avant le premier morceau: une erreur peut
+        encore être renvoyée comme une réponse normale.
+
+        Args:
+            cursor: Curseur renvoyé par la page précédente (None: première page)
+            limit: Taille de la page (1 à MAX_PAGE_SIZE)
+
+        Returns:
+            Iterator[str]: Morceaux de {"users": [...], "next_cursor": "..." | null}
+
+        Raises:
+            ValueError: Si le curseur ou la taille de page est invalide
+        """
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        after = decode_cursor(cursor) if cursor else ""
+        return self._chunks(after, limit)
+
+    def _chunks(self, after: str, limit: int):
+        # Un username de plus que la page: indique s'il reste une page suivante
+        usernames = self.usernames(after, limit + 1)
+        yield '{"users":['
+        listed = 0
+        last = None
+        while listed < limit:
+            chunk = list(itertools.islice(usernames, min(STREAM_CHUNK, limit - listed)))
+            if not chunk:
+                break
+            yield ("," if listed else "") + ",".join(json.dumps(username) for username in chunk)
+            listed += len(chunk)
+            last = chunk[-1]
+        has_more = next(usernames, None) is not None
+        yield '],"next_cursor":' + json.dumps(encode_cursor(last) if has_more else None) + "}"
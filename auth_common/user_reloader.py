@@ -0,0 +1,239 @@
+"""
+Rechargement à chaud des utilisateurs depuis un fichier surveillé
+
+Modifier un utilisateur ne doit pas imposer de redémarrer les workers (perte
+des caches, des connexions et des requêtes en cours). ReloadableUsers
+surveille un fichier d'utilisateurs et, quand il change:
+1. construit un nouvel index immuable dans un thread d'arrière-plan
+2. le publie par une simple affectation de référence (atomique): les
+   lectures ne prennent jamais de verrou et voient l'ancien index ou le
+   nouveau, jamais un état intermédiaire
+3. appelle les hooks enregistrés (ex: vider le cache des utilisateurs)
+
+Un fichier invalide (écriture en cours, JSON cassé) est ignoré: l'index
+précédent reste en service et l'échec est compté dans les métriques. Le
+changement est détecté par stat (mtime, taille, inode): un fichier remplacé
+par renommage atomique est pris en compte.
+
+ReloadableFile porte la surveillance pour n'importe quel fichier (ex: le
+trousseau de clés JWT, auth_common.keyring); ReloadableUsers l'applique aux
+fichiers d'utilisateurs.
+
+Formats:
+- .snap: snapshot binaire (build_user_snapshot.py), ouvert avec mmap
+- .json: objet {username: utilisateur}, au format des dicts des APIs
+
+Usage:
+    users_file = ReloadableUsers("users.json")
+    users_file.subscribe(user_cache.clear)
+    users_file.get("daniel")
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from types import MappingProxyType
+
+from auth_common.user_snapshot import UserSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def load_users_file(path: str):
+    """
+    Charge un fichier d'utilisateurs en index immuable
+
+    Args:
+        path: Fichier .snap ou .json
+
+    Returns:
+        Mapping: Index en lecture seule (username -> dict utilisateur)
+
+    Raises:
+        ValueError: Si le fichier est invalide
+    """
+    if path.endswith(".snap"):
+        return UserSnapshot(path)
+    with open(path, encoding="utf-8") as source:
+        users = json.load(source)
+    if not isinstance(users, dict):
+        raise ValueError(f"{path}: objet JSON {{username: utilisateur}} attendu")
+    return MappingProxyType(users)
+
+
+class ReloadableFile:
+    """
+    Contenu d'un fichier rechargé quand le fichier change
+
+    Args:
+        path: Fichier surveillé
+        loader: Fonction path -> objet immuable publié dans `current`
+        interval: Période de vérification du fichier (secondes)
+
+    Raises:
+        ValueError, OSError: Si le premier chargement échoue (au démarrage)
+    """
+
+    thread_name = "file-reloader"
+
+    def __init__(self, path: str, loader, interval: float = 2.0):
+        self.path = path
+        self.interval = interval
+        self.loader = loader
+        self._listeners = []
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload_at = None
+        self.last_duration_ms = None
+
+        self._signature = self._stat()
+        self.current = loader(path)
+
+        self._thread = None
+        self._start()
+        # Après un fork (gunicorn --preload), le thread de surveillance n'existe
+        # pas dans le worker: on le relance dans chaque processus enfant
+        os.register_at_fork(after_in_child=self._start)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._watch, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            signature = self._stat()
+            if signature is not None and signature != self._signature:
+                self.reload(signature)
+
+    def reload(self, signature=None) -> bool:
+        """
+        Recharge le fichier et publie son contenu s'il est valide
+
+        Args:
+            signature: Signature stat du fichier lu (calculée si absente)
+
+        Returns:
+            bool: True si le nouveau contenu est en service
+        """
+        started = time.perf_counter()
+        signature = signature or self._stat()
+        try:
+            current = self.loader(self.path)
+        except Exception:
+            # Nouvel essai au prochain changement du fichier
+            self._signature = signature
+            self.failures += 1
+            logger.exception("Rechargement de %s impossible, contenu précédent conservé", self.path)
+            return False
+        # L'ancien contenu est libéré quand plus aucune requête ne l'utilise
+        self.current = current
+        self._signature = signature
+        self.reloads += 1
+        self.last_reload_at = time.time()
+        self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        for callback in self._listeners:
+            callback()
+        return True
+
+    def subscribe(self, callback):
+        """
+        Enregistre un hook appelé après chaque rechargement réussi
+
+        Args:
+            callback: Fonction sans argument
+        """
+        self._listeners.append(callback)
+
+    def snapshot(self) -> dict:
+        """
+        Exporte l'état du rechargement
+
+        Returns:
+            dict: Fichier, rechargements et échecs
+        """
+        return {
+            "path": self.path,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_reload_at": self.last_reload_at,
+            "last_duration_ms": self.last_duration_ms,
+        }
+
+
+class ReloadableUsers(ReloadableFile):
+    """
+    Index d'utilisateurs rechargé quand son fichier change
+
+    Args:
+        path: Fichier surveillé
+        interval: Période de vérification du fichier (secondes)
+        loader: Fonction path -> Mapping immuable (défaut: load_users_file)
+
+    Raises:
+        ValueError, OSError: Si le premier chargement échoue (au démarrage)
+    """
+
+    thread_name = "user-reloader"
+
+    def __init__(self, path: str, interval: float = 2.0, loader=load_users_file):
+        # (index, usernames triés) du dernier parcours ordonné d'un index sans
+        # ordre propre (fichier JSON)
+        self._sorted = (None, [])
+        super().__init__(path, loader, interval)
+
+    def get(self, username, default=None):
+        return self.current.get(username, default)
+
+    def __contains__(self, username):
+        return username in self.current
+
+    def __iter__(self):
+        return iter(self.current)
+
+    def __len__(self):
+        return len(self.current)
+
+    def iter_usernames(self, after: str = "", batch: int = 500):
+        """
+        Parcourt les usernames de l'index en service par ordre croissant
+
+        Un snapshot est lu dans son ordre (records triés). Pour un fichier
+        JSON, la liste triée des usernames est construite une fois par index
+        publié, puis chaque page est une recherche dichotomique.
+
+        Args:
+            after: Username exclu à partir duquel reprendre ("" pour commencer)
+            batch: Nombre de usernames lus par lot (snapshot: ignoré)
+
+        Returns:
+            Iterator[str]: Usernames strictement après `after`
+        """
+        current = self.current
+        if hasattr(current, "iter_usernames"):
+            return current.iter_usernames(after, batch)
+        index, usernames = self._sorted
+        if index is not current:
+            usernames = sorted(current)
+            self._sorted = (current, usernames)
+        return map(usernames.__getitem__, range(bisect_right(usernames, after), len(usernames)))
+
+    def snapshot(self) -> dict:
+        """
+        Exporte l'état du rechargement
+
+        Returns:
+            dict: Fichier, nombre d'utilisateurs, rechargements et échecs
+        """
+        return {"path": self.path, "users": len(self.current), **super().snapshot()}
@@ -0,0 +1,303 @@
+"""
+Snapshot binaire des utilisateurs, en lecture seule et projeté en mémoire (mmap)
+
+Avec N workers gunicorn/uvicorn, chaque processus charge sa propre copie des
+utilisateurs: N fois la mémoire et N fois le temps de chargement. Le
+snapshot est un fichier binaire ouvert avec mmap: tous les workers partagent
+les mêmes pages via le page cache du noyau, sans copie ni désérialisation.
+L'ouverture ne lit que l'en-tête (temps constant, quelle que soit la taille).
+
+Format (entiers little-endian):
+    en-tête    magic, version, nombre d'utilisateurs, nombre de slots,
+               positions des sections, taille des métadonnées
+    méta       JSON: schéma des champs, paramètres de hash et valeurs internées
+    index      table de hachage à adressage ouvert: uint32 par slot (ligne + 1,
+               0 si vide), hash blake2b 64 bits du username, stable entre processus
+    records    une entrée de taille fixe par utilisateur (position et tailles
+               dans la zone de données, paramètres du hash, valeurs internées),
+               dans l'ordre des usernames: iter_usernames() reprend la liste
+               après un username par recherche dichotomique (GET /users)
+    données    username, sel et valeur du hash en binaire, champs texte
+
+Les lookups renvoient le même dict que CompactUserTable (et que le dict
+d'origine): le snapshot remplace users/users_db pour la lecture.
+
+Usage:
+    write_snapshot("users.snap", sorted(users_db.items()), "hashed_password",
+                   text_fields=("username", "name", "email"), interned_fields=("resource",))
+    users = UserSnapshot("users.snap")
+    users.get("daniel")
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from collections.abc import Mapping
+
+from auth_common.compact_users import InternTable, decode_hash, encode_hash
+
+MAGIC = b"AUTHSNAP"
+VERSION = 2  # 2: records triés par username
+
+# magic, version, utilisateurs, slots, index, records, données, taille des métadonnées
+HEADER = struct.Struct("<8sIQQQQQI")
+# position dans les données, tailles (username, sel, valeur du hash, texte), paramètres
+RECORD = struct.Struct("<QHBHIB")
+# Préfixe d'un record: position et taille du username (comparaison des clés)
+RECORD_KEY = struct.Struct("<QH")
+
+
+def key_hash(key: bytes) -> int:
+    """Hash 64 bits stable d'un username (identique dans tous les processus)"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+def write_snapshot(path: str, users, hash_field: str = "hashed_password",
+                   text_fields=(), interned_fields=()) -> int:
+    """
+    Écrit un snapshot (fichier temporaire puis renommage atomique)
+
+    Les utilisateurs sont écrits en flux: seuls les hashes des usernames
+    (8 octets par utilisateur) sont gardés en mémoire pour construire l'index.
+    Ils doivent donc arriver triés par username (UserStore.scan_users, ou
+    sorted(users.items()) pour un dict).
+
+    Args:
+        path: Fichier de destination
+        users: Itérable de (username, dict utilisateur), usernames uniques
+               en ordre croissant
+        hash_field: Champ qui porte le hash
+        text_fields: Champs texte propres à chaque utilisateur ("username"
+                     est reconstitué à partir de la clé)
+        interned_fields: Champs à faible cardinalité
+
+    Returns:
+        int: Nombre d'utilisateurs écrits
+
+    Raises:
+        ValueError: Si les usernames ne sont pas uniques et triés
+    """
+    include_username = "username" in text_fields
+    text_fields = tuple(field for field in text_fields if field != "username")
+    interned_fields = tuple(interned_fields)
+    record = struct.Struct(RECORD.format + "I" * len(interned_fields))
+
+    settings = InternTable()
+    codecs = {}
+    interned = {field: InternTable() for field in interned_fields}
+    hashes = array("Q")
+
+    with tempfile.TemporaryFile() as records, tempfile.TemporaryFile() as data:
+        position = 0
+        previous = None
+        for username, user in users:
+            key = username.encode("utf-8")
+            # Ordre des octets UTF-8 = ordre des chaînes Python (et de SQLite)
+            if previous is not None and key <= previous:
+                raise ValueError(f"usernames non triés ou en double ({username!r} après {previous.decode()!r})")
+            previous = key
+            setting, codec, salt, checksum = encode_hash(user[hash_field])
+            setting_id = settings.intern(setting)
+            codecs[setting_id] = codec
+            text = b"\x00".join(
+                str(user.get(field) or "").encode("utf-8") for field in text_fields
+            )
+            records.write(record.pack(
+                position, len(key), len(salt), len(checksum), len(text), setting_id,
+                *(interned[field].intern(user.get(field)) for field in interned_fields),
+            ))
+            data.write(key + salt + checksum + text)
+            position += len(key) + len(salt) + len(checksum) + len(text)
+            hashes.append(key_hash(key))
+
+        count = len(hashes)
+        slots = 8
+        while slots < count * 2:
+            slots *= 2
+        index = array("I", bytes(4 * slots))
+        mask = slots - 1
+        for row, value in enumerate(hashes):
+            slot = value & mask
+            while index[slot]:
+                slot = (slot + 1) & mask
+            index[slot] = row + 1
+        del hashes
+
+        meta = json.dumps({
+            "hash_field": hash_field,
+            "include_username": include_username,
+            "text_fields": text_fields,
+            "interned_fields": interned_fields,
+            "settings": [[settings.values[i], codecs[i]] for i in range(1, len(settings.values))],
+            "interned": {field: interned[field].values[1:] for field in interned_fields},
+        }).encode("utf-8")
+
+        index_offset = _align(HEADER.size + len(meta))
+        records_offset = _align(index_offset + len(index) * 4)
+        data_offset = records_offset + count * record.size
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as output:
+            output.write(HEADER.pack(MAGIC, VERSION, count, slots, index_offset,
+                                     records_offset, data_offset, len(meta)))
+            output.write(meta)
+            output.write(b"\x00" * (index_offset - output.tell()))
+            index.tofile(output)
+            output.write(b"\x00" * (records_offset - output.tell()))
+            records.seek(0)
+            shutil.copyfileobj(records, output)
+            data.seek(0)
+            shutil.copyfileobj(data, output)
+        os.replace(tmp_path, path)
+    return count
+
+
+class UserSnapshot(Mapping):
+    """
+    Utilisateurs lus dans un snapshot projeté en mémoire
+
+    Args:
+        path: Fichier écrit par write_snapshot
+
+    Raises:
+        ValueError: Si le fichier n'est pas un snapshot de ce format
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as source:
+            self._mm = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self._count, slots, index_offset, self._records_offset,
+         self._data_offset, meta_size) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path}: snapshot d'utilisateurs invalide")
+
+        meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_size])
+        self.hash_field = meta["hash_field"]
+        self.include_username = meta["include_username"]
+        self.text_fields = tuple(meta["text_fields"])
+        self.interned_fields = tuple(meta["interned_fields"])
+        self._settings = [None] + [tuple(entry) for entry in meta["settings"]]
+        # Les listes (rôles, scopes) sont restituées en tuples, comme CompactUserTable
+        self._interned = {
+            field: [None] + [tuple(value) if isinstance(value, list) else value
+                             for value in meta["interned"][field]]
+            for field in self.interned_fields
+        }
+        self._record = struct.Struct(RECORD.format + "I" * len(self.interned_fields))
+
+        self._index = memoryview(self._mm)[index_offset:index_offset + slots * 4].cast("I")
+        self._mask = slots - 1
+
+    def _row(self, username) -> int:
+        try:
+            key = username.encode("utf-8")
+        except AttributeError:
+            return -1
+        index = self._index
+        mm = self._mm
+        slot = key_hash(key) & self._mask
+        while True:
+            row = index[slot]
+            if row == 0:
+                return -1
+            position, username_size = RECORD_KEY.unpack_from(
+                mm, self._records_offset + (row - 1) * self._record.size
+            )
+            start = self._data_offset + position
+            if username_size == len(key) and mm[start:start + username_size] == key:
+                return row - 1
+            slot = (slot + 1) & self._mask
+
+    def _materialize(self, username: str, row: int) -> dict:
+        position, username_size, salt_size, checksum_size, text_size, setting_id, *ids = \
+            self._record.unpack_from(self._mm, self._records_offset + row * self._record.size)
+        start = self._data_offset + position + username_size
+        salt_end = start + salt_size
+        checksum_end = salt_end + checksum_size
+        mm = self._mm
+
+        user = {"username": username} if self.include_username else {}
+        setting, codec = self._settings[setting_id]
+        user[self.hash_field] = decode_hash(setting, codec, mm[start:salt_end], mm[salt_end:checksum_end])
+        if self.text_fields:
+            values = mm[checksum_end:checksum_end + text_size].decode("utf-8").split("\x00")
+            for field, value in zip(self.text_fields, values):
+                if value:
+                    user[field] = value
+        for field, value_id in zip(self.interned_fields, ids):
+            if value_id:
+                user[field] = self._interned[field][value_id]
+        return user
+
+    def get(self, username, default=None):
+        row = self._row(username)
+        if row < 0:
+            return default
+        return self._materialize(username, row)
+
+    def __getitem__(self, username):
+        row = self._row(username)
+        if row < 0:
+            raise KeyError(username)
+        return self._materialize(username, row)
+
+    def __contains__(self, username):
+        return self._row(username) >= 0
+
+    def _key(self, row: int) -> bytes:
+        position, username_size = RECORD_KEY.unpack_from(
+            self._mm, self._records_offset + row * self._record.size
+        )
+        start = self._data_offset + position
+        return self._mm[start:start + username_size]
+
+    def iter_usernames(self, after: str = "", batch: int = 500):
+        """
+        Parcourt les usernames par ordre croissant, à partir d'un username
+
+        Les records sont triés: la première ligne est trouvée par recherche
+        dichotomique (une vingtaine de lectures pour des millions
+        d'utilisateurs), puis les lignes suivantes sont lues dans l'ordre.
+
+        Args:
+            after: Username exclu à partir duquel reprendre ("" pour commencer)
+            batch: Ignoré (lecture directe des pages projetées), pour
+                   l'interface commune avec UserStore.iter_usernames
+
+        Yields:
+            str: Usernames strictement après `after`
+        """
+        target = after.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) <= target:
+                low = middle + 1
+            else:
+                high = middle
+        for row in range(low, self._count):
+            yield self._key(row).decode("utf-8")
+
+    def __iter__(self):
+        for row in range(self._count):
+            yield self._key(row).decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """Libère la projection (les lookups suivants échouent)"""
+        self._index.release()
+        self._mm.close()
@@ -0,0 +1,219 @@
+"""
+Stockage persistant des utilisateurs (SQLite)
+
+Complète les dictionnaires en mémoire des APIs pour les annuaires trop
+grands pour être écrits dans le code (import de clients, provisioning):
+- une table `users` (username, hash du mot de passe, autres champs en JSON)
+- une table `checkpoints` (position atteinte par un import), écrite dans la
+  même transaction que le lot correspondant: après un crash, l'import
+  reprend exactement après le dernier lot validé
+
+Les écritures se font par lots (une transaction par lot); les lectures
+utilisent une connexion par thread.
+
+Usage:
+    store = UserStore("users.db", hash_field="hashed_password")
+    store.upsert_many([("daniel", "$pbkdf2-sha256$...", {"name": "Daniel"})])
+    store.get("daniel")    # {"name": "Daniel", "hashed_password": "$pbkdf2-sha256$..."}
+"""
+
+import json
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    attributes TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+"""
+
+
+class UserStore:
+    """
+    Utilisateurs stockés dans une base SQLite
+
+    Args:
+        path: Chemin du fichier SQLite (créé si absent)
+        hash_field: Nom du champ qui porte le hash dans les dicts utilisateurs
+                    de l'API ("password" pour Flask Basic, "hashed_password" ailleurs)
+    """
+
+    def __init__(self, path: str, hash_field: str = "hashed_password"):
+        self.path = path
+        self.hash_field = hash_field
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            # WAL: les lectures des APIs ne bloquent pas pendant un import
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, username: str):
+        """
+        Lit un utilisateur
+
+        Args:
+            username: Nom d'utilisateur
+
+        Returns:
+            dict or None: L'utilisateur au format de l'API, None s'il n'existe pas
+        """
+        row = self._connect().execute(
+            "SELECT password_hash, attributes FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        if row is None:
+            return None
+        user = json.loads(row[1])
+        user[self.hash_field] = row[0]
+        return user
+
+    def scan_users(self):
+        """
+        Parcourt tous les utilisateurs par ordre de username, en flux (sans
+        les charger en mémoire), dans l'ordre attendu par write_snapshot
+
+        Yields:
+            tuple: (username, utilisateur au format de l'API)
+        """
+        cursor = self._connect().execute(
+            "SELECT username, password_hash, attributes FROM users ORDER BY username"
+        )
+        for username, password_hash, attributes in cursor:
+            user = json.loads(attributes)
+            user[self.hash_field] = password_hash
+            yield username, user
+
+    def iter_usernames(self, after: str = "", batch: int = 500):
+        """
+        Parcourt les usernames par ordre croissant, par plages sur l'index de
+        la clé primaire (une requête par lot, aucune lecture des attributs)
+
+        Args:
+            after: Username après lequel commencer ("" pour le début)
+            batch: Usernames lus par requête
+
+        Yields:
+            str: Usernames strictement après `after`
+        """
+        while True:
+            rows = self._connect().execute(
+                "SELECT username FROM users WHERE username > ? ORDER BY username LIMIT ?",
+                (after, batch),
+            ).fetchall()
+            for (username,) in rows:
+                yield username
+            if len(rows) < batch:
+                return
+            after = rows[-1][0]
+
+    def upsert_many(self, rows, checkpoint: str = None, position: int = None) -> int:
+        """
+        Écrit un lot d'utilisateurs dans une seule transaction
+
+        Args:
+            rows: Tuples (username, password_hash, attributs)
+            checkpoint: Nom du checkpoint à avancer dans la même transaction
+            position: Nouvelle position du checkpoint
+
+        Returns:
+            int: Nombre d'utilisateurs écrits
+        """
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany(
+                "INSERT INTO users (username, password_hash, attributes) VALUES (?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET "
+                "password_hash = excluded.password_hash, attributes = excluded.attributes",
+                ((username, password_hash, json.dumps(attributes, separators=(",", ":")))
+                 for username, password_hash, attributes in rows),
+            )
+            if checkpoint is not None:
+                conn.execute(
+                    "INSERT INTO checkpoints (name, position) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET position = excluded.position",
+                    (checkpoint, position),
+                )
+        return cursor.rowcount
+
+    def scan_hashes(self, after: int = 0, limit: int = 1000) -> list:
+        """
+        Parcourt les hashes par ordre d'insertion (pagination par rowid)
+
+        Args:
+            after: Dernier rowid déjà lu (0 pour commencer)
+            limit: Nombre maximum de lignes
+
+        Returns:
+            list: Tuples (rowid, username, password_hash)
+        """
+        return self._connect().execute(
+            "SELECT rowid, username, password_hash FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (after, limit),
+        ).fetchall()
+
+    def replace_hashes(self, rows, checkpoint: str = None, position: int = None) -> int:
+        """
+        Remplace des hashes dans une seule transaction (compare-and-set)
+
+        Un hash n'est remplacé que s'il n'a pas changé depuis sa lecture: un
+        changement de mot de passe concurrent n'est jamais écrasé.
+
+        Args:
+            rows: Tuples (username, ancien hash, nouveau hash)
+            checkpoint: Nom du checkpoint à avancer dans la même transaction
+            position: Nouvelle position du checkpoint
+
+        Returns:
+            int: Nombre de hashes remplacés
+        """
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany(
+                "UPDATE users SET password_hash = ? WHERE username = ? AND password_hash = ?",
+                ((new_hash, username, old_hash) for username, old_hash, new_hash in rows),
+            )
+            if checkpoint is not None:
+                conn.execute(
+                    "INSERT INTO checkpoints (name, position) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET position = excluded.position",
+                    (checkpoint, position),
+                )
+        return cursor.rowcount
+
+    def checkpoint(self, name: str) -> int:
+        """
+        Position enregistrée d'un checkpoint
+
+        Args:
+            name: Nom du checkpoint
+
+        Returns:
+            int: Position (0 si le checkpoint n'existe pas)
+        """
+        row = self._connect().execute(
+            "SELECT position FROM checkpoints WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        """Ferme la connexion du thread courant"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,108 @@
+"""
+Liste des versions d'utilisateurs modifiés (version bumps)
+
+En mode "claims" (sans état), le token embarque le profil de l'utilisateur
+et la version de ce profil au moment de l'émission. Tant qu'un utilisateur
+n'a pas changé, le principal est reconstruit à partir du token seul, sans
+accès à la base. Quand un utilisateur est modifié (profil, mot de passe,
+suppression), sa version est incrémentée ici: les tokens portant une
+version plus ancienne imposent une relecture de la base.
+
+Seuls les utilisateurs modifiés figurent dans la liste: la version par
+défaut est 0. Des hooks (subscribe) sont appelés à chaque modification,
+par exemple pour invalider un cache d'utilisateurs.
+
+Usage:
+    versions = UserVersions()
+    versions.current("daniel")        # 0
+    versions.bump("daniel")           # 1
+    versions.is_stale("daniel", 0)    # True
+    versions.subscribe(user_cache.invalidate)
+"""
+
+import threading
+
+
+class UserVersions:
+    """
+    Versions des utilisateurs modifiés depuis le démarrage
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def subscribe(self, callback):
+        """
+        Enregistre un hook appelé avec le username à chaque modification
+
+        Args:
+            callback: Fonction username -> None
+        """
+        self._listeners.append(callback)
+
+    def current(self, username: str) -> int:
+        """
+        Version courante d'un utilisateur
+
+        Args:
+            username: Nom d'utilisateur
+
+        Returns:
+            int: Version (0 si l'utilisateur n'a jamais été modifié)
+        """
+        return self._versions.get(username, 0)
+
+    def bump(self, username: str) -> int:
+        """
+        Signale une modification de l'utilisateur
+
+        Args:
+            username: Nom d'utilisateur modifié
+
+        Returns:
+            int: Nouvelle version
+        """
+        with self._lock:
+            version = self._versions.get(username, 0) + 1
+            self._versions[username] = version
+        for callback in self._listeners:
+            callback(username)
+        return version
+
+    def merge(self, versions: dict):
+        """
+        Intègre des versions connues ailleurs (backend partagé, autre worker)
+
+        Seules les versions plus récentes que les versions locales sont
+        retenues, et déclenchent les hooks.
+
+        Args:
+            versions: username -> version
+        """
+        changed = []
+        with self._lock:
+            for username, version in versions.items():
+                if version > self._versions.get(username, 0):
+                    self._versions[username] = version
+                    changed.append(username)
+        for username in changed:
+            for callback in self._listeners:
+                callback(username)
+
+    def is_stale(self, username: str, version: int) -> bool:
+        """
+        Indique si une version portée par un token est périmée
+
+        Args:
+            username: Nom d'utilisateur
+            version: Version embarquée dans le token
+
+        Returns:
+            bool: True si l'utilisateur a changé depuis l'émission du token
+        """
+        return self._versions.get(username, 0) > version
+
+    def __len__(self):
+        return len(self._versions)
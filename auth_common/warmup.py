@@ -0,0 +1,125 @@
+"""
+Préchauffage au démarrage et état de disponibilité (readiness)
+
+Après un déploiement, les premières requêtes de chaque worker paient des
+initialisations paresseuses: sélection du backend passlib, préparation des
+clés PyJWT, validateurs pydantic et schéma OpenAPI, caches d'utilisateurs
+vides. Warmup exécute ces étapes dans un thread d'arrière-plan dès le
+démarrage et expose leur avancement:
+- /healthz (liveness): le processus répond, toujours 200
+- /readyz (readiness): 200 une fois le préchauffage terminé, 503 avant
+
+Le répartiteur de charge n'envoie du trafic qu'aux workers prêts. Une étape
+en échec est journalisée et signalée dans /readyz mais ne bloque pas la
+disponibilité: le préchauffage est une optimisation, sans lui le worker sert
+les requêtes comme avant.
+
+Usage:
+    warmup = Warmup()
+
+    @warmup.step("hash_verifier")
+    def warm_hash_verifier():
+        pwd_context.verify("warmup", WARMUP_HASH)
+
+    warmup.start()
+    warmup.ready    # True quand toutes les étapes ont tourné
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Étapes de préchauffage exécutées une fois par processus
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.ready = False
+        self.started_at = None
+        self.duration_ms = None
+        self.durations_ms = {}
+        self.errors = {}
+        self._thread = None
+        self._fork_hook = False
+
+    def step(self, name: str):
+        """
+        Décorateur: enregistre une étape (fonction sans argument)
+
+        Args:
+            name: Nom de l'étape dans /readyz
+        """
+        def register(function):
+            self.steps.append((name, function))
+            return function
+        return register
+
+    def run(self):
+        """Exécute toutes les étapes dans l'ordre d'enregistrement, puis passe prêt"""
+        self.started_at = time.time()
+        started = time.perf_counter()
+        for name, function in self.steps:
+            step_started = time.perf_counter()
+            try:
+                function()
+            except Exception as exc:
+                self.errors[name] = f"{type(exc).__name__}: {exc}"
+                logger.exception("Étape de préchauffage %s en échec", name)
+            self.durations_ms[name] = round((time.perf_counter() - step_started) * 1000, 2)
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.ready = True
+
+    def start(self):
+        """
+        Lance le préchauffage dans un thread d'arrière-plan
+
+        Si le processus est forké avant la fin (gunicorn --preload), le
+        préchauffage est relancé dans le processus enfant.
+        """
+        if not self._fork_hook:
+            os.register_at_fork(after_in_child=self._restart)
+            self._fork_hook = True
+        self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _restart(self):
+        if not self.ready:
+            self.durations_ms.clear()
+            self.errors.clear()
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Attend la fin du préchauffage
+
+        Args:
+            timeout: Attente maximum en secondes (None: sans limite)
+
+        Returns:
+            bool: True si le worker est prêt
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def snapshot(self) -> dict:
+        """
+        Exporte l'état du préchauffage
+
+        Returns:
+            dict: Disponibilité, durée totale, durée et erreur par étape
+        """
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "steps": dict(self.durations_ms),
+            "errors": dict(self.errors),
+        }
@@ -0,0 +1,230 @@
+"""
+Connexions WebSocket authentifiées une seule fois
+
+Un client qui interroge une route protégée toutes les quelques centaines de
+millisecondes paie à chaque requête l'authentification (décodage du JWT,
+lecture de session ou hash pbkdf2) et le coût d'une requête HTTP. Sur une
+connexion WebSocket, les credentials sont vérifiés une fois, au handshake:
+les messages suivants ne font qu'une recherche dans les ressources accordées
+à la connexion.
+
+La connexion reste sous contrôle sans vérification par message:
+- elle est fermée (code 4401) à l'expiration du token
+- les credentials sont revérifiés toutes les `revalidate_interval` secondes
+  (session révoquée, clé de signature retirée, utilisateur supprimé ou mot
+  de passe changé): fermeture 4401 s'ils ne sont plus valides
+- à l'entrée dans la fenêtre de renouvellement, le serveur envoie
+  {"event": "refresh", "expires_in": n}; le client envoie alors un nouveau
+  token ({"token": "..."}) sans rouvrir la connexion
+
+Protocole (messages JSON):
+    client -> {"get": "secured"}            serveur -> {"get": "secured", "data": {...}}
+    client -> {"token": "<nouveau token>"}  serveur -> {"event": "reauthenticated", "expires_in": n}
+    erreurs: {"error": "forbidden" | "unknown resource" | "invalid token" | "invalid message"}
+
+Un handshake sans credentials valides est refusé avant accept (code 1008:
+HTTP 403 pour le client).
+
+Usage (FastAPI):
+    sockets = AuthenticatedSockets(authenticate, {"secured": lambda principal: {...}})
+
+    @app.websocket("/ws")
+    async def secured_socket(websocket: WebSocket):
+        await sockets.serve(websocket, bearer_credential(websocket.headers, websocket.query_params))
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import time
+from collections import namedtuple
+
+CLOSE_POLICY_VIOLATION = 1008  # handshake refusé
+CLOSE_UNAUTHORIZED = 4401      # token expiré ou credentials révoqués en cours de connexion
+
+# Connexion authentifiée: utilisateur, expiration des credentials (None: sans
+# expiration), droits accordés (ici: ressources servies) et données de
+# l'application (utilisateur)
+Principal = namedtuple("Principal", "username expires_at grants context", defaults=(None, frozenset(), None))
+
+
+def bearer_credential(headers, query_params):
+    """
+    Token du handshake: en-tête Authorization Bearer, sinon paramètre ?token=
+    (l'API WebSocket des navigateurs ne permet pas d'en-têtes)
+
+    Returns:
+        str or None: Le token
+    """
+    scheme, _, value = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and value:
+        return value
+    return query_params.get("token") or None
+
+
+def basic_credential(headers):
+    """
+    Credentials HTTP Basic du handshake
+
+    Returns:
+        tuple or None: (username, password)
+    """
+    scheme, _, value = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "basic":
+        return None
+    return decode_basic(value)
+
+
+def decode_basic(value: str):
+    """
+    Décode la valeur d'un en-tête Authorization: Basic (base64 de "user:password")
+
+    Returns:
+        tuple or None: (username, password), None si la valeur est invalide
+    """
+    try:
+        username, separator, password = base64.b64decode(value).decode().partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return (username, password) if separator else None
+
+
+class AuthenticatedSockets:
+    """
+    Sert des ressources protégées sur des connexions WebSocket authentifiées au handshake
+
+    Args:
+        authenticate: Coroutine credential -> Principal (None si invalide)
+        resources: Nom -> fonction(principal) -> données JSON de la ressource
+        revalidate: Coroutine (principal, credential) -> Principal ou None
+                    (défaut: authenticate(credential))
+        revalidate_interval: Période de revérification des credentials (secondes)
+        refresh_at: Fonction expires_at -> début de la fenêtre de renouvellement
+                    (ex: ExpiryPolicy.refresh_at), optionnelle
+    """
+
+    def __init__(self, authenticate, resources: dict, revalidate=None,
+                 revalidate_interval: float = 30.0, refresh_at=None):
+        self.authenticate = authenticate
+        self.resources = resources
+        self.revalidate = revalidate or (lambda principal, credential: authenticate(credential))
+        self.revalidate_interval = revalidate_interval
+        self.refresh_at = refresh_at
+
+        self.open = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.messages = 0
+        self.revalidations = 0
+        self.reauthentications = 0
+        self.closed = {"expired": 0, "revoked": 0}
+
+    async def serve(self, websocket, credential):
+        """
+        Authentifie le handshake puis sert la connexion jusqu'à sa fermeture
+
+        Args:
+            websocket: WebSocket Starlette/FastAPI, pas encore acceptée
+            credential: Credentials extraits du handshake (None si absents)
+        """
+        principal = await self.authenticate(credential) if credential is not None else None
+        if principal is None:
+            self.rejected += 1
+            await websocket.close(code=CLOSE_POLICY_VIOLATION)
+            return
+        await websocket.accept()
+        self.accepted += 1
+        self.open += 1
+        try:
+            await self._serve(websocket, principal, credential)
+        finally:
+            self.open -= 1
+
+    def _hint_at(self, principal):
+        if self.refresh_at is None or principal.expires_at is None:
+            return None
+        return self.refresh_at(principal.expires_at)
+
+    async def _serve(self, websocket, principal, credential):
+        next_check = time.time() + self.revalidate_interval
+        hint_at = self._hint_at(principal)
+        while True:
+            # Attente du prochain message, ou de la prochaine échéance
+            deadline = min(t for t in (principal.expires_at, next_check, hint_at) if t is not None)
+            try:
+                message = await asyncio.wait_for(websocket.receive(), max(0.0, deadline - time.time()))
+            except asyncio.TimeoutError:
+                now = time.time()
+                if principal.expires_at is not None and now >= principal.expires_at:
+                    return await self._close(websocket, "expired")
+                if now >= next_check:
+                    self.revalidations += 1
+                    principal = await self.revalidate(principal, credential)
+                    if principal is None:
+                        return await self._close(websocket, "revoked")
+                    next_check = now + self.revalidate_interval
+                if hint_at is not None and now >= hint_at:
+                    await self._send(websocket, {"event": "refresh",
+                                                 "expires_in": max(0, int(principal.expires_at - now))})
+                    hint_at = None
+                continue
+
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                request = json.loads(message.get("text") or message.get("bytes") or "")
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                await self._send(websocket, {"error": "invalid message"})
+                continue
+
+            if "token" in request:
+                renewed = await self.authenticate(request["token"]) if isinstance(request["token"], str) else None
+                if renewed is None or renewed.username != principal.username:
+                    await self._send(websocket, {"error": "invalid token"})
+                    continue
+                principal, credential = renewed, request["token"]
+                hint_at = self._hint_at(principal)
+                self.reauthentications += 1
+                expires_in = int(principal.expires_at - time.time()) if principal.expires_at is not None else None
+                await self._send(websocket, {"event": "reauthenticated", "expires_in": expires_in})
+                continue
+
+            # Chemin de chaque message: aucune vérification de credentials
+            name = request.get("get")
+            handler = self.resources.get(name)
+            if handler is None:
+                await self._send(websocket, {"error": "unknown resource", "get": name})
+            elif name not in principal.grants:
+                await self._send(websocket, {"error": "forbidden", "get": name})
+            else:
+                self.messages += 1
+                await self._send(websocket, {"get": name, "data": handler(principal)})
+
+    @staticmethod
+    async def _send(websocket, payload):
+        await websocket.send_text(json.dumps(payload))
+
+    async def _close(self, websocket, reason):
+        self.closed[reason] += 1
+        await websocket.close(code=CLOSE_UNAUTHORIZED, reason=f"credentials {reason}")
+
+    def snapshot(self) -> dict:
+        """
+        Exporte les statistiques des connexions
+
+        Returns:
+            dict: Connexions ouvertes, acceptées, refusées, messages servis,
+            revérifications et fermetures par motif
+        """
+        return {
+            "open": self.open,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "messages": self.messages,
+            "revalidations": self.revalidations,
+            "reauthentications": self.reauthentications,
+            "closed": dict(self.closed),
+        }
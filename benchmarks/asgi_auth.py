@@ -0,0 +1,125 @@
+"""
+Authentification par dépendances (Depends/Security) vs middleware ASGI
+
+Chaque API FastAPI est chargée deux fois, dans deux processus: mode par
+défaut (dépendances JWTBearer, Security(get_current_user), HTTPBasic) et
+ASGI_AUTH=1 (auth_common/asgi_auth.py, vérification avant le routage). Les
+routes protégées sont appelées en processus, sans serveur ni client HTTP
+(appel ASGI direct, comme route_allocations.py), avec des credentials
+valides puis sans credentials (refus 401).
+
+Le rapport donne le temps médian par requête dans chaque mode. Les deux
+modes sont lancés --repeat fois en alternance et la meilleure médiane est
+gardée (le bruit entre deux processus dépasse souvent l'écart mesuré). Les
+routes Basic sont dominées par le hash pbkdf2 (même coût dans les deux
+modes): moins de requêtes y sont mesurées.
+
+Usage:
+    python benchmarks/asgi_auth.py
+    python benchmarks/asgi_auth.py --apps fastapi-jwt -n 5000
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from route_allocations import SCENARIOS, ASGIDriver, authenticate
+from serve import APPS, load_app
+
+APP_NAMES = [name for name in SCENARIOS if APPS[name][2] == "asgi"]
+# Routes Basic: un hash pbkdf2 par requête
+KDF_REQUESTS = {"fastapi-basic": 100}
+MODES = [("Depends", "0"), ("middleware", "1")]
+
+
+def time_request(driver, request, count: int, expected: int) -> float:
+    """
+    Temps médian d'une requête (insensible aux pauses du pool de threads et du GC)
+
+    Returns:
+        float: Microsecondes par requête
+    """
+    for _ in range(20):
+        status, body = driver.request(request)
+    if status != expected:
+        raise RuntimeError(f"{request.method} {request.path}: {status} {body[:200]!r}")
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        driver.request(request)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+def measure(name: str, count: int) -> dict:
+    """
+    Mesure les routes protégées d'une API dans le mode du processus (ASGI_AUTH)
+
+    Returns:
+        dict: "MÉTHODE chemin" -> µs par requête authentifiée, "refus ..." ->
+        µs par requête sans credentials
+    """
+    logging.getLogger("auth_common.loop_monitor").disabled = True
+    app = load_app(name)
+    module = sys.modules[APPS[name][1].split(":")[0]]
+    driver = ASGIDriver(app)
+    try:
+        module.warmup.wait()
+        auth, routes = SCENARIOS[name]
+        headers = authenticate(driver, auth)
+        results = {}
+        for request in routes:
+            if request.headers is not None:
+                continue  # route d'authentification (POST /token)
+            label = f"{request.method} {request.path}"
+            results[label] = time_request(driver, request._replace(headers=headers), count, 200)
+        first = next(request for request in routes if request.headers is None)
+        results[f"refus {first.method} {first.path}"] = time_request(
+            driver, first._replace(headers={}), count, 401)
+        return results
+    finally:
+        driver.close()
+
+
+def run_mode(name: str, flag: str, count: int) -> dict:
+    """Mesure une API dans un processus séparé (mode fixé à l'import par ASGI_AUTH)"""
+    env = {**os.environ, "ASGI_AUTH": flag}
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", name, "-n", str(count)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Authentification: dépendances FastAPI vs middleware ASGI")
+    parser.add_argument("--apps", nargs="+", choices=APP_NAMES, default=APP_NAMES)
+    parser.add_argument("-n", "--requests", type=int, default=3000, help="Requêtes mesurées par route")
+    parser.add_argument("--repeat", type=int, default=3, help="Processus par mode (meilleure médiane)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.requests)))
+        sys.exit(0)
+
+    print(f"{'route':<38} {'Depends':>10} {'middleware':>11} {'gain':>7}")
+    for name in args.apps:
+        count = KDF_REQUESTS.get(name, args.requests)
+        best = {mode: {} for mode, _ in MODES}
+        for _ in range(args.repeat):
+            for mode, flag in MODES:
+                for label, timing in run_mode(name, flag, count).items():
+                    best[mode][label] = min(timing, best[mode].get(label, timing))
+        depends, middleware = (best[mode] for mode, _ in MODES)
+        for label, before in depends.items():
+            after = middleware[label]
+            print(f"{name + ' ' + label:<38} {before:>8.0f} µs {after:>8.0f} µs {1 - after / before:>6.0%}")
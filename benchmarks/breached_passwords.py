@@ -0,0 +1,147 @@
+"""
+Liste mmap de mots de passe compromis: conversion, ouverture, lookups et mémoire
+
+Écrit une liste de N digests synthétiques (valeurs triées aux écarts
+aléatoires, réparties comme des SHA-1), puis mesure:
+- le temps d'écriture et la taille du fichier
+- le temps d'ouverture (constant, quelle que soit la taille)
+- le temps moyen d'un lookup présent (contains_digest) et d'un mot de passe
+  absent (is_breached, SHA-1 compris), et le nombre moyen de sondes
+- la mémoire ajoutée au processus par MEMORY_LOOKUPS inscriptions, lue dans
+  /proc/self/smaps_rollup (Linux): pages du fichier projetées (Rss
+  fichier: pages propres du page cache, partagées entre workers et
+  récupérables par le noyau) et mémoire anonyme allouée par le processus.
+  Le noyau projette jusqu'à 64 Ko autour de chaque page lue (fault-around):
+  les pages projetées croissent avec le nombre de lookups, jusqu'à la taille
+  du fichier, sans mémoire anonyme.
+
+Usage:
+    python benchmarks/breached_passwords.py
+    python benchmarks/breached_passwords.py --sizes 10000000 100000000 --digest-size 8
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from auth_common.breached_passwords import SHA1_SIZE, BreachedPasswords, write_breached
+
+LOOKUPS = 20000
+MEMORY_LOOKUPS = 1000
+
+
+def synthetic_digests(count: int, samples: list, every: int, seed: int = 1):
+    """
+    Digests de 20 octets triés, aux écarts aléatoires (écart moyen constant), générés en flux
+
+    Args:
+        count: Nombre de digests
+        samples: Liste complétée avec un digest sur `every` (lookups présents)
+        every: Période d'échantillonnage
+
+    Yields:
+        bytes: Digests en ordre croissant
+    """
+    rng = random.Random(seed)
+    step = (1 << 160) // (count + 10 * math.isqrt(count) + 10)
+    value = 0
+    for row in range(count):
+        value += 1 + rng.randrange(2 * step)
+        digest = value.to_bytes(SHA1_SIZE, "big")
+        if row % every == 0:
+            samples.append(digest)
+        yield digest
+
+
+def memory_usage() -> dict:
+    """Pages de fichiers projetées et mémoire anonyme du processus courant, en octets"""
+    values = {}
+    with open("/proc/self/smaps_rollup") as source:
+        for line in source:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Anonymous"):
+                values[name] = int(rest.split()[0]) * 1024
+    return {"file": values["Rss"] - values["Anonymous"], "anonymous": values["Anonymous"]}
+
+
+class CountingMap:
+    """Projection instrumentée: compte les sondes de la recherche"""
+
+    def __init__(self, mm):
+        self.mm = mm
+        self.probes = 0
+
+    def __getitem__(self, key):
+        self.probes += 1
+        return self.mm[key]
+
+    def __len__(self):
+        return len(self.mm)
+
+
+def measure(path: str, count: int, digest_size: int) -> dict:
+    samples = []
+    started = time.perf_counter()
+    write_breached(path, synthetic_digests(count, samples, max(1, count // LOOKUPS)), digest_size)
+    write_seconds = time.perf_counter() - started
+
+    before = memory_usage()
+    started = time.perf_counter()
+    breached = BreachedPasswords(path)
+    open_ms = (time.perf_counter() - started) * 1000
+    for i in range(MEMORY_LOOKUPS):
+        breached.is_breached(f"signup-{i}")
+    after = memory_usage()
+
+    rng = random.Random(2)
+    rng.shuffle(samples)
+    started = time.perf_counter()
+    for digest in samples:
+        breached.contains_digest(digest)
+    hit_us = (time.perf_counter() - started) / len(samples) * 1e6
+
+    misses = [f"absent-{i}" for i in range(LOOKUPS)]
+    started = time.perf_counter()
+    for password in misses:
+        breached.is_breached(password)
+    miss_us = (time.perf_counter() - started) / len(misses) * 1e6
+
+    counting = breached._mm = CountingMap(breached._mm)
+    for digest in samples:
+        breached.contains_digest(digest)
+    probes = counting.probes / len(samples)
+    breached._mm = counting.mm
+    breached.close()
+
+    return {
+        "file_mb": os.path.getsize(path) / 1e6,
+        "write_s": write_seconds,
+        "open_ms": open_ms,
+        "hit_us": hit_us,
+        "miss_us": miss_us,
+        "probes": probes,
+        "file_pages_mb": (after["file"] - before["file"]) / 1e6,
+        "anonymous_mb": (after["anonymous"] - before["anonymous"]) / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Liste mmap de mots de passe compromis")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000, 100000000])
+    parser.add_argument("--digest-size", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'entrées':>10} {'fichier':>9} {'écriture':>9} {'ouverture':>10} {'présent':>9} "
+          f"{'absent':>9} {'sondes':>7} {'projeté':>9} {'anonyme':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            result = measure(os.path.join(directory, "pwned.bin"), size, args.digest_size)
+            print(f"{size:>10} {result['file_mb']:>7.0f}Mo {result['write_s']:>8.1f}s "
+                  f"{result['open_ms']:>8.2f}ms {result['hit_us']:>7.2f}µs {result['miss_us']:>7.2f}µs "
+                  f"{result['probes']:>7.1f} {result['file_pages_mb']:>7.1f}Mo {result['anonymous_mb']:>7.1f}Mo", flush=True)
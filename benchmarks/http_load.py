@@ -0,0 +1,120 @@
+"""
+Générateur de charge HTTP minimal (bibliothèque standard uniquement)
+
+Ouvre N connexions keep-alive en parallèle et enchaîne les requêtes sur
+une URL pendant une durée donnée, puis affiche le débit et les latences.
+
+Usage:
+    python benchmarks/http_load.py http://127.0.0.1:8002/ -c 16 -d 10
+    python benchmarks/http_load.py http://127.0.0.1:5000/ -u daniel:datascientest
+"""
+
+import argparse
+import base64
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(url, headers, deadline, latencies, errors, lock):
+    """Boucle d'une connexion: envoie des requêtes jusqu'à l'échéance"""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    local_latencies = []
+    local_errors = 0
+
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                local_errors += 1
+            # La connexion est rouverte si le serveur ne fait pas de keep-alive
+            if response.getheader("connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        local_latencies.append(time.perf_counter() - t0)
+
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def run(url, connections=16, duration=10.0, headers=None):
+    """
+    Lance le test de charge
+
+    Args:
+        url: URL cible
+        connections: Nombre de connexions parallèles
+        duration: Durée du test en secondes
+        headers: En-têtes HTTP additionnels
+
+    Returns:
+        dict: requests, rps, errors, p50_ms, p99_ms
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    threads = [
+        threading.Thread(target=worker, args=(url, headers or {}, deadline, latencies, errors, lock))
+        for _ in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "errors": sum(errors),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge HTTP keep-alive")
+    parser.add_argument("url")
+    parser.add_argument("-c", "--connections", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("-u", "--user", help="Credentials Basic (user:password)")
+    parser.add_argument("-H", "--header", action="append", default=[],
+                        help="En-tête additionnel (Nom: valeur)")
+    args = parser.parse_args()
+
+    headers = {}
+    for header in args.header:
+        name, _, value = header.partition(":")
+        headers[name.strip()] = value.strip()
+    if args.user:
+        headers["Authorization"] = "Basic " + base64.b64encode(args.user.encode()).decode()
+
+    result = run(args.url, args.connections, args.duration, headers)
+    print(f"{result['requests']} requêtes en {args.duration:.0f}s")
+    print(f"débit:   {result['rps']:.1f} req/s")
+    print(f"latence: p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    print(f"erreurs: {result['errors']}")
@@ -0,0 +1,123 @@
+"""
+Simulation des vagues de reconnexion après une panne
+
+N clients se reconnectent ensemble à la reprise du service (dans les
+--ramp premières secondes), puis gardent leur session en se reconnectant à
+chaque expiration de token. Chaque client envoie des requêtes à intervalles
+aléatoires (loi exponentielle de moyenne --interval secondes).
+
+Trois politiques sont comparées, avec auth_common.token_expiry:
+- durée fixe: le client se reconnecte au premier 401, à sa première requête
+  après l'expiration. Les clients restent synchronisés: chaque période
+  reproduit le pic de la reprise.
+- jitter: durée de chaque token tirée dans [durée x (1 - jitter), durée].
+  Les vagues s'élargissent à chaque cycle.
+- jitter + indication: à la première requête dans la fenêtre de
+  renouvellement (en-tête X-Token-Expires-In), le client renouvelle son
+  token à un instant tiré au hasard avant l'expiration.
+
+Le rapport donne le débit de connexions (pic et p99 sur des tranches de
+10 secondes, hors vague de reprise) et la courbe des connexions par tranche
+de 2 minutes.
+
+Usage:
+    python benchmarks/login_storm.py
+    python benchmarks/login_storm.py --clients 50000 --lifetime 600 --hours 2
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from auth_common.token_expiry import ExpiryPolicy
+
+BUCKET = 10      # secondes par tranche pour le débit
+CURVE_BUCKET = 120  # secondes par caractère de la courbe
+BARS = " ▁▂▃▄▅▆▇█"
+
+
+def simulate(policy: ExpiryPolicy, clients: int, ramp: float, interval: float,
+             horizon: float, hints: bool, seed: int = 1) -> list:
+    """
+    Instants de connexion de tous les clients jusqu'à l'horizon
+
+    Args:
+        policy: Durée des tokens (jitter) et fenêtre de renouvellement
+        clients: Nombre de clients
+        ramp: Durée de la vague de reprise (secondes)
+        interval: Intervalle moyen entre deux requêtes d'un client (secondes)
+        horizon: Durée simulée (secondes)
+        hints: True si les clients suivent l'indication de renouvellement
+
+    Returns:
+        list: Instants de connexion (secondes)
+    """
+    rng = random.Random(seed)
+    window = policy.base_lifetime * policy.refresh_window
+    logins = []
+    for _ in range(clients):
+        t = rng.uniform(0, ramp)
+        while t < horizon:
+            logins.append(t)
+            expires_at = t + policy.lifetime()
+            # Première requête après l'entrée dans la fenêtre (loi sans mémoire)
+            hinted_at = expires_at - window + rng.expovariate(1 / interval)
+            if hints and hinted_at < expires_at:
+                t = rng.uniform(hinted_at, expires_at)
+            else:
+                # Premier 401: première requête après l'expiration
+                t = expires_at + rng.expovariate(1 / interval)
+    return logins
+
+
+def histogram(times, bucket: float, horizon: float) -> list:
+    counts = [0] * (int(horizon // bucket) + 1)
+    for t in times:
+        if t < horizon:
+            counts[int(t // bucket)] += 1
+    return counts
+
+
+def report(label, logins, ramp, horizon, peak_max):
+    # Débit hors vague de reprise: à partir de 2 x ramp
+    counts = histogram([t for t in logins if t >= 2 * ramp], BUCKET, horizon)
+    rates = sorted(count / BUCKET for count in counts)
+    peak = rates[-1]
+    p99 = rates[int(len(rates) * 0.99)]
+    curve = histogram(logins, CURVE_BUCKET, horizon)
+    line = "".join(BARS[min(len(BARS) - 1, round(count / peak_max * (len(BARS) - 1)))] for count in curve)
+    print(f"{label:<22} {peak:>9.1f} {p99:>9.1f}   |{line}|")
+    return peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vagues de reconnexion: durée fixe, jitter, indication de renouvellement")
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--lifetime", type=float, default=1800, help="Durée des tokens (secondes)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--refresh-window", type=float, default=0.2)
+    parser.add_argument("--interval", type=float, default=60, help="Intervalle moyen entre requêtes (secondes)")
+    parser.add_argument("--ramp", type=float, default=30, help="Durée de la vague de reprise (secondes)")
+    parser.add_argument("--hours", type=float, default=4)
+    args = parser.parse_args()
+    horizon = args.hours * 3600
+
+    scenarios = [
+        ("durée fixe", ExpiryPolicy(args.lifetime, 0, args.refresh_window, seed=1), False),
+        ("jitter", ExpiryPolicy(args.lifetime, args.jitter, args.refresh_window, seed=1), False),
+        ("jitter + indication", ExpiryPolicy(args.lifetime, args.jitter, args.refresh_window, seed=1), True),
+    ]
+    results = [(label, simulate(policy, args.clients, args.ramp, args.interval, horizon, hints))
+               for label, policy, hints in scenarios]
+    # Échelle commune des courbes: plus forte tranche hors vague de reprise
+    peak_max = max(max(histogram([t for t in logins if t >= CURVE_BUCKET], CURVE_BUCKET, horizon))
+                   for _, logins in results)
+
+    print(f"{args.clients} clients, tokens de {args.lifetime:.0f} s, jitter {args.jitter:.0%}, "
+          f"fenêtre {args.refresh_window:.0%}, une requête toutes les {args.interval:.0f} s en moyenne")
+    print(f"{'politique':<22} {'pic/s':>9} {'p99/s':>9}   connexions par tranche de {CURVE_BUCKET // 60} min")
+    peaks = [report(label, logins, args.ramp, horizon, peak_max) for label, logins in results]
+    print(f"pic divisé par {peaks[0] / peaks[1]:.1f} (jitter), {peaks[0] / peaks[2]:.1f} (jitter + indication)")
@@ -0,0 +1,323 @@
+"""
+Allocations mémoire par requête sur les routes d'authentification (tracemalloc)
+
+Chaque route est appelée N fois en processus, sans serveur ni client HTTP
+(appel ASGI/WSGI direct), sous tracemalloc. Le rapport donne, par route, les
+blocs et octets alloués par requête et les lignes du dépôt qui allouent le
+plus.
+
+tracemalloc ne voit que la mémoire encore vivante au moment du snapshot: un
+objet temporaire (exception construite d'avance, copie d'un dict) est libéré
+avant. Pendant la mesure, un hook de profilage (sys.setprofile) garde donc
+une référence aux variables locales de chaque fonction à son retour: tout
+objet affecté à une variable pendant la requête reste vivant et apparaît dans
+le snapshot. Les temporaires sans nom ne sont pas comptés.
+
+Une allocation est attribuée au dépôt quand sa pile contient un fichier de
+l'API ou de auth_common (y compris les objets du framework créés depuis ce
+code, ex: HTTPException); le rapport l'affecte à la ligne du dépôt la plus
+profonde. Les budgets (BUDGETS) portent sur ces allocations: avec --check, le
+script échoue (code 1) si une route dépasse son budget, pour bloquer en CI un
+changement qui alourdit un chemin d'authentification.
+
+Usage:
+    python benchmarks/route_allocations.py
+    python benchmarks/route_allocations.py --apps fastapi-oauth -n 200 --top 10
+    python benchmarks/route_allocations.py --check
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from collections import namedtuple
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+from serve import APPS, load_app
+
+# Profondeur des piles enregistrées (assez pour remonter du framework au code du dépôt)
+TRACEBACK_FRAMES = 16
+
+Request = namedtuple("Request", "method path headers body", defaults=(None, b""))
+
+FORM = {"content-type": "application/x-www-form-urlencoded"}
+JSON = {"content-type": "application/json"}
+OAUTH_LOGIN = Request("POST", "/token", FORM, b"username=danieldatascientest&password=datascientest")
+BASIC_DANIEL = {"authorization": "Basic " + base64.b64encode(b"daniel:datascientest").decode()}
+
+# nom -> (authentification: requête qui renvoie un access_token ou en-têtes
+# fixes, routes mesurées; une route sans en-têtes reçoit ceux de l'authentification)
+SCENARIOS = {
+    "fastapi-oauth": (OAUTH_LOGIN, [
+        Request("GET", "/secured"),
+        Request("GET", "/me"),
+        OAUTH_LOGIN,
+    ]),
+    "fastapi-basic": (BASIC_DANIEL, [
+        Request("GET", "/user"),
+        Request("GET", "/me"),
+    ]),
+    "fastapi-jwt": (Request("POST", "/user/signup", JSON, b'{"username": "daniel", "password": "datascientest"}'), [
+        Request("GET", "/secured"),
+    ]),
+    "flask-jwt": (Request("POST", "/login", JSON, b'{"username": "danieldatascientest", "password": "datascientest"}'), [
+        Request("GET", "/user"),
+        Request("GET", "/resource"),
+    ]),
+}
+
+# "api MÉTHODE chemin" -> (blocs, octets) alloués par requête depuis le code
+# du dépôt: mesure + 10 % environ (Python 3.11, versions de requirements.txt).
+# Mettre à jour (à la baisse de préférence) quand un changement de chemin
+# d'authentification est voulu.
+BUDGETS = {
+    "fastapi-oauth GET /secured": (32, 2650),
+    "fastapi-oauth GET /me": (35, 3100),
+    "fastapi-oauth POST /token": (172, 15400),
+    "fastapi-basic GET /user": (300, 28000),
+    "fastapi-basic GET /me": (300, 28200),
+    "fastapi-jwt GET /secured": (39, 3750),
+    "flask-jwt GET /user": (51, 3600),
+    "flask-jwt GET /resource": (49, 3400),
+}
+
+
+class ASGIDriver:
+    """Appelle une application ASGI directement, sur une boucle dédiée, lifespan compris"""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.lifespan = app.router.lifespan_context(app)
+        self.loop.run_until_complete(self.lifespan.__aenter__())
+
+    async def _request(self, request: Request):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": request.method, "scheme": "http", "path": request.path,
+            "raw_path": request.path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(name.encode(), value.encode()) for name, value in request.headers.items()],
+            "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 80),
+        }
+        messages = [{"type": "http.request", "body": request.body, "more_body": False}]
+        response = {"status": None, "body": []}
+
+        async def receive():
+            return messages.pop() if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return response["status"], b"".join(response["body"])
+
+    def request(self, request: Request):
+        return self.loop.run_until_complete(self._request(request))
+
+    def close(self):
+        self.loop.run_until_complete(self.lifespan.__aexit__(None, None, None))
+        self.loop.close()
+
+
+class WSGIDriver:
+    """Appelle une application WSGI directement"""
+
+    def __init__(self, app):
+        from werkzeug.test import EnvironBuilder
+        self.app = app
+        self.builder = EnvironBuilder
+
+    def request(self, request: Request):
+        environ = self.builder(path=request.path, method=request.method,
+                               headers=request.headers, data=request.body).get_environ()
+        status = []
+        result = self.app(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+        try:
+            return status[0] if status else None, b"".join(result)
+        finally:
+            getattr(result, "close", lambda: None)()
+
+    def close(self):
+        pass
+
+
+class LocalsRecorder:
+    """
+    Hook de profilage qui garde les variables locales de chaque fonction à son
+    retour (pendant l'enregistrement uniquement), dans tous les threads
+    """
+
+    def __init__(self):
+        self.recording = False
+        self.kept = []
+
+    def __call__(self, frame, event, arg):
+        if self.recording and event == "return":
+            self.kept.append(frame.f_locals)
+
+    def install(self):
+        sys.setprofile(self)
+        threading.setprofile(self)
+
+    def uninstall(self):
+        sys.setprofile(None)
+        threading.setprofile(None)
+
+
+def authenticate(driver, auth) -> dict:
+    if isinstance(auth, dict):
+        return auth
+    status, body = driver.request(auth)
+    if status != 200:
+        raise RuntimeError(f"{auth.method} {auth.path}: {status} {body[:200]!r}")
+    return {"authorization": "Bearer " + json.loads(body)["access_token"]}
+
+
+def measure_route(driver, request: Request, app_files, count: int, recorder: LocalsRecorder, top: int) -> dict:
+    """
+    Mesure les allocations d'une route sur `count` requêtes
+
+    Returns:
+        dict: blocs/octets par requête (dépôt et total) et lignes du dépôt
+    """
+    for _ in range(10):
+        status, body = driver.request(request)
+    if status >= 400:
+        raise RuntimeError(f"{request.method} {request.path}: {status} {body[:200]!r}")
+
+    filters = [
+        tracemalloc.Filter(False, __file__, all_frames=False),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "*/loop_monitor.py", all_frames=True),
+    ]
+    tracemalloc.start(TRACEBACK_FRAMES)
+    before = tracemalloc.take_snapshot()
+    recorder.recording = True
+    for _ in range(count):
+        driver.request(request)
+    recorder.recording = False
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    recorder.kept.clear()
+
+    # Le hook ralentit tout le code Python: suspendu pendant l'analyse
+    sys.setprofile(None)
+    before = before.filter_traces(filters)
+    after = after.filter_traces(filters)
+
+    total_blocks = total_bytes = app_blocks = app_bytes = 0
+    lines = {}
+    for diff in after.compare_to(before, "traceback"):
+        if diff.count_diff <= 0:
+            continue
+        total_blocks += diff.count_diff
+        total_bytes += diff.size_diff
+        # Pile de la plus ancienne à la plus récente: dernière ligne du dépôt
+        frame = next((frame for frame in reversed(diff.traceback) if frame.filename in app_files), None)
+        if frame is None:
+            continue
+        app_blocks += diff.count_diff
+        app_bytes += diff.size_diff
+        key = (os.path.relpath(frame.filename, ROOT_DIR), frame.lineno)
+        blocks, size = lines.get(key, (0, 0))
+        lines[key] = (blocks + diff.count_diff, size + diff.size_diff)
+
+    sys.setprofile(recorder)
+    ranked = sorted(lines.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return {
+        "blocks": app_blocks / count,
+        "bytes": app_bytes / count,
+        "total_blocks": total_blocks / count,
+        "total_bytes": total_bytes / count,
+        "lines": [(f"{path}:{lineno}", blocks / count, size / count)
+                  for (path, lineno), (blocks, size) in ranked],
+    }
+
+
+def app_source_files(module) -> set:
+    common = os.path.join(ROOT_DIR, "auth_common")
+    files = {os.path.abspath(module.__file__)}
+    files.update(os.path.join(common, name) for name in os.listdir(common) if name.endswith(".py"))
+    return files
+
+
+def run(names, count: int, top: int):
+    """
+    Mesure les routes des APIs demandées
+
+    Yields:
+        tuple: (libellé de la route, résultat de measure_route)
+    """
+    # Hors requête, la boucle ASGI ne tourne pas: la surveillance de boucle
+    # la verrait bloquée
+    logging.getLogger("auth_common.loop_monitor").disabled = True
+    recorder = LocalsRecorder()
+    recorder.install()
+    try:
+        for name in names:
+            app = load_app(name)
+            module = sys.modules[APPS[name][1].split(":")[0]]
+            driver = ASGIDriver(app) if APPS[name][2] == "asgi" else WSGIDriver(app)
+            try:
+                if hasattr(module, "warmup"):
+                    module.warmup.wait()
+                auth, routes = SCENARIOS[name]
+                headers = authenticate(driver, auth)
+                for request in routes:
+                    if request.headers is None:
+                        request = request._replace(headers=headers)
+                    label = f"{name} {request.method} {request.path}"
+                    yield label, measure_route(driver, request, app_source_files(module),
+                                               count, recorder, top)
+            finally:
+                driver.close()
+    finally:
+        recorder.uninstall()
+
+
+def over_budget(label: str, result: dict):
+    """Retourne un message si la route dépasse son budget, None sinon"""
+    budget = BUDGETS.get(label)
+    if budget is None:
+        return f"{label}: pas de budget (ajouter une entrée à BUDGETS)"
+    blocks, size = budget
+    if result["blocks"] > blocks or result["bytes"] > size:
+        return (f"{label}: {result['blocks']:.1f} blocs / {result['bytes']:.0f} o par requête, "
+                f"budget {blocks} blocs / {size} o")
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Allocations par requête des routes d'authentification")
+    parser.add_argument("--apps", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("-n", "--requests", type=int, default=100, help="Requêtes mesurées par route")
+    parser.add_argument("--top", type=int, default=5, help="Lignes du dépôt affichées par route")
+    parser.add_argument("--check", action="store_true", help="Échoue si une route dépasse son budget")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'route':<30} {'blocs':>7} {'octets':>8} {'budget':>15} {'total blocs':>12} {'total octets':>13}")
+    for label, result in run(args.apps, args.requests, args.top):
+        blocks, size = BUDGETS.get(label, ("-", "-"))
+        print(f"{label:<30} {result['blocks']:>7.1f} {result['bytes']:>8.0f} {f'{blocks} / {size}':>15} "
+              f"{result['total_blocks']:>12.1f} {result['total_bytes']:>13.0f}")
+        for line, line_blocks, line_bytes in result["lines"]:
+            print(f"    {line:<44} {line_blocks:>7.1f} {line_bytes:>8.0f}")
+        message = over_budget(label, result)
+        if message:
+            failures.append(message)
+
+    if args.check:
+        for message in failures:
+            print(f"BUDGET DÉPASSÉ {message}")
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,94 @@
+"""
+Vérification d'un token: JWT (HS256) vs session opaque côté serveur
+
+Mesure le temps moyen de création et de vérification d'un token:
+- JWT HS256 avec les claims de fastapi_oauth (sub, scp, exp): base64, JSON
+  et HMAC à chaque vérification, avec PyJWT et avec le trousseau des APIs
+  (auth_common.keyring: HMAC préparé une fois par clé)
+- session opaque (auth_common.sessions): hash SHA-256 du token puis lecture
+  dans le stockage, pour chaque stockage (mémoire, SQLite, backend d'état en
+  mémoire: le même code que Redis, sans le réseau)
+
+Les stockages contiennent --sessions sessions; les vérifications tirent des
+tokens au hasard parmi elles.
+
+Usage:
+    python benchmarks/session_tokens.py
+    python benchmarks/session_tokens.py --sessions 1000000 --lookups 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from auth_common.keyring import KeyRing
+from auth_common.sessions import SessionStore, SharedSessionStore, SQLiteSessionStore
+from auth_common.state import MemoryBackend
+
+SECRET_KEY = "edc30d44e02ebfc88f2ea5060aef05d4a6f028f284d8d9f4cd3b2d03c195af09"
+ALGORITHMS = ["HS256"]
+
+
+def per_op_us(function, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def measure_jwt(count: int, lookups: int, encode, decode) -> tuple:
+    expire = datetime.utcnow() + timedelta(minutes=30)
+    claims = [{"sub": f"user{i:08d}", "scp": 3, "exp": expire} for i in range(count)]
+    create_us = per_op_us(encode, claims[:lookups])
+    tokens = [encode(data) for data in claims[:lookups]]
+    verify_us = per_op_us(decode, tokens)
+    return create_us, verify_us
+
+
+def measure_store(store, count: int, lookups: int) -> tuple:
+    usernames = [f"user{i:08d}" for i in range(count)]
+    started = time.perf_counter()
+    tokens = [store.create(username, {"scp": 3}) for username in usernames]
+    create_us = (time.perf_counter() - started) / count * 1e6
+    rng = random.Random(1)
+    sample = [tokens[rng.randrange(count)] for _ in range(lookups)]
+    verify_us = per_op_us(store.get, sample)
+    assert all(store.get(token) is not None for token in sample[:100])
+    return create_us, verify_us
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JWT vs sessions opaques: création et vérification")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+    lookups = min(args.lookups, args.sessions)
+
+    print(f"{'token':<32} {'création':>10} {'vérification':>13}")
+    keyring = KeyRing({"default": SECRET_KEY}, "default")
+    codecs = [
+        ("JWT HS256 (PyJWT)", lambda data: jwt.encode(data, SECRET_KEY, algorithm="HS256"),
+         lambda token: jwt.decode(token, SECRET_KEY, algorithms=ALGORITHMS)),
+        ("JWT HS256 (trousseau)", keyring.encode, keyring.decode),
+    ]
+    for label, encode, decode in codecs:
+        create_us, verify_us = measure_jwt(args.sessions, lookups, encode, decode)
+        print(f"{label:<32} {create_us:>8.2f}µs {verify_us:>11.2f}µs", flush=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores = [
+            ("session opaque (mémoire)", SessionStore()),
+            ("session opaque (SQLite)", SQLiteSessionStore(os.path.join(directory, "sessions.db"))),
+            ("session opaque (backend d'état)", SharedSessionStore(MemoryBackend())),
+        ]
+        for label, store in stores:
+            create_us, verify_us = measure_store(store, args.sessions, lookups)
+            print(f"{label:<32} {create_us:>8.2f}µs {verify_us:>11.2f}µs", flush=True)
@@ -0,0 +1,128 @@
+"""
+Mémoire et temps de lookup: dict de dicts vs CompactUserTable
+
+Génère N utilisateurs synthétiques au format de fastapi_oauth (hash
+pbkdf2_sha256 passlib, name, email, resource, scopes), décodés depuis du
+JSON comme s'ils étaient lus dans un stockage, puis mesure pour chaque
+représentation:
+- les octets par utilisateur: tracemalloc pour le dict de dicts,
+  CompactUserTable.nbytes() pour la table (ses buffers; tracemalloc donne le
+  même résultat mais multiplie par 30 le temps de construction)
+- le temps moyen d'un lookup réussi et d'un lookup d'username inconnu
+
+Le dict de dicts n'est mesuré que jusqu'à --baseline-max utilisateurs
+(environ 1 Ko par utilisateur: 10M ne tiennent pas dans une petite VM).
+
+Usage:
+    python benchmarks/user_memory.py
+    python benchmarks/user_memory.py --sizes 100000 1000000 --baseline-max 1000000
+"""
+
+import argparse
+import base64
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from auth_common.compact_users import CompactUserTable
+
+RESOURCES = ("Module DE", "Module DS", "Module MLE")
+LOOKUPS = 200000
+
+
+def _ab64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=").replace("+", ".")
+
+
+def synthetic_users(count: int, seed: int = 0):
+    """Utilisateurs synthétiques (username, dict), décodés depuis du JSON"""
+    rng = random.Random(seed)
+    for i in range(count):
+        username = f"user{i:08d}"
+        hashed = f"$pbkdf2-sha256$29000${_ab64(rng.randbytes(16))}${_ab64(rng.randbytes(32))}"
+        line = (
+            f'{{"username": "{username}", "name": "User {i}", "email": "{username}@example.com", '
+            f'"hashed_password": "{hashed}", "resource": "{RESOURCES[i % 3]}", '
+            f'"scopes": ["profile", "resource"]}}'
+        )
+        yield username, json.loads(line)
+
+
+def build_dict(count: int) -> dict:
+    return dict(synthetic_users(count))
+
+
+def build_compact(count: int) -> CompactUserTable:
+    table = CompactUserTable(
+        "hashed_password",
+        text_fields=("username", "name", "email"),
+        interned_fields=("resource", "scopes"),
+    )
+    for username, user in synthetic_users(count):
+        table[username] = user
+    return table
+
+
+def measure(build, count: int) -> dict:
+    """
+    Construit une représentation et mesure sa mémoire et ses lookups
+
+    Returns:
+        dict: Octets par utilisateur et temps moyens de lookup (µs)
+    """
+    gc.collect()
+    if build is build_compact:
+        users = build(count)
+        current = users.nbytes()
+    else:
+        tracemalloc.start()
+        users = build(count)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    rng = random.Random(1)
+    hits = [f"user{rng.randrange(count):08d}" for _ in range(LOOKUPS)]
+    misses = [f"ghost{i:08d}" for i in range(LOOKUPS)]
+
+    get = users.get
+    started = time.perf_counter()
+    for username in hits:
+        get(username)
+    hit_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+    started = time.perf_counter()
+    for username in misses:
+        get(username)
+    miss_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+
+    del users
+    gc.collect()
+    return {
+        "bytes_per_user": current / count,
+        "hit_us": hit_us,
+        "miss_us": miss_us,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mémoire par utilisateur: dict vs table compacte")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--baseline-max", type=int, default=1000000,
+                        help="Taille maximale mesurée pour le dict de dicts")
+    args = parser.parse_args()
+
+    print(f"{'représentation':<16} {'utilisateurs':>12} {'octets/util.':>13} "
+          f"{'lookup':>9} {'inconnu':>9}")
+    for size in args.sizes:
+        candidates = [("CompactUserTable", build_compact)]
+        if size <= args.baseline_max:
+            candidates.insert(0, ("dict de dicts", build_dict))
+        for name, build in candidates:
+            result = measure(build, size)
+            print(f"{name:<16} {size:>12} {result['bytes_per_user']:>13.0f} "
+                  f"{result['hit_us']:>7.2f}µs {result['miss_us']:>7.2f}µs", flush=True)
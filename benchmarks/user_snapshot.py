@@ -0,0 +1,109 @@
+"""
+Snapshot mmap des utilisateurs: ouverture, lookups et mémoire par worker
+
+Écrit un snapshot de N utilisateurs synthétiques (mêmes utilisateurs que
+benchmarks/user_memory.py), puis mesure:
+- le temps d'écriture et la taille du fichier
+- le temps d'ouverture (constant, quelle que soit la taille)
+- le temps moyen d'un lookup
+- la mémoire de W workers (processus forkés) qui ouvrent chacun le snapshot et
+  le parcourent en entier: Pss (mémoire proportionnelle, pages partagées
+  divisées entre les processus) et Private (pages propres au worker), lus
+  dans /proc/self/smaps_rollup (Linux)
+
+Usage:
+    python benchmarks/user_snapshot.py
+    python benchmarks/user_snapshot.py --sizes 100000 1000000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from auth_common.user_snapshot import UserSnapshot, write_snapshot
+from user_memory import LOOKUPS, synthetic_users
+
+
+def smaps_rollup() -> dict:
+    """Pss et mémoire privée du processus courant, en octets"""
+    values = {}
+    with open("/proc/self/smaps_rollup") as source:
+        for line in source:
+            name, _, rest = line.partition(":")
+            if name in ("Pss", "Private_Clean", "Private_Dirty"):
+                values[name] = int(rest.split()[0]) * 1024
+    return {"pss": values["Pss"], "private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def worker(path: str, barrier, results):
+    """Ouvre le snapshot, lit toutes les pages, attend les autres workers puis mesure"""
+    before = smaps_rollup()
+    snapshot = UserSnapshot(path)
+    for username in snapshot:
+        snapshot.get(username)
+    barrier.wait()
+    after = smaps_rollup()
+    results.put({key: after[key] - before[key] for key in after})
+    barrier.wait()
+
+
+def measure(path: str, count: int, workers: int) -> dict:
+    started = time.perf_counter()
+    write_snapshot(path, synthetic_users(count), "hashed_password",
+                   text_fields=("username", "name", "email"),
+                   interned_fields=("resource", "scopes"))
+    write_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    snapshot = UserSnapshot(path)
+    open_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(1)
+    hits = [f"user{rng.randrange(count):08d}" for _ in range(LOOKUPS)]
+    get = snapshot.get
+    started = time.perf_counter()
+    for username in hits:
+        get(username)
+    hit_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+    snapshot.close()
+
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(path, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    per_worker = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    return {
+        "file_mb": os.path.getsize(path) / 1e6,
+        "write_s": write_seconds,
+        "open_ms": open_ms,
+        "hit_us": hit_us,
+        "pss_mb": max(result["pss"] for result in per_worker) / 1e6,
+        "private_mb": max(result["private"] for result in per_worker) / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot mmap: ouverture, lookups, mémoire par worker")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'utilisateurs':>12} {'fichier':>9} {'écriture':>9} {'ouverture':>10} "
+          f"{'lookup':>9} {'Pss/worker':>11} {'privé/worker':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            result = measure(os.path.join(directory, "users.snap"), size, args.workers)
+            print(f"{size:>12} {result['file_mb']:>7.0f}Mo {result['write_s']:>8.1f}s "
+                  f"{result['open_ms']:>8.2f}ms {result['hit_us']:>7.2f}µs "
+                  f"{result['pss_mb']:>9.0f}Mo {result['private_mb']:>11.1f}Mo", flush=True)
@@ -0,0 +1,102 @@
+"""
+Conversion d'une liste publiée de mots de passe compromis (auth_common.breached_passwords)
+
+Lit le dump texte des mots de passe compromis au format SHA-1, trié par hash
+("ordered by hash"): une ligne `HASH:OCCURRENCES` par mot de passe, hash en
+hexadécimal (40 caractères). Le fichier (plusieurs dizaines de Go) est lu en
+un seul passage, en flux: la mémoire reste constante. Le résultat est le
+fichier binaire trié que les APIs projettent en mémoire avec
+BREACHED_PASSWORDS_PATH.
+
+- --digest-size tronque les digests (20 octets par défaut, 8 divise le
+  fichier par 2,5 avec un taux de faux positifs négligeable)
+- --min-count ignore les mots de passe vus moins de N fois dans les fuites
+- "-" lit l'entrée standard (ex: `7z x -so pwned.7z | python ...`)
+
+Le fichier est écrit dans un fichier temporaire puis renommé.
+
+Usage:
+    python build_breached_passwords.py pwned-passwords-sha1-ordered-by-hash.txt --out pwned.bin
+    python build_breached_passwords.py - --out pwned.bin --digest-size 8 --min-count 2 < dump.txt
+    BREACHED_PASSWORDS_PATH=pwned.bin python serve.py fastapi-jwt
+"""
+
+import argparse
+import sys
+import time
+
+from auth_common.breached_passwords import SHA1_SIZE, BreachedPasswords, write_breached
+
+PROGRESS_INTERVAL = 2.0  # secondes
+
+
+def read_digests(source, min_count: int = 1, report=None):
+    """
+    Lit les digests d'un dump texte `HASH:OCCURRENCES`, un par un
+
+    Args:
+        source: Fichier texte ouvert (une ligne par mot de passe)
+        min_count: Occurrences minimales pour garder un mot de passe
+        report: Fonction (lignes lues, débit) appelée périodiquement
+
+    Yields:
+        bytes: SHA-1 (20 octets), dans l'ordre du fichier
+
+    Raises:
+        ValueError: Si une ligne n'est pas au format attendu
+    """
+    started = last_report = time.monotonic()
+    number = 0
+    for number, line in enumerate(source, start=1):
+        value, _, count = line.strip().partition(":")
+        if not value:
+            continue
+        if len(value) != 2 * SHA1_SIZE:
+            raise ValueError(f"ligne {number}: SHA-1 attendu, {value[:50]!r}")
+        try:
+            digest = bytes.fromhex(value)
+            if min_count > 1 and int(count or 1) < min_count:
+                continue
+        except ValueError:
+            raise ValueError(f"ligne {number}: format HASH:OCCURRENCES attendu, {line[:60]!r}") from None
+        yield digest
+        if report and number % 100000 == 0:
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                report(number, number / (now - started))
+                last_report = now
+    if report:
+        elapsed = time.monotonic() - started
+        report(number, number / elapsed if elapsed else 0.0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convertit un dump SHA-1 de mots de passe compromis en liste mmap")
+    parser.add_argument("input", help="Dump texte HASH:OCCURRENCES trié par hash (- pour l'entrée standard)")
+    parser.add_argument("--out", required=True, help="Fichier binaire (BREACHED_PASSWORDS_PATH)")
+    parser.add_argument("--digest-size", type=int, default=SHA1_SIZE,
+                        help="Octets gardés par digest (4 à 20, défaut: 20)")
+    parser.add_argument("--min-count", type=int, default=1,
+                        help="Occurrences minimales pour garder un mot de passe")
+    return parser.parse_args(argv)
+
+
+def print_progress(lines: int, rate: float):
+    print(f"\r{lines} lignes lues ({rate:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    source = sys.stdin if arguments.input == "-" else open(arguments.input, encoding="ascii")
+
+    started = time.perf_counter()
+    with source:
+        count = write_breached(arguments.out, read_digests(source, arguments.min_count, print_progress),
+                               arguments.digest_size)
+    print(file=sys.stderr)
+    print(f"{count} mots de passe écrits dans {arguments.out} "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    BreachedPasswords(arguments.out).close()
+    print(f"ouverture: {(time.perf_counter() - started) * 1000:.2f} ms")
@@ -0,0 +1,56 @@
+"""
+Construction du snapshot binaire des utilisateurs (auth_common.user_snapshot)
+
+Lit le stockage des utilisateurs (SQLite, USER_STORE_PATH) en flux et écrit
+un snapshot au format de l'API cible. Les workers l'ouvrent avec
+USER_SNAPSHOT_PATH: le fichier est projeté en mémoire (mmap) et ses pages
+sont partagées par tous les workers via le page cache.
+
+Le snapshot est écrit dans un fichier temporaire puis renommé: les workers
+déjà lancés détectent le nouveau fichier et le rechargent sans redémarrer
+(auth_common.user_reloader).
+
+Usage:
+    python build_user_snapshot.py --db users.db --app fastapi-oauth --out users.snap
+    USER_SNAPSHOT_PATH=users.snap python serve.py fastapi-oauth --workers 8
+"""
+
+import argparse
+import time
+
+from auth_common.user_snapshot import UserSnapshot, write_snapshot
+from auth_common.user_store import UserStore
+
+# nom -> (champ du hash, champs texte, champs internés), comme les
+# CompactUserTable des APIs
+SCHEMAS = {
+    "flask-basic": ("password", ("private",), ("role",)),
+    "flask-jwt": ("hashed_password", ("username", "name", "email"), ("resource",)),
+    "fastapi-basic": ("hashed_password", ("username", "name"), ()),
+    "fastapi-oauth": ("hashed_password", ("username", "name", "email"), ("resource", "scopes")),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Construit le snapshot mmap des utilisateurs")
+    parser.add_argument("--db", required=True, help="Fichier SQLite du stockage (USER_STORE_PATH)")
+    parser.add_argument("--app", choices=sorted(SCHEMAS), required=True,
+                        help="API cible (format des dicts utilisateurs)")
+    parser.add_argument("--out", required=True, help="Fichier snapshot (USER_SNAPSHOT_PATH)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    hash_field, text_fields, interned_fields = SCHEMAS[arguments.app]
+    store = UserStore(arguments.db, hash_field=hash_field)
+
+    started = time.perf_counter()
+    count = write_snapshot(arguments.out, store.scan_users(), hash_field,
+                           text_fields=text_fields, interned_fields=interned_fields)
+    print(f"{count} utilisateurs écrits dans {arguments.out} "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    started = time.perf_counter()
+    UserSnapshot(arguments.out).close()
+    print(f"ouverture: {(time.perf_counter() - started) * 1000:.2f} ms")
@@ -1,13 +1,68 @@
-from fastapi import Depends, FastAPI, HTTPException, status
+import itertools
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from passlib.context import CryptContext
 
+# Rendre le package partagé auth_common importable (racine du dépôt)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from auth_common import hash_wrap
+from auth_common.asgi_auth import AuthMiddleware, AuthRule
+from auth_common.compact_users import CompactUserTable
+from auth_common.kdf_limiter import KDFLimiter, KDFOverloaded
+from auth_common.singleflight import SingleFlight
+from auth_common.stuffing_detector import StuffingBlocked, StuffingDetector
+from auth_common.user_cache import UserCache
+from auth_common.user_pages import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, UserDirectory
+from auth_common.user_reloader import ReloadableUsers
+from auth_common.user_store import UserStore
+from auth_common.warmup import Warmup
+from auth_common.ws_auth import AuthenticatedSockets, Principal, basic_credential
+
+# Préchauffage au démarrage (hash, pydantic, cache des utilisateurs)
+warmup = Warmup()
+WARMUP_PRELOAD_USERS = 1000  # utilisateurs chargés dans user_cache au démarrage
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lance le préchauffage en arrière-plan: /readyz répond 503 jusqu'à la fin"""
+    warmup.start()
+    yield
+
+
 # Instanciation de l'API FastAPI et de la sécurité HTTP Basic
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 security = HTTPBasic()
 # Utiliser pbkdf2_sha256 au lieu de bcrypt pour éviter les problèmes de compatibilité
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# Admission control des vérifications pbkdf2: pool dédié, file et attente bornées
+KDF_MAX_CONCURRENCY = os.cpu_count() or 1
+KDF_MAX_QUEUE = 64
+KDF_MAX_WAIT = 2.0  # secondes
+kdf_limiter = KDFLimiter(KDF_MAX_CONCURRENCY, KDF_MAX_QUEUE, KDF_MAX_WAIT)
+
+# Les vérifications concurrentes des mêmes credentials partagent un seul calcul
+verify_flight = SingleFlight()
+
+# Détection du credential stuffing (auth_common/stuffing_detector.py): un
+# client qui essaie plus de STUFFING_THRESHOLD usernames distincts par fenêtre
+# de STUFFING_WINDOW secondes est refusé (429) avant le hash du mot de passe
+STUFFING_THRESHOLD = int(os.environ.get("STUFFING_THRESHOLD", "50"))
+STUFFING_WINDOW = float(os.environ.get("STUFFING_WINDOW", "600"))
+stuffing = StuffingDetector(STUFFING_THRESHOLD, STUFFING_WINDOW) if STUFFING_THRESHOLD > 0 else None
+
+# Authentification par middleware ASGI (auth_common/asgi_auth.py): credentials
+# vérifiés avant le routage au lieu de la dépendance get_current_user. ASGI_AUTH=1.
+ASGI_AUTH = os.environ.get("ASGI_AUTH", "0") == "1"
+
 # Hashes pré-calculés pour éviter les problèmes au démarrage
 # Ces hashes correspondent respectivement à 'datascientest' et 'secret'
 DANIEL_HASH = "$pbkdf2-sha256$29000$yVmLMaY05nwP4bw3Zqw15g$WmPCdALqJFQlK.lxLO5nsZ9Cr4W.f4FEwAMOjsZ9I2c"
@@ -27,17 +82,175 @@ users = {
     }
 }
 
+# Représentation compacte des utilisateurs en mémoire (grands annuaires,
+# environ 9 fois moins de mémoire qu'un dict de dicts): COMPACT_USERS=1
+COMPACT_USERS = os.environ.get("COMPACT_USERS", "0") == "1"
+if COMPACT_USERS:
+    compact_users = CompactUserTable("hashed_password", text_fields=("username", "name"))
+    compact_users.update(users)
+    users = compact_users
+
+# Fichier d'utilisateurs optionnel (JSON {username: utilisateur}), prioritaire
+# sur users et rechargé à chaud quand il change
+USERS_FILE = os.environ.get("USERS_FILE")
+users_file = ReloadableUsers(USERS_FILE) if USERS_FILE else None
+
+# Snapshot mmap optionnel (build_user_snapshot.py), en lecture seule: ses pages
+# sont partagées par tous les workers. Rechargé à chaud quand il est reconstruit.
+USER_SNAPSHOT_PATH = os.environ.get("USER_SNAPSHOT_PATH")
+user_snapshot = ReloadableUsers(USER_SNAPSHOT_PATH) if USER_SNAPSHOT_PATH else None
+
+reloadable_sources = [source for source in (users_file, user_snapshot) if source is not None]
+
+# Stockage persistant optionnel (utilisateurs importés par provision_users.py),
+# consulté pour les usernames absents de users
+USER_STORE_PATH = os.environ.get("USER_STORE_PATH")
+user_store = UserStore(USER_STORE_PATH) if USER_STORE_PATH else None
+
+# Toutes les sources d'utilisateurs, parcourues par ordre de username (GET /users)
+user_directory = UserDirectory({
+    "file": users_file, "builtin": users, "snapshot": user_snapshot, "store": user_store,
+})
+
+
+def load_user(username):
+    """
+    Lit un utilisateur dans le fichier d'utilisateurs, users, le snapshot
+    puis le stockage persistant
+    """
+    user = users_file.get(username) if users_file is not None else None
+    if user is None:
+        user = users.get(username)
+    if user is None and user_snapshot is not None:
+        user = user_snapshot.get(username)
+    if user is None and user_store is not None:
+        user = user_store.get(username)
+    return user
+
+
+# Cache de lecture devant la base des utilisateurs (TTL, cache négatif des
+# usernames inconnus). Appeler user_cache.invalidate(username) après toute
+# modification de users.
+user_cache = UserCache(load_user)
+for source in reloadable_sources:
+    source.subscribe(user_cache.clear)
+
+
+async def get_user(username: str):
+    """
+    Lit un utilisateur dans user_cache, dans le pool de threads si un défaut
+    de cache interroge le stockage persistant (requête SQLite bloquante,
+    fréquente pendant une énumération de usernames)
+    """
+    if user_store is not None:
+        return await run_in_threadpool(user_cache.get, username)
+    return user_cache.get(username)
+
+
+@warmup.step("hash_verifier")
+def warm_hash_verifier():
+    """Sélectionne le backend pbkdf2 de passlib (hash et vérification)"""
+    hash_wrap.verify("warmup", pwd_context.hash("warmup"), pwd_context.verify)
+
+
+@warmup.step("pydantic_models")
+def warm_pydantic_models():
+    """Construit le schéma OpenAPI (modèles des routes et de la sécurité)"""
+    app.openapi()
+
+
+@warmup.step("user_cache")
+def warm_user_cache():
+    """Charge les premiers utilisateurs de users dans user_cache"""
+    user_cache.preload(itertools.islice(users, WARMUP_PRELOAD_USERS))
+
 
-def get_current_user(credentials: HTTPBasicCredentials = Depends(security)):
+@app.exception_handler(KDFOverloaded)
+def kdf_overloaded_handler(request: Request, exc: KDFOverloaded):
+    """
+    Répond 503 quand le pool de vérification des mots de passe est saturé.
+    
+    Le client est invité à réessayer plus tard (en-tête Retry-After) plutôt
+    que d'attendre indéfiniment dans la file.
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service overloaded, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(StuffingBlocked)
+def stuffing_blocked_handler(request: Request, exc: StuffingBlocked):
+    """
+    Répond 429 + Retry-After à un client qui essaie trop de usernames distincts
+    (credential stuffing), sans calculer de hash
+    """
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many login attempts from this client, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def client_key(connection) -> str:
+    """Clé d'un client pour la détection du credential stuffing: son adresse IP"""
+    return connection.client.host if connection.client else ""
+
+
+async def verify_credentials(username: str, password: str, client: str):
+    """
+    Vérifie un couple username / mot de passe
+    
+    Vérificateur commun à get_current_user (dépendance), à AuthMiddleware
+    (ASGI_AUTH) et au handshake /ws. Un client qui essaie trop de usernames
+    distincts est refusé avant tout calcul (stuffing). La vérification pbkdf2
+    passe par kdf_limiter (pool dédié) au lieu du pool de threads partagé de
+    Starlette, et les requêtes concurrentes avec les mêmes credentials
+    partagent un seul calcul (verify_flight).
+    
+    Args:
+        username, password: Credentials Basic
+        client: Clé du client (adresse IP, voir client_key)
+    
+    Returns:
+        dict or None: L'utilisateur si les credentials sont corrects, None sinon
+    
+    Raises:
+        StuffingBlocked: Si le client dépasse le seuil de usernames distincts (réponse 429)
+        KDFOverloaded: Si le pool de vérification est saturé (réponse 503)
+    """
+    if stuffing is not None:
+        stuffing.check(client, username)
+    user = await get_user(username)
+    if not user or not await verify_flight.do(
+        verify_flight.credential_key(username, password),
+        lambda: kdf_limiter.run(hash_wrap.verify, password, user['hashed_password'], pwd_context.verify),
+    ):
+        return None
+    return user
+
+
+def unauthorized_exception() -> HTTPException:
+    """Erreur 401 de credentials incorrects (déclenche la popup du navigateur)"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect email or password",
+        headers={"WWW-Authenticate": "Basic"},
+    )
+
+
+async def get_current_user(request: Request, credentials: HTTPBasicCredentials = Depends(security)):
     """
     Vérifie les credentials de l'utilisateur et retourne le username si valide.
     
     Cette fonction est utilisée comme dépendance pour les routes protégées.
     Elle récupère les credentials via HTTPBasicCredentials et vérifie :
     1. Si l'utilisateur existe dans la base de données
-    2. Si le mot de passe correspond au hash stocké
+    2. Si le mot de passe correspond au hash stocké (verify_credentials)
     
     Args:
+        request (Request): La requête (adresse du client)
         credentials (HTTPBasicCredentials): Les credentials fournis par le client
             - credentials.username : nom d'utilisateur
             - credentials.password : mot de passe en clair
@@ -48,22 +261,119 @@ def get_current_user(credentials: HTTPBasicCredentials = Depends(security)):
     Raises:
         HTTPException 401: Si les credentials sont incorrects
             - Headers: WWW-Authenticate: Basic (pour déclencher la popup navigateur)
+        StuffingBlocked: Si le client essaie trop de usernames distincts (réponse 429)
+        KDFOverloaded: Si le pool de vérification est saturé (réponse 503)
     """
-    username = credentials.username
-    
     # Vérifier si l'utilisateur existe et si le mot de passe correspond
-    if not(users.get(username)) or not(pwd_context.verify(credentials.password, users[username]['hashed_password'])):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Basic"},
-        )
+    if await verify_credentials(credentials.username, credentials.password, client_key(request)) is None:
+        raise unauthorized_exception()
     
     return credentials.username
 
 
+async def verify_basic(credential: tuple, requirement=None, scope=None):
+    """
+    Vérificateur du middleware ASGI (ASGI_AUTH): même vérification que get_current_user
+    
+    Returns:
+        Principal: Utilisateur authentifié
+    
+    Raises:
+        HTTPException 401: Si les credentials sont incorrects
+        StuffingBlocked, KDFOverloaded: Voir verify_credentials
+    """
+    username, password = credential
+    client = scope["client"][0] if scope.get("client") else ""
+    user = await verify_credentials(username, password, client)
+    if user is None:
+        raise unauthorized_exception()
+    return Principal(username, None, None, user)
+
+
+async def principal_username(request: Request) -> str:
+    """Username vérifié par AuthMiddleware avant le routage (ASGI_AUTH)"""
+    return request.state.principal.username
+
+
+# Dépendance des routes protégées: get_current_user, ou simple lecture du
+# principal déjà vérifié par AuthMiddleware
+current_username = principal_username if ASGI_AUTH else get_current_user
+
+if ASGI_AUTH:
+    app.add_middleware(
+        AuthMiddleware,
+        rules={"/user": AuthRule("basic"), "/me": AuthRule("basic"), "/users": AuthRule("basic")},
+        verifiers={"basic": verify_basic},
+        rejections=(HTTPException,),
+        # Les exception handlers de l'application ne s'appliquent pas avant le routage
+        handlers={
+            KDFOverloaded: lambda scope, exc: kdf_overloaded_handler(Request(scope), exc),
+            StuffingBlocked: lambda scope, exc: stuffing_blocked_handler(Request(scope), exc),
+        },
+    )
+
+
+def public_user(user: dict) -> dict:
+    """Champs exposés d'un utilisateur: tout sauf le hash du mot de passe"""
+    return {field: value for field, value in user.items() if field != 'hashed_password'}
+
+
+SOCKET_GRANTS = frozenset({"user", "me"})  # ressources servies sur /ws
+SOCKET_REVALIDATE_INTERVAL = 30.0  # secondes entre deux vérifications d'une connexion
+
+
+async def authenticate_socket(credential):
+    """
+    Vérifie les credentials Basic du handshake /ws (pbkdf2, une fois par connexion)
+    
+    Args:
+        credential (tuple): (client, username, password)
+    
+    Returns:
+        Principal or None: Connexion authentifiée (sans expiration), None si
+        les credentials sont incorrects, le client bloqué (stuffing) ou le
+        pool de vérification saturé: le handshake est refusé (403), le client
+        réessaie plus tard
+    """
+    if not isinstance(credential, tuple):
+        return None  # {"token": ...}: pas de renouvellement en Basic
+    client, username, password = credential
+    try:
+        user = await verify_credentials(username, password, client)
+    except (StuffingBlocked, KDFOverloaded):
+        return None
+    if user is None:
+        return None
+    return Principal(username, None, SOCKET_GRANTS, user)
+
+
+async def revalidate_socket(principal, credential):
+    """
+    Revérifie une connexion /ws sans recalculer pbkdf2: l'utilisateur existe
+    toujours et son hash n'a pas changé (mot de passe inchangé)
+    
+    Returns:
+        Principal or None: Connexion mise à jour, None si elle doit être fermée
+    """
+    user = await get_user(principal.username)
+    if user is None or user['hashed_password'] != principal.context['hashed_password']:
+        return None
+    return principal._replace(context=user)
+
+
+sockets = AuthenticatedSockets(
+    authenticate_socket,
+    {
+        "user": lambda principal: "Hello {}".format(principal.username),
+        "me": lambda principal: public_user(principal.context),
+    },
+    revalidate=revalidate_socket,
+    revalidate_interval=SOCKET_REVALIDATE_INTERVAL,
+)
+
+
 @app.get("/user")
-def current_user(username: str = Depends(get_current_user)):
+def current_user(username: str = Depends(current_username)):
     """
     Route protégée retournant un message de bienvenue personnalisé.
     
@@ -95,21 +405,55 @@ def root():
     Route publique (non protégée) - informations sur l'API.
     
     Returns:
-        dict: Informations de base sur l'API
+        dict: Informations de base sur l'API et nombre d'utilisateurs par
+        source (la liste est sur GET /users, authentifiée et paginée)
     """
     return {
         "message": "FastAPI HTTP Basic Auth API",
         "endpoints": {
             "/user": "Protected route - requires authentication",
+            "/users": "Paginated user listing (?cursor=&limit=) - requires authentication",
+            "/ws": "WebSocket authenticated once at handshake (messages {\"get\": \"user\" | \"me\"})",
+            "/metrics": "Internal metrics",
+            "/healthz": "Liveness probe",
+            "/readyz": "Readiness probe (503 until warm-up completes)",
             "/docs": "Swagger UI documentation",
             "/redoc": "ReDoc documentation"
         },
-        "users": ["daniel", "john"]
+        "user_counts": user_directory.counts()
     }
 
 
+@app.get("/users")
+def list_users(cursor: str = None,
+               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+               username: str = Depends(current_username)):
+    """
+    Route protégée - usernames par ordre alphabétique, une page à la fois.
+    
+    Les pages sont lues sur les index des sources (stockage SQLite: index de
+    la clé primaire) et envoyées en flux (auth_common/user_pages.py).
+    
+    Args:
+        cursor (str): Curseur opaque renvoyé par la page précédente (next_cursor)
+        limit (int): Taille de la page
+        username (str): Utilisateur authentifié
+    
+    Returns:
+        StreamingResponse: {"users": [...], "next_cursor": "..." | null}
+    
+    Raises:
+        HTTPException: 400 si le curseur est invalide, 401 sans credentials valides
+    """
+    try:
+        chunks = user_directory.page(cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(chunks, media_type="application/json")
+
+
 @app.get("/me")
-def read_current_user(username: str = Depends(get_current_user)):
+def read_current_user(username: str = Depends(current_username)):
     """
     Route protégée retournant les informations complètes de l'utilisateur.
     
@@ -119,10 +463,69 @@ def read_current_user(username: str = Depends(get_current_user)):
     Returns:
         dict: Informations de l'utilisateur (sans le mot de passe)
     """
-    user_data = users[username].copy()
-    # Ne jamais exposer le hash du mot de passe !
-    user_data.pop('hashed_password', None)
-    return user_data
+    # Ne jamais exposer le hash du mot de passe ! (un seul dict construit,
+    # sans copie complète puis suppression)
+    return public_user(user_cache.get(username))
+
+
+@app.websocket("/ws")
+async def user_socket(websocket: WebSocket):
+    """
+    /user et /me sur une connexion WebSocket authentifiée une seule fois.
+    
+    Les credentials Basic sont vérifiés au handshake (en-tête Authorization),
+    puis chaque message {"get": "user"} ou {"get": "me"} est servi sans
+    nouveau hash pbkdf2. Toutes les 30 s, la connexion est fermée (code
+    4401) si l'utilisateur a été supprimé ou son mot de passe changé.
+    Voir auth_common/ws_auth.py.
+    """
+    credential = basic_credential(websocket.headers)
+    await sockets.serve(websocket, credential and (client_key(websocket), *credential))
+
+
+@app.get("/metrics")
+def read_metrics():
+    """
+    Métriques internes de l'API.
+    
+    Returns:
+        dict: État du pool KDF, coalescence des vérifications, cache
+        utilisateurs, connexions WebSocket et détection du credential stuffing
+    """
+    return {
+        "kdf": kdf_limiter.snapshot(),
+        "verify_coalescing": verify_flight.snapshot(),
+        "user_cache": user_cache.snapshot(),
+        "user_reload": [source.snapshot() for source in reloadable_sources],
+        "websockets": sockets.snapshot(),
+        "credential_stuffing": stuffing.snapshot() if stuffing is not None else None,
+    }
+
+
+@app.get("/healthz")
+async def read_health():
+    """
+    Liveness: le processus répond (sans dépendance ni authentification)
+    
+    Returns:
+        dict: {"status": "ok"}
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def read_readiness():
+    """
+    Readiness: le worker peut recevoir du trafic
+    
+    Returns:
+        JSONResponse: 200 une fois le préchauffage terminé, 503 avant, avec
+        la durée de chaque étape
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if warmup.ready else "starting", "warmup": warmup.snapshot()},
+    )
 
 
 if __name__ == "__main__":
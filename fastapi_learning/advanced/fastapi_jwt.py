@@ -12,23 +12,80 @@ Routes:
 - GET  /secured       - Route protégée par JWT
 - POST /user/signup   - Inscription (crée un token)
 - POST /user/login    - Connexion (retourne un token)
+- POST /user/logout   - Ferme la session du token (mode sessions opaques)
+- WS   /ws            - /secured sur une connexion authentifiée une fois
+- GET  /metrics       - Métriques internes (retard de la boucle d'événements)
+- GET  /healthz       - Liveness (le processus répond)
+- GET  /readyz        - Readiness (503 tant que le préchauffage n'est pas terminé)
 
 Pour tester:
     uvicorn fastapi_jwt:api --reload --port 8001
 """
 
-from fastapi import Request, HTTPException, Body, Depends
+from contextlib import asynccontextmanager
+from fastapi import Request, Response, HTTPException, Body, Depends, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from fastapi import FastAPI
+from fastapi import FastAPI, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+import os
+import sys
 import time
-import jwt
+
+# Rendre le package partagé auth_common importable (racine du dépôt)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from auth_common.asgi_auth import AuthMiddleware, AuthRule
+from auth_common.breached_passwords import BreachedPasswords
+from auth_common.keyring import create_keyring
+from auth_common.loop_monitor import LoopLagMonitor
+from auth_common.sessions import create_session_store
+from auth_common.stuffing_detector import StuffingBlocked, StuffingDetector
+from auth_common.token_expiry import REFRESH_HEADER, ExpiryPolicy
+from auth_common.warmup import Warmup
+from auth_common.ws_auth import AuthenticatedSockets, Principal, bearer_credential
 
 # Configuration JWT
 JWT_SECRET = "edc30d44e02ebfc88f2ea5060aef05d4a6f028f284d8d9f4cd3b2d03c195af09"  # Même clé que Flask JWT
-JWT_ALGORITHM = "HS256"
+# Trousseau de clés HS256: kid dans l'en-tête des tokens, rotation sans
+# redémarrage via le fichier JWT_KEYS_FILE (sinon, clé unique JWT_SECRET)
+keyring = create_keyring(os.environ.get("JWT_KEYS_FILE"), default_secret=JWT_SECRET)
 TOKEN_EXPIRATION = 600  # 10 minutes (600 secondes)
 
+# Durée des tokens tirée au hasard (jusqu'à -10 %) pour étaler les
+# reconnexions, et en-tête X-Token-Expires-In sur les routes protégées dans
+# les 20 derniers % de la durée (voir auth_common/token_expiry.py)
+TOKEN_EXPIRY_JITTER = float(os.environ.get("TOKEN_EXPIRY_JITTER", "0.1"))
+TOKEN_REFRESH_WINDOW = float(os.environ.get("TOKEN_REFRESH_WINDOW", "0.2"))
+token_expiry = ExpiryPolicy(TOKEN_EXPIRATION, TOKEN_EXPIRY_JITTER, TOKEN_REFRESH_WINDOW)
+
+# Mode sessions opaques (clients internes): signup/login renvoient un
+# identifiant aléatoire au lieu d'un JWT, vérifié par une lecture dans le
+# stockage de sessions (SESSION_STORE_URL: memory://, sqlite:///sessions.db,
+# redis://...). Déconnexion immédiate (POST /user/logout). OPAQUE_SESSIONS=1.
+OPAQUE_SESSIONS = os.environ.get("OPAQUE_SESSIONS", "0") == "1"
+SESSION_STORE_URL = os.environ.get("SESSION_STORE_URL", "memory://")
+session_store = create_session_store(SESSION_STORE_URL, ttl=TOKEN_EXPIRATION) if OPAQUE_SESSIONS else None
+
+# Authentification par middleware ASGI (auth_common/asgi_auth.py): le token
+# est vérifié avant le routage au lieu de la dépendance JWTBearer. ASGI_AUTH=1.
+ASGI_AUTH = os.environ.get("ASGI_AUTH", "0") == "1"
+
+# Détection du credential stuffing (auth_common/stuffing_detector.py): un
+# client qui essaie plus de STUFFING_THRESHOLD usernames distincts par fenêtre
+# de STUFFING_WINDOW secondes est refusé (429) sur /user/login
+STUFFING_THRESHOLD = int(os.environ.get("STUFFING_THRESHOLD", "50"))
+STUFFING_WINDOW = float(os.environ.get("STUFFING_WINDOW", "600"))
+stuffing = StuffingDetector(STUFFING_THRESHOLD, STUFFING_WINDOW) if STUFFING_THRESHOLD > 0 else None
+
+# Mots de passe compromis (auth_common/breached_passwords.py): liste SHA-1
+# triée, convertie par build_breached_passwords.py et projetée en mémoire,
+# sans appel à une API distante. L'inscription refuse les mots de passe de la
+# liste. BREACHED_PASSWORDS_PATH=pwned.bin
+BREACHED_PASSWORDS_PATH = os.environ.get("BREACHED_PASSWORDS_PATH")
+breached_passwords = BreachedPasswords(BREACHED_PASSWORDS_PATH) if BREACHED_PASSWORDS_PATH else None
+
 # Base de données utilisateurs (en mémoire)
 users = []
 
@@ -80,12 +137,34 @@ def sign_jwt(user_id: str):
     """
     payload = {
         "user_id": user_id,
-        "expires": time.time() + TOKEN_EXPIRATION
+        "expires": time.time() + token_expiry.lifetime()
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = keyring.encode(payload)
     return token_response(token)
 
 
+async def session_call(method, *args):
+    """Appelle le stockage de sessions, hors de la boucle s'il fait des I/O (SQLite, Redis)"""
+    if session_store.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+async def issue_token(user_id: str):
+    """
+    Crée le token d'un utilisateur: session opaque si OPAQUE_SESSIONS, JWT sinon
+    
+    Args:
+        user_id (str): L'identifiant de l'utilisateur (username)
+    
+    Returns:
+        dict: Réponse contenant le token
+    """
+    if session_store is None:
+        return sign_jwt(user_id)
+    return token_response(await session_call(session_store.create, user_id))
+
+
 def decode_jwt(token: str):
     """
     Décode et valide un token JWT
@@ -97,9 +176,7 @@ def decode_jwt(token: str):
         dict or None: Le payload décodé si valide, None si expiré, {} si erreur
     """
     try:
-        decoded_token = jwt.decode(
-            token, JWT_SECRET, algorithms=[JWT_ALGORITHM]
-        )
+        decoded_token = keyring.decode(token)
         # Vérifie l'expiration
         return (
             decoded_token if decoded_token["expires"] >= time.time() else None
@@ -108,6 +185,44 @@ def decode_jwt(token: str):
         return {}
 
 
+SECURED_MESSAGE = {"message": "Hello World! but secured"}
+SOCKET_GRANTS = frozenset({"secured"})  # ressources servies sur /ws
+SOCKET_REVALIDATE_INTERVAL = 30.0  # secondes entre deux vérifications du token d'une connexion
+
+
+async def authenticate_token(token: str):
+    """
+    Vérifie un token: JWT, ou session opaque ouverte si OPAQUE_SESSIONS
+    
+    Vérificateur commun à JWTBearer, à AuthMiddleware (ASGI_AUTH) et au
+    handshake /ws (ou au renouvellement du token sur la connexion).
+    
+    Args:
+        token (str): Token JWT ou session opaque
+    
+    Returns:
+        Principal or None: Utilisateur, expiration, ressources /ws accordées
+        et token (POST /user/logout); None si le token est invalide ou expiré
+    """
+    if session_store is not None:
+        session = await session_call(session_store.get, token)
+        if session is None:
+            return None
+        return Principal(session["username"], session["expires_at"], SOCKET_GRANTS, token)
+    payload = decode_jwt(token)
+    if not payload:
+        return None
+    return Principal(payload["user_id"], payload["expires"], SOCKET_GRANTS, token)
+
+
+def invalid_token_exception() -> HTTPException:
+    """Erreur 403 d'un token invalide ou expiré (construite seulement en cas d'échec)"""
+    return HTTPException(
+        status_code=403,
+        detail="Invalid token or expired token."
+    )
+
+
 class JWTBearer(HTTPBearer):
     """
     Classe de dépendance pour protéger les routes avec JWT
@@ -115,13 +230,17 @@ class JWTBearer(HTTPBearer):
     Vérifie:
     - Que l'en-tête Authorization est présent
     - Que le schéma est 'Bearer'
-    - Que le token est valide et non expiré
+    - Que le token est valide et non expiré (JWT, ou session opaque ouverte
+      si OPAQUE_SESSIONS)
+    
+    Dans la fenêtre de renouvellement du token, la réponse porte l'en-tête
+    X-Token-Expires-In (secondes restantes).
     """
     
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
-    async def __call__(self, request: Request):
+    async def __call__(self, request: Request, response: Response):
         credentials: HTTPAuthorizationCredentials = await super(
             JWTBearer, self
         ).__call__(request)
@@ -132,11 +251,12 @@ class JWTBearer(HTTPBearer):
                     status_code=403,
                     detail="Invalid authentication scheme."
                 )
-            if not self.verify_jwt(credentials.credentials):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token or expired token."
-                )
+            principal = await authenticate_token(credentials.credentials)
+            if principal is None:
+                raise invalid_token_exception()
+            expires_in = token_expiry.refresh_hint(principal.expires_at)
+            if expires_in is not None:
+                response.headers[REFRESH_HEADER] = str(expires_in)
             return credentials.credentials
         else:
             raise HTTPException(
@@ -144,36 +264,108 @@ class JWTBearer(HTTPBearer):
                 detail="Invalid authorization code."
             )
 
-    def verify_jwt(self, jwtoken: str):
-        """
-        Vérifie la validité d'un token JWT
-        
-        Args:
-            jwtoken (str): Le token à vérifier
-        
-        Returns:
-            bool: True si le token est valide, False sinon
-        """
-        isTokenValid: bool = False
-
-        try:
-            payload = decode_jwt(jwtoken)
-        except Exception:
-            payload = None
-        
-        if payload:
-            isTokenValid = True
-        
-        return isTokenValid
+
+async def verify_bearer(token: str, requirement=None, scope=None):
+    """
+    Vérificateur du middleware ASGI (ASGI_AUTH): même vérification que JWTBearer
+    
+    Returns:
+        Principal: Token vérifié
+    
+    Raises:
+        HTTPException(403): Si le token est invalide ou expiré
+    """
+    principal = await authenticate_token(token)
+    if principal is None:
+        raise invalid_token_exception()
+    return principal
+
+
+async def principal_token(request: Request) -> str:
+    """Token vérifié par AuthMiddleware avant le routage (ASGI_AUTH)"""
+    return request.state.principal.context
+
+
+# Dépendance des routes protégées: JWTBearer, ou simple lecture du principal
+# déjà vérifié par AuthMiddleware
+bearer_token = principal_token if ASGI_AUTH else JWTBearer()
+# Chemin -> schéma des routes protégées (middleware ASGI)
+AUTH_RULES = {
+    "/secured": AuthRule("bearer"),
+    "/user/logout": AuthRule("bearer"),
+}
+
+
+# Connexions /ws: token vérifié au handshake puis toutes les 30 s, pas à
+# chaque message
+sockets = AuthenticatedSockets(
+    authenticate_token,
+    {"secured": lambda principal: SECURED_MESSAGE},
+    revalidate_interval=SOCKET_REVALIDATE_INTERVAL,
+    refresh_at=token_expiry.refresh_at,
+)
+
+
+# Surveillance du retard de la boucle d'événements (routes async bloquantes)
+loop_monitor = LoopLagMonitor()
+
+# Préchauffage au démarrage (JWT, pydantic)
+warmup = Warmup()
+
+
+@warmup.step("token_codec")
+def warm_token_codec():
+    """Prépare la clé et l'algorithme JWT (encodage et décodage)"""
+    decode_jwt(sign_jwt("warmup")["access_token"])
+
+
+@warmup.step("pydantic_models")
+def warm_pydantic_models():
+    """Construit le schéma OpenAPI et valide UserSchema une fois"""
+    api.openapi()
+    UserSchema(username="warmup", password="warmup")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarre les tâches de fond au lancement et les arrête à l'extinction"""
+    loop_monitor.start()
+    # Préchauffage en arrière-plan: /readyz répond 503 jusqu'à la fin
+    warmup.start()
+    yield
+    await loop_monitor.stop()
 
 
 # Création de l'application FastAPI
 api = FastAPI(
     title="FastAPI JWT Authentication",
     description="API sécurisée avec JWT (JSON Web Tokens)",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+if ASGI_AUTH:
+    api.add_middleware(
+        AuthMiddleware,
+        rules=AUTH_RULES,
+        verifiers={"bearer": verify_bearer},
+        rejections=(HTTPException,),
+        response_headers=lambda principal: token_expiry.hint_headers(principal.expires_at),
+    )
+
+
+@api.exception_handler(StuffingBlocked)
+def stuffing_blocked_handler(request: Request, exc: StuffingBlocked):
+    """
+    Répond 429 + Retry-After à un client qui essaie trop de usernames distincts
+    (credential stuffing), sans calculer de hash
+    """
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many login attempts from this client, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 @api.get("/", tags=["root"])
 async def read_root():
@@ -189,14 +381,16 @@ async def read_root():
             "/": "Route publique",
             "/secured": "Route protégée (JWT requis)",
             "/user/signup": "Inscription (POST)",
-            "/user/login": "Connexion (POST)"
+            "/user/login": "Connexion (POST)",
+            "/user/logout": "Déconnexion (POST, mode sessions opaques)",
+            "/ws": "WebSocket authentifiée au handshake (messages {\"get\": \"secured\"})"
         },
         "registered_users": len(users),
         "token_expiration": f"{TOKEN_EXPIRATION} seconds ({TOKEN_EXPIRATION/60} minutes)"
     }
 
 
-@api.get("/secured", dependencies=[Depends(JWTBearer())], tags=["root"])
+@api.get("/secured", dependencies=[] if ASGI_AUTH else [Depends(bearer_token)], tags=["root"])
 async def read_root_secured():
     """
     Route protégée - Nécessite un JWT valide
@@ -210,7 +404,21 @@ async def read_root_secured():
     Raises:
         HTTPException(403): Si le token est absent, invalide ou expiré
     """
-    return {"message": "Hello World! but secured"}
+    return SECURED_MESSAGE
+
+
+@api.websocket("/ws")
+async def secured_socket(websocket: WebSocket):
+    """
+    /secured sur une connexion WebSocket authentifiée une seule fois
+    
+    Le token est lu au handshake (en-tête Authorization: Bearer, ou paramètre
+    ?token= pour les navigateurs), puis chaque message {"get": "secured"} est
+    servi sans revérification. La connexion est fermée (code 4401) à
+    l'expiration du token ou à la fermeture de sa session; {"token": "..."}
+    la prolonge avec un nouveau token. Voir auth_common/ws_auth.py.
+    """
+    await sockets.serve(websocket, bearer_credential(websocket.headers, websocket.query_params))
 
 
 @api.post("/user/signup", tags=["user"])
@@ -236,19 +444,29 @@ async def create_user(user: UserSchema = Body(...)):
         {
             "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
         }
+    
+    Raises:
+        HTTPException(400): Si le mot de passe figure dans la liste des mots de
+                            passe compromis (BREACHED_PASSWORDS_PATH)
     """
+    if breached_passwords is not None and breached_passwords.is_breached(user.password):
+        raise HTTPException(
+            status_code=400,
+            detail="This password appears in a known data breach, choose another one"
+        )
     users.append(user)
-    return sign_jwt(user.username)
+    return await issue_token(user.username)
 
 
 @api.post("/user/login", tags=["user"])
-async def user_login(user: UserSchema = Body(...)):
+async def user_login(request: Request, user: UserSchema = Body(...)):
     """
     Connexion d'un utilisateur existant
     
     Vérifie les credentials et retourne un JWT si valides.
     
     Args:
+        request (Request): La requête (adresse du client, détection du credential stuffing)
         user (UserSchema): Credentials (username + password)
     
     Request body example:
@@ -269,12 +487,87 @@ async def user_login(user: UserSchema = Body(...)):
         {
             "error": "Wrong login details!"
         }
+    
+    Raises:
+        StuffingBlocked: Si le client essaie trop de usernames distincts (réponse 429)
     """
+    if stuffing is not None:
+        stuffing.check(request.client.host if request.client else "", user.username)
     if check_user(user):
-        return sign_jwt(user.username)  # FIX: était user.email (erreur dans le cours)
+        return await issue_token(user.username)  # FIX: était user.email (erreur dans le cours)
     return {"error": "Wrong login details!"}
 
 
+@api.post("/user/logout", tags=["user"])
+async def user_logout(token: str = Depends(bearer_token)):
+    """
+    Ferme la session du token (mode sessions opaques): le token est refusé
+    dès la requête suivante
+    
+    Returns:
+        dict: Confirmation
+    
+    Raises:
+        HTTPException(400): Si les sessions opaques sont désactivées (un JWT
+                            reste valide jusqu'à son expiration)
+        HTTPException(403): Si le token est absent, invalide ou déjà fermé
+    """
+    if session_store is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Server-side sessions are disabled (OPAQUE_SESSIONS=1)"
+        )
+    await session_call(session_store.revoke, token)
+    return {"message": "Logged out"}
+
+
+@api.get("/metrics", tags=["monitoring"])
+async def read_metrics():
+    """
+    Métriques internes de l'API
+
+    Returns:
+        dict: Histogramme du retard de la boucle d'événements, dernier blocage
+        détecté, trousseau de clés de signature, réglages d'expiration,
+        connexions WebSocket, détection du credential stuffing et
+        mots de passe compromis refusés
+    """
+    return {
+        "event_loop": loop_monitor.snapshot(),
+        "signing_keys": keyring.snapshot(),
+        "token_expiry": token_expiry.snapshot(),
+        "websockets": sockets.snapshot(),
+        "credential_stuffing": stuffing.snapshot() if stuffing is not None else None,
+        "breached_passwords": breached_passwords.snapshot() if breached_passwords is not None else None,
+    }
+
+
+@api.get("/healthz", tags=["monitoring"])
+async def read_health():
+    """
+    Liveness: le processus répond (sans dépendance ni authentification)
+
+    Returns:
+        dict: {"status": "ok"}
+    """
+    return {"status": "ok"}
+
+
+@api.get("/readyz", tags=["monitoring"])
+async def read_readiness():
+    """
+    Readiness: le worker peut recevoir du trafic
+
+    Returns:
+        JSONResponse: 200 une fois le préchauffage terminé, 503 avant, avec
+        la durée de chaque étape
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if warmup.ready else "starting", "warmup": warmup.snapshot()},
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     print("=" * 60)
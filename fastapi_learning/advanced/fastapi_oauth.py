@@ -16,51 +16,191 @@ Utilisateurs de test:
 Routes:
 - POST /token           - Obtenir un access token (OAuth2)
 - GET  /                - Route publique
-- GET  /secured         - Route protégée par OAuth2
+- GET  /secured         - Route protégée par OAuth2 (scope "resource")
+- GET  /me              - Profil de l'utilisateur (scope "profile")
+- POST /logout          - Ferme la session du token (mode sessions opaques)
+- GET  /sessions        - Sessions actives de l'utilisateur (mode sessions opaques)
+- WS   /ws              - /secured et /me sur une connexion authentifiée une fois
+- GET  /metrics         - Métriques internes (retard de la boucle d'événements)
+- GET  /healthz         - Liveness (le processus répond)
+- GET  /readyz          - Readiness (503 tant que le préchauffage n'est pas terminé)
 
 Pour tester:
     uvicorn fastapi_oauth:app --reload --port 8002
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from contextlib import asynccontextmanager
+import asyncio
+import itertools
+import logging
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, Security, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, SecurityScopes
 from pydantic import BaseModel
 from passlib.context import CryptContext
 from typing import Optional
-import jwt
+import os
+import sys
 from jwt.exceptions import PyJWTError
 from datetime import datetime, timedelta
 
+# Rendre le package partagé auth_common importable (racine du dépôt)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from auth_common import hash_wrap
+from auth_common.asgi_auth import AuthMiddleware, AuthRule
+from auth_common.compact_users import CompactUserTable
+from auth_common.kdf_limiter import KDFLimiter, KDFOverloaded
+from auth_common.keyring import create_keyring
+from auth_common.loop_monitor import LoopLagMonitor
+from auth_common.scopes import ScopeMatcher
+from auth_common.sessions import create_session_store
+from auth_common.singleflight import SingleFlight
+from auth_common.state import create_backend
+from auth_common.stuffing_detector import StuffingBlocked, StuffingDetector
+from auth_common.token_expiry import REFRESH_HEADER, ExpiryPolicy
+from auth_common.user_cache import UserCache
+from auth_common.user_pages import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, UserDirectory
+from auth_common.user_reloader import ReloadableUsers
+from auth_common.user_store import UserStore
+from auth_common.user_versions import UserVersions
+from auth_common.warmup import Warmup
+from auth_common.ws_auth import AuthenticatedSockets, Principal, bearer_credential
+
+logger = logging.getLogger("fastapi_oauth")
+
+# Surveillance du retard de la boucle d'événements (routes async bloquantes)
+loop_monitor = LoopLagMonitor()
+
+# État partagé entre workers/nœuds (memory:// par défaut, redis://... en production)
+STATE_BACKEND_URL = os.environ.get("STATE_BACKEND_URL", "memory://")
+state_backend = create_backend(STATE_BACKEND_URL, use_asyncio=True)
+USER_VERSIONS_KEY = "user_versions"
+USER_VERSIONS_POLL = 1.0  # secondes
+
+
+async def sync_user_versions():
+    """
+    Récupère périodiquement les versions d'utilisateurs modifiés sur les
+    autres workers/nœuds (backend partagé uniquement)
+    """
+    while True:
+        try:
+            user_versions.merge(await state_backend.hgetall(USER_VERSIONS_KEY))
+        except Exception:
+            logger.exception("Synchronisation des versions d'utilisateurs impossible")
+        await asyncio.sleep(USER_VERSIONS_POLL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarre les tâches de fond au lancement et les arrête à l'extinction"""
+    loop_monitor.start()
+    # Compile les exigences de scopes de toutes les routes (échoue au
+    # démarrage si une route exige un scope non déclaré)
+    scope_matcher.precompile(app.routes)
+    # Préchauffage en arrière-plan: /readyz répond 503 jusqu'à la fin
+    warmup.start()
+    versions_task = None
+    if state_backend.shared:
+        versions_task = asyncio.create_task(sync_user_versions())
+    yield
+    if versions_task is not None:
+        versions_task.cancel()
+    await state_backend.close()
+    await loop_monitor.stop()
+
+
 # Configuration de l'application
 app = FastAPI(
     title="FastAPI OAuth 2.0 Authentication",
     description="API sécurisée avec OAuth 2.0 et JWT",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configuration du hashage de mots de passe (pbkdf2_sha256)
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# Scopes OAuth2 (l'ordre fixe le bit de chaque scope dans le token:
+# ajouter les nouveaux scopes à la fin)
+SCOPES = {
+    "profile": "Lire son profil (GET /me)",
+    "resource": "Accéder à sa ressource (GET /secured)",
+}
+scope_matcher = ScopeMatcher(SCOPES)
+
 # Configuration OAuth2
 # tokenUrl="token" indique où le client doit envoyer les credentials
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", scopes=SCOPES)
 
 # Configuration JWT
+# Clé historique (kid "default"), algorithme HS256
 SECRET_KEY = "edc30d44e02ebfc88f2ea5060aef05d4a6f028f284d8d9f4cd3b2d03c195af09"
-ALGORITHM = "HS256"
+# Trousseau de clés de signature: kid dans l'en-tête des tokens, rotation sans
+# redémarrage via le fichier JWT_KEYS_FILE (sinon, clé unique SECRET_KEY)
+keyring = create_keyring(os.environ.get("JWT_KEYS_FILE"), default_secret=SECRET_KEY)
 ACCESS_TOKEN_EXPIRATION = 30  # minutes
 
+# Durée des tokens tirée au hasard (jusqu'à -10 %) pour étaler les
+# reconnexions, et en-tête X-Token-Expires-In sur les routes protégées dans
+# les 20 derniers % de la durée (voir auth_common/token_expiry.py)
+TOKEN_EXPIRY_JITTER = float(os.environ.get("TOKEN_EXPIRY_JITTER", "0.1"))
+TOKEN_REFRESH_WINDOW = float(os.environ.get("TOKEN_REFRESH_WINDOW", "0.2"))
+token_expiry = ExpiryPolicy(ACCESS_TOKEN_EXPIRATION * 60, TOKEN_EXPIRY_JITTER, TOKEN_REFRESH_WINDOW)
+
+# Mode "claims" (sans état): /token embarque le profil et sa version dans le
+# JWT, get_current_user reconstruit l'utilisateur sans lire users_db tant que
+# l'utilisateur n'a pas été modifié (voir user_versions / update_user).
+# Activer avec OAUTH2_STATELESS_CLAIMS=1.
+STATELESS_CLAIMS = os.environ.get("OAUTH2_STATELESS_CLAIMS", "0") == "1"
+PROFILE_CLAIMS = ("name", "email", "resource")
+user_versions = UserVersions()
+
+# Mode sessions opaques (clients internes): /token renvoie un identifiant
+# aléatoire au lieu d'un JWT, vérifié par une lecture dans le stockage de
+# sessions (SESSION_STORE_URL: memory://, sqlite:///sessions.db, redis://...).
+# Déconnexion immédiate (POST /logout). Activer avec OPAQUE_SESSIONS=1.
+OPAQUE_SESSIONS = os.environ.get("OPAQUE_SESSIONS", "0") == "1"
+SESSION_STORE_URL = os.environ.get("SESSION_STORE_URL", "memory://")
+session_store = (
+    create_session_store(SESSION_STORE_URL, ttl=ACCESS_TOKEN_EXPIRATION * 60) if OPAQUE_SESSIONS else None
+)
+
+# Authentification par middleware ASGI (auth_common/asgi_auth.py): token et
+# scopes vérifiés avant le routage au lieu de la dépendance Security(get_current_user).
+# ASGI_AUTH=1.
+ASGI_AUTH = os.environ.get("ASGI_AUTH", "0") == "1"
+
+# Admission control des vérifications pbkdf2 de /token
+KDF_MAX_CONCURRENCY = os.cpu_count() or 1
+KDF_MAX_QUEUE = 64
+KDF_MAX_WAIT = 2.0  # secondes
+kdf_limiter = KDFLimiter(KDF_MAX_CONCURRENCY, KDF_MAX_QUEUE, KDF_MAX_WAIT)
+
+# Les logins concurrents avec les mêmes credentials partagent un seul calcul
+verify_flight = SingleFlight()
+
+# Détection du credential stuffing (auth_common/stuffing_detector.py): un
+# client qui essaie plus de STUFFING_THRESHOLD usernames distincts par fenêtre
+# de STUFFING_WINDOW secondes est refusé (429) avant le hash du
+# mot de passe
+STUFFING_THRESHOLD = int(os.environ.get("STUFFING_THRESHOLD", "50"))
+STUFFING_WINDOW = float(os.environ.get("STUFFING_WINDOW", "600"))
+stuffing = StuffingDetector(STUFFING_THRESHOLD, STUFFING_WINDOW) if STUFFING_THRESHOLD > 0 else None
+
+# Préchauffage au démarrage (hash, JWT, pydantic, cache des utilisateurs)
+warmup = Warmup()
+WARMUP_PRELOAD_USERS = 1000  # utilisateurs chargés dans user_cache au démarrage
+
 
 # Modèles Pydantic
 class Token(BaseModel):
     """Modèle pour la réponse token"""
     access_token: str
     token_type: str
-
-
-class TokenData(BaseModel):
-    """Modèle pour les données extraites du token"""
-    username: Optional[str] = None
+    scope: Optional[str] = None
 
 
 class User(BaseModel):
@@ -79,6 +219,7 @@ users_db = {
         "email": "daniel@datascientest.com",
         "hashed_password": pwd_context.hash('datascientest'),
         "resource": "Module DE",
+        "scopes": ["profile", "resource"],
     },
     "johndatascientest": {
         "username": "johndatascientest",
@@ -86,22 +227,115 @@ users_db = {
         "email": "john@datascientest.com",
         "hashed_password": pwd_context.hash('secret'),
         "resource": "Module DS",
+        "scopes": ["profile", "resource"],
     }
 }
 
 
+# Représentation compacte des utilisateurs en mémoire (grands annuaires,
+# environ 9 fois moins de mémoire qu'un dict de dicts): COMPACT_USERS=1
+COMPACT_USERS = os.environ.get("COMPACT_USERS", "0") == "1"
+if COMPACT_USERS:
+    compact_users = CompactUserTable("hashed_password", text_fields=("username", "name", "email"),
+                                     interned_fields=("resource", "scopes"))
+    compact_users.update(users_db)
+    users_db = compact_users
+
+# Fichier d'utilisateurs optionnel (JSON {username: utilisateur}), prioritaire
+# sur users_db et rechargé à chaud quand il change
+USERS_FILE = os.environ.get("USERS_FILE")
+users_file = ReloadableUsers(USERS_FILE) if USERS_FILE else None
+
+# Snapshot mmap optionnel (build_user_snapshot.py), en lecture seule: ses pages
+# sont partagées par tous les workers. Rechargé à chaud quand il est reconstruit.
+USER_SNAPSHOT_PATH = os.environ.get("USER_SNAPSHOT_PATH")
+user_snapshot = ReloadableUsers(USER_SNAPSHOT_PATH) if USER_SNAPSHOT_PATH else None
+
+reloadable_sources = [source for source in (users_file, user_snapshot) if source is not None]
+
+# Stockage persistant optionnel (utilisateurs importés par provision_users.py),
+# consulté pour les usernames absents de users_db
+USER_STORE_PATH = os.environ.get("USER_STORE_PATH")
+user_store = UserStore(USER_STORE_PATH) if USER_STORE_PATH else None
+
+# Toutes les sources d'utilisateurs, parcourues par ordre de username (GET /users)
+user_directory = UserDirectory({
+    "file": users_file, "builtin": users_db, "snapshot": user_snapshot, "store": user_store,
+})
+
+
+def load_user(username):
+    """
+    Lit un utilisateur dans le fichier d'utilisateurs, users_db, le snapshot
+    puis le stockage persistant
+    """
+    user = users_file.get(username) if users_file is not None else None
+    if user is None:
+        user = users_db.get(username)
+    if user is None and user_snapshot is not None:
+        user = user_snapshot.get(username)
+    if user is None and user_store is not None:
+        user = user_store.get(username)
+    return user
+
+
+# Cache de lecture devant users_db (TTL, cache négatif des usernames inconnus),
+# invalidé à chaque modification d'utilisateur
+user_cache = UserCache(load_user)
+user_versions.subscribe(user_cache.invalidate)
+for source in reloadable_sources:
+    source.subscribe(user_cache.clear)
+
+
+async def get_user(username: str):
+    """
+    Lit un utilisateur dans user_cache, dans le pool de threads si un défaut
+    de cache interroge le stockage persistant (requête SQLite bloquante,
+    fréquente pendant une énumération de usernames)
+    """
+    if user_store is not None:
+        return await run_in_threadpool(user_cache.get, username)
+    return user_cache.get(username)
+
+
+async def update_user(username: str, **changes) -> dict:
+    """
+    Modifie un utilisateur et invalide les profils embarqués dans ses tokens
+    
+    Toute modification de users_db doit passer par ici pour que le mode
+    claims relise la base. La nouvelle version est enregistrée dans le
+    backend d'état: avec Redis, les autres workers la récupèrent en moins
+    de USER_VERSIONS_POLL secondes.
+    
+    Args:
+        username: Nom de l'utilisateur à modifier
+        **changes: Champs à mettre à jour (name, email, resource, ...)
+    
+    Returns:
+        dict: L'utilisateur modifié
+    
+    Raises:
+        KeyError: Si l'utilisateur n'existe pas
+    """
+    user = {**users_db[username], **changes}
+    users_db[username] = user
+    version = await state_backend.hincrby(USER_VERSIONS_KEY, username)
+    user_versions.merge({username: version})
+    return user
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Vérifie si un mot de passe en clair correspond au hash
     
     Args:
         plain_password: Mot de passe en clair
-        hashed_password: Hash bcrypt du mot de passe
+        hashed_password: Hash du mot de passe (éventuellement enveloppé, voir hash_wrap)
     
     Returns:
         bool: True si le mot de passe est correct
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return hash_wrap.verify(plain_password, hashed_password, pwd_context.verify)
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
@@ -115,60 +349,295 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     Returns:
         str: Token JWT encodé
     """
-    to_encode = data.copy()
-    
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # Une seule copie de data, complétée par l'expiration
+    encoded_jwt = keyring.encode({**data, "exp": expire})
     
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+def credentials_exception() -> HTTPException:
+    """Erreur 401 d'un token invalide (construite seulement en cas d'échec)"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def verify_access_token(token: str, scopes) -> Principal:
     """
-    Extrait et valide l'utilisateur depuis le token JWT
+    Vérifie un access token et les scopes exigés
+    
+    Vérificateur commun à get_current_user (dépendance), à AuthMiddleware
+    (ASGI_AUTH) et au handshake /ws.
+    En mode sessions opaques (OPAQUE_SESSIONS), le token est vérifié par une
+    lecture dans session_store au lieu d'un décodage JWT.
+    Les scopes exigés sont comparés au claim "scp" du token (bitmask) par un
+    ET binaire, avec des masques compilés au démarrage.
     
-    Cette fonction est utilisée comme dépendance (Depends) pour protéger les routes.
+    En mode claims (STATELESS_CLAIMS), l'utilisateur est reconstruit à partir
+    du claim "prf" du token; users_db n'est consulté que si user_versions
+    indique que l'utilisateur a changé depuis l'émission du token.
     
     Args:
-        token: Token JWT récupéré automatiquement depuis le header Authorization
+        token: Token JWT ou session opaque
+        scopes: Liste des scopes exigés
     
     Returns:
-        dict: Données de l'utilisateur
+        Principal: Username, expiration, scopes accordés (bitmask) et utilisateur
     
     Raises:
         HTTPException(401): Si le token est invalide ou l'utilisateur n'existe pas
+        HTTPException(403): Si le token n'accorde pas les scopes exigés
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        # Décoder le JWT
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+    if session_store is not None:
+        # Session opaque: une lecture dans le stockage de sessions
+        session = session_store.get(token)
+        if session is None:
+            raise credentials_exception()
+        username = session["username"]
+        granted = session["data"]["scp"]
+        expires_at = session["expires_at"]
+        payload = None
+    else:
+        try:
+            # Décoder le JWT
+            payload = keyring.decode(token)
+        except PyJWTError:
+            raise credentials_exception()
         
+        username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
-        
-        token_data = TokenData(username=username)
+            raise credentials_exception()
+        granted = payload.get("scp", 0)
+        expires_at = payload.get("exp")
+    
+    # Vérifier les scopes exigés (un ET binaire)
+    if not scope_matcher.allows(granted, scopes):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+            headers={
+                "WWW-Authenticate": f'Bearer error="insufficient_scope", scope="{" ".join(scopes)}"'
+            },
+        )
     
-    except PyJWTError:
-        raise credentials_exception
+    # Mode claims: principal reconstruit depuis le token, sans accès à la base
+    profile = payload.get("prf") if payload is not None else None
+    if profile is not None and not user_versions.is_stale(username, payload.get("ver", 0)):
+        return Principal(username, expires_at, granted, {"username": username, **profile})
     
-    # Récupérer l'utilisateur depuis la base de données
-    user = users_db.get(username, None)
+    # Récupérer l'utilisateur (cache de lecture devant la base de données)
+    user = user_cache.get(username)
     
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     
-    return user
+    return Principal(username, expires_at, granted, user)
+
+
+def get_current_user(
+    security_scopes: SecurityScopes,
+    response: Response,
+    token: str = Depends(oauth2_scheme)
+) -> dict:
+    """
+    Extrait et valide l'utilisateur depuis le token (voir verify_access_token)
+    
+    Cette fonction est utilisée comme dépendance (Security) pour protéger les routes.
+    Quand le token entre dans sa fenêtre de renouvellement, la réponse porte
+    l'en-tête X-Token-Expires-In (secondes restantes).
+    
+    Args:
+        security_scopes: Scopes exigés par la route (Security(..., scopes=[...]))
+        response: Réponse de la route (en-tête d'indication de renouvellement)
+        token: Token JWT récupéré automatiquement depuis le header Authorization
+    
+    Returns:
+        dict: Données de l'utilisateur
+    
+    Raises:
+        HTTPException(401): Si le token est invalide ou l'utilisateur n'existe pas
+        HTTPException(403): Si le token n'accorde pas les scopes exigés
+    """
+    principal = verify_access_token(token, security_scopes.scopes)
+    
+    # Indication de renouvellement: le client se reconnecte avant le 401
+    if principal.expires_at is not None:
+        expires_in = token_expiry.refresh_hint(principal.expires_at)
+        if expires_in is not None:
+            response.headers[REFRESH_HEADER] = str(expires_in)
+    
+    return principal.context
+
+
+# Vérification hors de la boucle d'événements seulement si elle fait des I/O
+# (sessions SQLite/Redis, stockage persistant d'utilisateurs)
+VERIFY_BLOCKING = (session_store is not None and session_store.blocking) or user_store is not None
+
+
+async def verify_bearer(token: str, scopes, scope=None) -> Principal:
+    """
+    Vérificateur du middleware ASGI (ASGI_AUTH): verify_access_token, dans
+    le pool de threads si la vérification fait des I/O
+    """
+    if VERIFY_BLOCKING:
+        return await run_in_threadpool(verify_access_token, token, scopes)
+    return verify_access_token(token, scopes)
+
+
+async def principal_user(request: Request) -> dict:
+    """Utilisateur vérifié par AuthMiddleware avant le routage (ASGI_AUTH)"""
+    return request.state.principal.context
+
+
+# Chemin -> schéma et scopes exigés des routes protégées. Les scopes servent
+# aux deux modes: Security(get_current_user) ou middleware ASGI (ASGI_AUTH).
+AUTH_RULES = {
+    "/secured": AuthRule("bearer", ["resource"]),
+    "/me": AuthRule("bearer", ["profile"]),
+    "/sessions": AuthRule("bearer", ["profile"]),
+    "/users": AuthRule("bearer", ["profile"]),
+}
+
+
+def authenticated_user(path: str):
+    """
+    Dépendance d'une route protégée
+    
+    Args:
+        path: Chemin de la route (clé de AUTH_RULES)
+    
+    Returns:
+        Security(get_current_user) avec les scopes de la règle, ou lecture de
+        l'utilisateur placé par AuthMiddleware (ASGI_AUTH)
+    """
+    if ASGI_AUTH:
+        return Depends(principal_user)
+    return Security(get_current_user, scopes=AUTH_RULES[path].requirement)
+
+
+if ASGI_AUTH:
+    # Masques des scopes compilés au démarrage (KeyError si un scope n'est
+    # pas déclaré)
+    for rule in AUTH_RULES.values():
+        scope_matcher.required(rule.requirement)
+    app.add_middleware(
+        AuthMiddleware,
+        rules=AUTH_RULES,
+        verifiers={"bearer": verify_bearer},
+        rejections=(HTTPException,),
+        response_headers=lambda principal: token_expiry.hint_headers(principal.expires_at),
+    )
+
+
+def public_profile(user: dict) -> dict:
+    """Champs exposés d'un utilisateur (jamais le hash du mot de passe)"""
+    return {
+        "username": user["username"],
+        "name": user["name"],
+        "email": user["email"],
+        "resource": user["resource"]
+    }
+
+
+# Ressources servies sur /ws et scopes exigés (comme /secured et /me)
+SOCKET_SCOPES = {"secured": ["resource"], "me": ["profile"]}
+NO_SCOPES = []  # handshake: aucun scope exigé, les ressources dépendent des scopes accordés
+SOCKET_REVALIDATE_INTERVAL = 30.0  # secondes entre deux vérifications du token d'une connexion
+
+
+def authenticate_socket(token: str):
+    """
+    Vérifie le token du handshake /ws (ou d'un renouvellement sur la connexion)
+    
+    Mêmes vérifications que get_current_user (verify_access_token), une fois
+    par connexion: les scopes du token sont traduits en ressources accordées.
+    
+    Args:
+        token: Token JWT ou session opaque
+    
+    Returns:
+        Principal or None: Connexion authentifiée, None si le token est invalide
+    """
+    try:
+        principal = verify_access_token(token, NO_SCOPES)
+    except HTTPException:
+        return None
+    return principal._replace(grants=frozenset(
+        name for name, required in SOCKET_SCOPES.items() if scope_matcher.allows(principal.grants, required)
+    ))
+
+
+# Connexions /ws: authentifiées au handshake (hors de la boucle: lecture de
+# session ou d'utilisateur), puis revérifiées toutes les 30 s
+sockets = AuthenticatedSockets(
+    lambda token: run_in_threadpool(authenticate_socket, token),
+    {
+        "secured": lambda principal: {"message": "Hello World, but secured!",
+                                      "user": public_profile(principal.context)},
+        "me": lambda principal: public_profile(principal.context),
+    },
+    revalidate_interval=SOCKET_REVALIDATE_INTERVAL,
+    refresh_at=token_expiry.refresh_at,
+)
+
+
+@warmup.step("hash_verifier")
+def warm_hash_verifier():
+    """Sélectionne le backend pbkdf2 de passlib (hash et vérification)"""
+    verify_password("warmup", pwd_context.hash("warmup"))
+
+
+@warmup.step("token_codec")
+def warm_token_codec():
+    """Prépare la clé et l'algorithme JWT (encodage et décodage)"""
+    token = create_access_token({"sub": "warmup", "scp": 0}, timedelta(seconds=60))
+    keyring.decode(token)
+
+
+@warmup.step("pydantic_models")
+def warm_pydantic_models():
+    """Construit le schéma OpenAPI et valide chaque modèle une fois"""
+    app.openapi()
+    Token(access_token="warmup", token_type="bearer")
+    User(username="warmup", name="warmup", email="warmup", resource="warmup")
+
+
+@warmup.step("user_cache")
+def warm_user_cache():
+    """Charge les premiers utilisateurs de users_db dans user_cache"""
+    user_cache.preload(itertools.islice(users_db, WARMUP_PRELOAD_USERS))
+
+
+@app.exception_handler(KDFOverloaded)
+def kdf_overloaded_handler(request: Request, exc: KDFOverloaded):
+    """
+    Répond 503 + Retry-After quand le pool de vérification des mots de passe est saturé
+    """
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service overloaded, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(StuffingBlocked)
+def stuffing_blocked_handler(request: Request, exc: StuffingBlocked):
+    """
+    Répond 429 + Retry-After à un client qui essaie trop de usernames distincts
+    (credential stuffing), sans calculer de hash
+    """
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many login attempts from this client, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 # ============================================
@@ -176,7 +645,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
 # ============================================
 
 @app.post("/token", response_model=Token, tags=["authentication"])
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Route OAuth 2.0 pour obtenir un access token
     
@@ -185,26 +654,33 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     OAuth2PasswordRequestForm attend:
     - username (form field)
     - password (form field)
-    - scope (optionnel)
+    - scope (optionnel, ex: "profile resource"; par défaut tous les scopes autorisés)
     - client_id (optionnel)
     - client_secret (optionnel)
     
     Args:
+        request: La requête (adresse du client, détection du credential stuffing)
         form_data: Données du formulaire OAuth2 (username + password)
     
     Returns:
-        Token: access_token et token_type ("bearer")
+        Token: access_token, token_type ("bearer") et scope (scopes accordés)
     
     Raises:
         HTTPException(400): Si username ou password incorrect
+        StuffingBlocked: Si le client essaie trop de usernames distincts (réponse 429)
+        KDFOverloaded: Si le pool de vérification est saturé (réponse 503)
     
     Example:
         curl -X POST http://127.0.0.1:8002/token \
           -d "username=danieldatascientest" \
           -d "password=datascientest"
     """
+    # Refuser un client qui essaie trop de usernames distincts, avant tout calcul
+    if stuffing is not None:
+        stuffing.check(request.client.host if request.client else "", form_data.username)
+
     # Chercher l'utilisateur
-    user = users_db.get(form_data.username)
+    user = await get_user(form_data.username)
     
     if not user:
         raise HTTPException(
@@ -212,25 +688,55 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             detail="Incorrect username or password"
         )
     
-    # Vérifier le mot de passe
+    # Vérifier le mot de passe (hors de la boucle d'événements, pool KDF dédié,
+    # un seul calcul pour les tentatives concurrentes identiques)
     hashed_password = user.get("hashed_password")
     
-    if not verify_password(form_data.password, hashed_password):
+    if not await verify_flight.do(
+        verify_flight.credential_key(form_data.username, form_data.password),
+        lambda: kdf_limiter.run(verify_password, form_data.password, hashed_password),
+    ):
         raise HTTPException(
             status_code=400,
             detail="Incorrect username or password"
         )
     
-    # Créer le token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRATION)
+    # Scopes accordés: ceux demandés parmi ceux autorisés pour l'utilisateur
+    # (tous les scopes autorisés si aucun n'est demandé)
+    allowed = scope_matcher.encode(user.get("scopes", []))
+    requested = scope_matcher.encode(form_data.scopes) if form_data.scopes else allowed
+    granted = requested & allowed
+    
+    if session_store is not None:
+        # Session opaque: le serveur garde le principal et les scopes accordés
+        if session_store.blocking:
+            access_token = await run_in_threadpool(session_store.create, form_data.username, {"scp": granted})
+        else:
+            access_token = session_store.create(form_data.username, {"scp": granted})
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "scope": " ".join(scope_matcher.decode(granted))
+        }
+    
+    # Créer le token (scopes encodés en bitmask dans le claim "scp")
+    claims = {"sub": form_data.username, "scp": granted}
+    if STATELESS_CLAIMS:
+        # Profil + version: get_current_user n'aura pas besoin de users_db
+        claims["prf"] = {field: user[field] for field in PROFILE_CLAIMS}
+        claims["ver"] = user_versions.current(form_data.username)
+    
+    # Durée avec jitter: des clients connectés ensemble n'expirent pas ensemble
+    access_token_expires = timedelta(seconds=token_expiry.lifetime())
     access_token = create_access_token(
-        data={"sub": form_data.username},
+        data=claims,
         expires_delta=access_token_expires
     )
     
     return {
         "access_token": access_token,
-        "token_type": "bearer"
+        "token_type": "bearer",
+        "scope": " ".join(scope_matcher.decode(granted))
     }
 
 
@@ -240,23 +746,29 @@ def read_public_data():
     Route publique - Accessible sans authentification
     
     Returns:
-        dict: Message de bienvenue et informations API
+        dict: Message de bienvenue, endpoints et nombre d'utilisateurs par
+        source (la liste est sur GET /users, authentifiée et paginée)
     """
     return {
         "message": "FastAPI OAuth 2.0 Authentication API",
         "endpoints": {
             "/": "Route publique",
             "/token": "Obtenir un access token (POST, form-data)",
-            "/secured": "Route protégée (GET, Bearer token requis)"
+            "/secured": "Route protégée (GET, Bearer token requis, scope resource)",
+            "/me": "Profil de l'utilisateur (GET, Bearer token requis, scope profile)",
+            "/logout": "Fermer la session du token (POST, mode sessions opaques)",
+            "/sessions": "Sessions actives (GET, mode sessions opaques, scope profile)",
+            "/users": "Liste paginée des utilisateurs (GET, Bearer token requis, scope profile)",
+            "/ws": "WebSocket authentifiée au handshake (messages {\"get\": \"secured\" | \"me\"})"
         },
-        "users": list(users_db.keys()),
+        "user_counts": user_directory.counts(),
         "token_expiration": f"{ACCESS_TOKEN_EXPIRATION} minutes",
-        "auth_type": "OAuth 2.0 Password Flow + JWT"
+        "auth_type": "OAuth 2.0 Password Flow + " + ("opaque sessions" if OPAQUE_SESSIONS else "JWT")
     }
 
 
 @app.get("/secured", tags=["protected"])
-def read_private_data(current_user: dict = Depends(get_current_user)):
+def read_private_data(current_user: dict = authenticated_user("/secured")):
     """
     Route protégée - Nécessite un access token OAuth2 valide
     
@@ -271,6 +783,7 @@ def read_private_data(current_user: dict = Depends(get_current_user)):
     
     Raises:
         HTTPException(401): Si le token est absent, invalide ou expiré
+        HTTPException(403): Si le token n'a pas le scope "resource"
     
     Example:
         curl -H "Authorization: Bearer <token>" \
@@ -278,17 +791,12 @@ def read_private_data(current_user: dict = Depends(get_current_user)):
     """
     return {
         "message": "Hello World, but secured!",
-        "user": {
-            "username": current_user["username"],
-            "name": current_user["name"],
-            "email": current_user["email"],
-            "resource": current_user["resource"]
-        }
+        "user": public_profile(current_user)
     }
 
 
 @app.get("/me", tags=["protected"])
-def read_users_me(current_user: dict = Depends(get_current_user)):
+def read_users_me(current_user: dict = authenticated_user("/me")):
     """
     Route protégée - Retourne les informations de l'utilisateur connecté
     
@@ -297,12 +805,151 @@ def read_users_me(current_user: dict = Depends(get_current_user)):
     
     Returns:
         User: Informations complètes de l'utilisateur
+    
+    Raises:
+        HTTPException(403): Si le token n'a pas le scope "profile"
+    """
+    return User(**public_profile(current_user))
+
+
+@app.get("/users", tags=["protected"])
+def list_users(cursor: Optional[str] = None,
+               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+               current_user: dict = authenticated_user("/users")):
+    """
+    Route protégée - Liste des usernames, par ordre alphabétique et par page
+    
+    La page est lue sur les index des sources (stockage SQLite: index de la
+    clé primaire) et envoyée en flux: l'annuaire n'est jamais chargé en
+    entier. Voir auth_common/user_pages.py.
+    
+    Args:
+        cursor: Curseur opaque renvoyé par la page précédente (next_cursor)
+        limit: Taille de la page
+        current_user: Utilisateur extrait du token
+    
+    Returns:
+        StreamingResponse: {"users": [...], "next_cursor": "..." | null}
+    
+    Raises:
+        HTTPException(400): Si le curseur est invalide
+        HTTPException(403): Si le token n'a pas le scope "profile"
+    
+    Example:
+        curl -H "Authorization: Bearer <token>" "http://127.0.0.1:8002/users?limit=2"
+    """
+    try:
+        chunks = user_directory.page(cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return StreamingResponse(chunks, media_type="application/json")
+
+
+@app.websocket("/ws")
+async def secured_socket(websocket: WebSocket):
+    """
+    /secured et /me sur une connexion WebSocket authentifiée une seule fois
+    
+    Le token est lu au handshake (en-tête Authorization: Bearer, ou paramètre
+    ?token= pour les navigateurs), puis chaque message {"get": "secured"} ou
+    {"get": "me"} est servi sans revérification. La connexion est fermée
+    (code 4401) à l'expiration du token ou s'il n'est plus valide (session
+    fermée, clé retirée, utilisateur supprimé); {"token": "..."} la prolonge
+    avec un nouveau token. Voir auth_common/ws_auth.py.
+    """
+    await sockets.serve(websocket, bearer_credential(websocket.headers, websocket.query_params))
+
+
+def require_sessions():
+    """Refuse les routes de sessions en mode JWT (400)"""
+    if session_store is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Server-side sessions are disabled (OPAQUE_SESSIONS=1)",
+        )
+
+
+@app.post("/logout", tags=["authentication"], dependencies=[Depends(require_sessions)])
+def logout(token: str = Depends(oauth2_scheme)):
+    """
+    Ferme la session du token (mode sessions opaques): le token est refusé
+    dès la requête suivante
+    
+    Returns:
+        dict: Confirmation
+    
+    Raises:
+        HTTPException(400): Si les sessions opaques sont désactivées
+        HTTPException(401): Si le token est inconnu ou déjà fermé
+    """
+    if not session_store.revoke(token):
+        raise credentials_exception()
+    return {"detail": "Logged out"}
+
+
+@app.get("/sessions", tags=["protected"], dependencies=[Depends(require_sessions)])
+def read_sessions(current_user: dict = authenticated_user("/sessions")):
+    """
+    Sessions actives de l'utilisateur connecté (mode sessions opaques)
+    
+    Returns:
+        list: id, scopes, created_at, expires_at de chaque session
+    
+    Raises:
+        HTTPException(400): Si les sessions opaques sont désactivées
+    """
+    return [
+        {**session, "data": {"scope": " ".join(scope_matcher.decode(session["data"]["scp"]))}}
+        for session in session_store.list_sessions(current_user["username"])
+    ]
+
+
+@app.get("/metrics", tags=["monitoring"])
+def read_metrics():
+    """
+    Métriques internes de l'API
+
+    Returns:
+        dict: Retard de la boucle d'événements et état du pool KDF
+    """
+    return {
+        "event_loop": loop_monitor.snapshot(),
+        "kdf": kdf_limiter.snapshot(),
+        "verify_coalescing": verify_flight.snapshot(),
+        "user_cache": user_cache.snapshot(),
+        "user_reload": [source.snapshot() for source in reloadable_sources],
+        "state_backend": {"shared": state_backend.shared},
+        "sessions": session_store.snapshot() if session_store is not None else None,
+        "signing_keys": keyring.snapshot(),
+        "token_expiry": token_expiry.snapshot(),
+        "websockets": sockets.snapshot(),
+        "credential_stuffing": stuffing.snapshot() if stuffing is not None else None,
+    }
+
+
+@app.get("/healthz", tags=["monitoring"])
+async def read_health():
+    """
+    Liveness: le processus répond (sans dépendance ni authentification)
+
+    Returns:
+        dict: {"status": "ok"}
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz", tags=["monitoring"])
+async def read_readiness():
+    """
+    Readiness: le worker peut recevoir du trafic
+
+    Returns:
+        JSONResponse: 200 une fois le préchauffage terminé, 503 avant, avec
+        la durée de chaque étape
     """
-    return User(
-        username=current_user["username"],
-        name=current_user["name"],
-        email=current_user["email"],
-        resource=current_user["resource"]
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if warmup.ready else "starting", "warmup": warmup.snapshot()},
     )
 
 
@@ -51,7 +51,7 @@ def test_public_route():
             print_success(f"Status {response.status_code}")
             data = response.json()
             print(f"Message: {data['message']}")
-            print(f"Users disponibles: {', '.join(data['users'])}")
+            print(f"Utilisateurs par source: {data['user_counts']}")
             print(f"Endpoints: {json.dumps(data['endpoints'], indent=2)}")
         else:
             print_error(f"Status {response.status_code} (Attendu: 200)")
@@ -316,6 +316,32 @@ def test_form_vs_json():
         print(f"{INFO}: {e}")
 
 
+def test_scopes():
+    """Test 11: Token limité au scope 'profile'"""
+    print_header("11: Scopes OAuth2 (profile seulement)")
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/token",
+            data={**TEST_USERS[0], "scope": "profile"}
+        )
+        data = response.json()
+        print(f"{INFO}: Scopes accordés: {data.get('scope')}")
+        headers = {"Authorization": f"Bearer {data['access_token']}"}
+        
+        me = requests.get(f"{BASE_URL}/me", headers=headers)
+        secured = requests.get(f"{BASE_URL}/secured", headers=headers)
+        
+        if me.status_code == 200 and secured.status_code == 403:
+            print(f"{SUCCESS}: /me autorisé (200), /secured refusé (403)")
+            print(f"   WWW-Authenticate: {secured.headers.get('WWW-Authenticate')}")
+        else:
+            print(f"{FAIL}: /me {me.status_code}, /secured {secured.status_code}")
+    
+    except Exception as e:
+        print(f"{FAIL}: Erreur: {e}")
+
+
 def main():
     """Lance tous les tests"""
     print("\n")
@@ -344,6 +370,9 @@ def main():
     # Route /me
     test_me_route(tokens)
     
+    # Scopes
+    test_scopes()
+    
     # Analyse JWT
     test_decode_jwt(tokens)
     
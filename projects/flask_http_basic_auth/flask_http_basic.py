@@ -1,10 +1,77 @@
-from flask import Flask
+import itertools
+import os
+import secrets
+import sys
+
+from flask import Flask, g, jsonify, request
 from flask_httpauth import HTTPBasicAuth
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Rendre le package partagé auth_common importable (racine du dépôt)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from auth_common import hash_wrap
+from auth_common.compact_users import CompactUserTable
+from auth_common.rbac import RoleModel, RoleRequirement
+from auth_common.signed_cookie import CookieSigner
+from auth_common.stuffing_detector import StuffingBlocked, StuffingDetector
+from auth_common.user_cache import UserCache
+from auth_common.user_reloader import ReloadableUsers
+from auth_common.user_store import UserStore
+from auth_common.warmup import Warmup
+
+# Hiérarchie des rôles: admin implique user
+ROLE_HIERARCHY = {
+    'admin': ['user'],
+    'user': [],
+}
+role_model = RoleModel(ROLE_HIERARCHY)
+
+
+class CompiledRoleAuth(HTTPBasicAuth):
+    """
+    HTTPBasicAuth dont les contrôles de rôles sont compilés en bitsets.
+    
+    login_required(role=...) compile l'exigence une seule fois, à la
+    décoration de la route; à chaque requête, l'autorisation se résume à un
+    ET binaire entre le masque de l'utilisateur et le masque exigé.
+    """
+
+    def login_required(self, f=None, role=None, optional=None):
+        if role is not None:
+            role = role_model.compile(role)
+        return super().login_required(f, role=role, optional=optional)
+
+    def authorize(self, role, user, auth):
+        if not isinstance(role, RoleRequirement):
+            return super().authorize(role, user, auth)
+        return role.allows(get_user_mask(user))
+
+
 # Instanciation de l'API Flask et de l'authentification HTTP Basic
 api = Flask(import_name='my_api')
-auth = HTTPBasicAuth()
+auth = CompiledRoleAuth()
+
+# Mode optionnel: après une authentification Basic réussie, un cookie signé
+# (username + rôles, durée courte) évite de recalculer le hash du mot de passe
+# à chaque requête. Activer avec BASIC_SESSION_COOKIE=1.
+# Avec plusieurs workers, définir SECRET_KEY pour partager la clé de signature.
+SESSION_COOKIE_ENABLED = os.environ.get('BASIC_SESSION_COOKIE', '0') == '1'
+SESSION_COOKIE_NAME = 'basic_session'
+SESSION_COOKIE_TTL = 300  # secondes
+cookie_signer = CookieSigner(os.environ.get('SECRET_KEY') or secrets.token_hex(32), SESSION_COOKIE_TTL)
+
+# Détection du credential stuffing (auth_common/stuffing_detector.py): un
+# client qui essaie plus de STUFFING_THRESHOLD usernames distincts par fenêtre
+# de STUFFING_WINDOW secondes est refusé (429) avant le hash du
+# mot de passe (le cookie de session valide ne compte pas)
+STUFFING_THRESHOLD = int(os.environ.get('STUFFING_THRESHOLD', '50'))
+STUFFING_WINDOW = float(os.environ.get('STUFFING_WINDOW', '600'))
+stuffing = StuffingDetector(STUFFING_THRESHOLD, STUFFING_WINDOW) if STUFFING_THRESHOLD > 0 else None
+
+# Préchauffage au démarrage (hash, cookie signé, cache des utilisateurs), voir /readyz
+warmup = Warmup()
+WARMUP_PRELOAD_USERS = 1000  # utilisateurs chargés dans user_cache au démarrage
 
 # Base de données des utilisateurs avec mots de passe hachés
 users = {
@@ -20,23 +87,156 @@ users = {
     }
 }
 
+# Représentation compacte des utilisateurs en mémoire (grands annuaires,
+# environ 9 fois moins de mémoire qu'un dict de dicts): COMPACT_USERS=1
+COMPACT_USERS = os.environ.get('COMPACT_USERS', '0') == '1'
+if COMPACT_USERS:
+    compact_users = CompactUserTable('password', text_fields=('private',), interned_fields=('role',))
+    compact_users.update(users)
+    users = compact_users
+
+# Fichier d'utilisateurs optionnel (JSON {username: utilisateur}), prioritaire
+# sur users et rechargé à chaud quand il change
+USERS_FILE = os.environ.get('USERS_FILE')
+users_file = ReloadableUsers(USERS_FILE) if USERS_FILE else None
+
+# Snapshot mmap optionnel (build_user_snapshot.py), en lecture seule: ses pages
+# sont partagées par tous les workers. Rechargé à chaud quand il est reconstruit.
+USER_SNAPSHOT_PATH = os.environ.get('USER_SNAPSHOT_PATH')
+user_snapshot = ReloadableUsers(USER_SNAPSHOT_PATH) if USER_SNAPSHOT_PATH else None
+
+reloadable_sources = [source for source in (users_file, user_snapshot) if source is not None]
+
+# Stockage persistant optionnel (utilisateurs importés par provision_users.py),
+# consulté pour les usernames absents de users
+USER_STORE_PATH = os.environ.get('USER_STORE_PATH')
+user_store = UserStore(USER_STORE_PATH, hash_field='password') if USER_STORE_PATH else None
+
+
+def load_user(username):
+    """
+    Lit un utilisateur dans le fichier d'utilisateurs, users, le snapshot
+    puis le stockage persistant
+    """
+    user = users_file.get(username) if users_file is not None else None
+    if user is None:
+        user = users.get(username)
+    if user is None and user_snapshot is not None:
+        user = user_snapshot.get(username)
+    if user is None and user_store is not None:
+        user = user_store.get(username)
+    return user
+
+
+# Cache de lecture devant la base des utilisateurs (TTL, cache négatif des
+# usernames inconnus). Appeler user_cache.invalidate(username) après toute
+# modification de users.
+user_cache = UserCache(load_user)
+# Un rechargement vide le cache des utilisateurs
+for source in reloadable_sources:
+    source.subscribe(user_cache.clear)
+
+
+@warmup.step('hash_verifier')
+def warm_hash_verifier():
+    """Premier calcul pbkdf2 de werkzeug (hash et vérification)"""
+    hash_wrap.verify('warmup', generate_password_hash('warmup'), lambda pw, hashed: check_password_hash(hashed, pw))
+
+
+@warmup.step('token_codec')
+def warm_token_codec():
+    """Signe et vérifie un cookie de session"""
+    cookie_signer.verify(cookie_signer.sign('warmup', ['user']))
+
+
+@warmup.step('user_cache')
+def warm_user_cache():
+    """Charge les premiers utilisateurs de users dans user_cache"""
+    user_cache.preload(itertools.islice(users, WARMUP_PRELOAD_USERS))
+
+
+def _role_list(roles):
+    """Rôles d'un utilisateur ou d'un cookie sous forme de liste (str, liste ou tuple interné)"""
+    return [roles] if isinstance(roles, str) else list(roles)
+
 
 @auth.verify_password
 def verify_password(username, password):
     """
     Vérifie les informations d'identification de l'utilisateur.
     
+    En mode cookie de session, une requête sans en-tête Authorization est
+    authentifiée par un cookie signé valide: une vérification HMAC et une
+    lecture de user_cache au lieu du hash du mot de passe. L'utilisateur doit
+    toujours exister avec les rôles portés par le cookie (un utilisateur
+    supprimé ou dont les rôles ont changé doit se reconnecter). Des
+    credentials Basic envoyés sont toujours vérifiés, cookie ou non; un
+    login réussi programme l'envoi d'un nouveau cookie (voir
+    set_session_cookie).
+    
     Args:
         username (str): Le nom d'utilisateur fourni
         password (str): Le mot de passe en clair fourni
     
     Returns:
         str or None: Le nom d'utilisateur si les credentials sont valides, None sinon
+    
+    Raises:
+        StuffingBlocked: Si le client essaie trop de usernames distincts (réponse 429)
     """
-    if username in users and check_password_hash(users.get(username)['password'], password):
+    if SESSION_COOKIE_ENABLED and 'Authorization' not in request.headers:
+        session = cookie_signer.verify(request.cookies.get(SESSION_COOKIE_NAME))
+        if session:
+            user = user_cache.get(session['u'])
+            if user is not None and _role_list(user['role']) == _role_list(session['r']):
+                g.session_roles = session['r']
+                return session['u']
+        return None
+
+    if stuffing is not None and username:
+        stuffing.check(request.remote_addr or '', username)
+    user = user_cache.get(username)
+    if user and hash_wrap.verify(password, user['password'], lambda pw, hashed: check_password_hash(hashed, pw)):
+        if SESSION_COOKIE_ENABLED:
+            g.issue_session_for = username
         return username
 
 
+@api.errorhandler(StuffingBlocked)
+def stuffing_blocked(exc):
+    """
+    Répond 429 + Retry-After à un client qui essaie trop de usernames distincts
+    (credential stuffing), sans calculer de hash.
+    """
+    response = jsonify({'msg': 'Too many login attempts from this client, retry later'})
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response, 429
+
+
+@api.after_request
+def set_session_cookie(response):
+    """
+    Ajoute le cookie de session signé après une authentification Basic réussie.
+    
+    Args:
+        response: La réponse Flask
+    
+    Returns:
+        La réponse, avec l'en-tête Set-Cookie si un cookie doit être émis
+    """
+    username = g.pop('issue_session_for', None)
+    if username is not None and response.status_code < 400:
+        response.set_cookie(
+            SESSION_COOKIE_NAME,
+            cookie_signer.sign(username, user_cache.get(username)['role']),
+            max_age=SESSION_COOKIE_TTL,
+            httponly=True,
+            secure=request.is_secure,
+            samesite='Lax',
+        )
+    return response
+
+
 @auth.get_user_roles
 def get_user_roles(user):
     """
@@ -48,7 +248,30 @@ def get_user_roles(user):
     Returns:
         list or str: La liste des rôles de l'utilisateur
     """
-    return users.get(user)['role']
+    # Rôles portés par le cookie de session: pas de lecture de la base
+    if 'session_roles' in g:
+        return g.session_roles
+    return user_cache.get(user)['role']
+
+
+def get_user_mask(user):
+    """
+    Récupère le masque de rôles (hiérarchie développée) d'un utilisateur.
+    
+    Calculé à chaque requête à partir de l'utilisateur lu dans user_cache
+    (role_model.mask met en cache le masque de chaque combinaison de rôles):
+    un changement de rôle suivi de user_cache.invalidate() s'applique
+    immédiatement.
+    
+    Args:
+        user (str): Le nom d'utilisateur
+    
+    Returns:
+        int: Bitset des rôles de l'utilisateur
+    """
+    if 'session_roles' in g:
+        return role_model.mask(g.session_roles)
+    return role_model.mask(get_user_roles(user))
 
 
 @api.route('/admin')
@@ -117,7 +340,51 @@ def private():
     - HTTPException(401, detail="Unauthorized"): Si l'utilisateur n'est pas authentifié 
       ou n'a pas le rôle 'user', une exception HTTP 401 Unauthorized est levée.
     """
-    return "Resource : {}".format(users[auth.current_user()]['private'])
+    return "Resource : {}".format(user_cache.get(auth.current_user())['private'])
+
+
+@api.route('/metrics')
+def metrics():
+    """
+    Métriques internes (non protégées, à ne pas exposer publiquement).
+    
+    Returns:
+    - JSON: Statistiques du cache des utilisateurs, des rechargements à chaud
+      et détection du credential stuffing
+    """
+    return jsonify({
+        "user_cache": user_cache.snapshot(),
+        "user_reload": [source.snapshot() for source in reloadable_sources],
+        "credential_stuffing": stuffing.snapshot() if stuffing is not None else None,
+    })
+
+
+@api.route('/healthz')
+def healthz():
+    """
+    Liveness: le processus répond (sans dépendance ni authentification).
+    
+    Returns:
+    - JSON: {"status": "ok"}
+    """
+    return jsonify({"status": "ok"})
+
+
+@api.route('/readyz')
+def readyz():
+    """
+    Readiness: le worker peut recevoir du trafic.
+    
+    Returns:
+    - JSON: 200 une fois le préchauffage terminé, 503 avant, avec la durée
+      de chaque étape
+    """
+    body = {"status": "ready" if warmup.ready else "starting", "warmup": warmup.snapshot()}
+    return jsonify(body), 200 if warmup.ready else 503
+
+
+# Préchauffage en arrière-plan dès le chargement de l'application
+warmup.start()
 
 
 if __name__ == '__main__':
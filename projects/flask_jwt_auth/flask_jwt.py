@@ -1,11 +1,33 @@
 from flask import Flask
+from flask import Response
+from flask import g
 from flask import jsonify
 from flask import request
 from datetime import timedelta
+import itertools
+import math
+import os
+import sys
+import time
 
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, JWTManager
+from flask_jwt_extended import create_access_token, decode_token, get_jwt, get_jwt_identity, jwt_required, JWTManager
 from passlib.context import CryptContext
 
+# Rendre le package partagé auth_common importable (racine du dépôt)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from auth_common import hash_wrap
+from auth_common.compact_users import CompactUserTable
+from auth_common.stuffing_detector import StuffingBlocked, StuffingDetector
+from auth_common.token_expiry import REFRESH_HEADER, ExpiryPolicy
+from auth_common.keyring import create_keyring
+from auth_common.state import create_backend
+from auth_common.user_cache import UserCache
+from auth_common.user_pages import DEFAULT_PAGE_SIZE, UserDirectory
+from auth_common.user_reloader import ReloadableUsers
+from auth_common.user_store import UserStore
+from auth_common.warmup import Warmup
+
 # Configuration du contexte de hachage des mots de passe
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
@@ -27,6 +49,59 @@ users_db = {
     }
 }
 
+# Représentation compacte des utilisateurs en mémoire (grands annuaires,
+# environ 9 fois moins de mémoire qu'un dict de dicts): COMPACT_USERS=1
+COMPACT_USERS = os.environ.get("COMPACT_USERS", "0") == "1"
+if COMPACT_USERS:
+    compact_users = CompactUserTable("hashed_password", text_fields=("username", "name", "email"),
+                                     interned_fields=("resource",))
+    compact_users.update(users_db)
+    users_db = compact_users
+
+# Fichier d'utilisateurs optionnel (JSON {username: utilisateur}), prioritaire
+# sur users_db et rechargé à chaud quand il change
+USERS_FILE = os.environ.get("USERS_FILE")
+users_file = ReloadableUsers(USERS_FILE) if USERS_FILE else None
+
+# Snapshot mmap optionnel (build_user_snapshot.py), en lecture seule: ses pages
+# sont partagées par tous les workers. Rechargé à chaud quand il est reconstruit.
+USER_SNAPSHOT_PATH = os.environ.get("USER_SNAPSHOT_PATH")
+user_snapshot = ReloadableUsers(USER_SNAPSHOT_PATH) if USER_SNAPSHOT_PATH else None
+
+reloadable_sources = [source for source in (users_file, user_snapshot) if source is not None]
+
+# Stockage persistant optionnel (utilisateurs importés par provision_users.py),
+# consulté pour les usernames absents de users_db
+USER_STORE_PATH = os.environ.get("USER_STORE_PATH")
+user_store = UserStore(USER_STORE_PATH) if USER_STORE_PATH else None
+
+# Toutes les sources d'utilisateurs, parcourues par ordre de username (GET /users)
+user_directory = UserDirectory({
+    "file": users_file, "builtin": users_db, "snapshot": user_snapshot, "store": user_store,
+})
+
+
+def load_user(username):
+    """
+    Lit un utilisateur dans le fichier d'utilisateurs, users_db, le snapshot
+    puis le stockage persistant
+    """
+    user = users_file.get(username) if users_file is not None else None
+    if user is None:
+        user = users_db.get(username)
+    if user is None and user_snapshot is not None:
+        user = user_snapshot.get(username)
+    if user is None and user_store is not None:
+        user = user_store.get(username)
+    return user
+
+
+# Cache de lecture devant users_db (TTL, cache négatif des usernames inconnus).
+# Appeler user_cache.invalidate(username) après toute modification de users_db.
+user_cache = UserCache(load_user)
+for source in reloadable_sources:
+    source.subscribe(user_cache.clear)
+
 # Instanciation de l'API Flask
 api = Flask(import_name="my_api")
 
@@ -35,10 +110,72 @@ api = Flask(import_name="my_api")
 api.config["JWT_SECRET_KEY"] = "edc30d44e02ebfc88f2ea5060aef05d4a6f028f284d8d9f4cd3b2d03c195af09"
 api.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=30)
 
+# Durée des tokens tirée au hasard (jusqu'à -10 %) pour étaler les
+# reconnexions, et en-tête X-Token-Expires-In sur les routes protégées dans
+# les 20 derniers % de la durée (voir auth_common/token_expiry.py)
+TOKEN_EXPIRY_JITTER = float(os.environ.get("TOKEN_EXPIRY_JITTER", "0.1"))
+TOKEN_REFRESH_WINDOW = float(os.environ.get("TOKEN_REFRESH_WINDOW", "0.2"))
+token_expiry = ExpiryPolicy(api.config["JWT_ACCESS_TOKEN_EXPIRES"].total_seconds(),
+                            TOKEN_EXPIRY_JITTER, TOKEN_REFRESH_WINDOW)
+
+# Détection du credential stuffing (auth_common/stuffing_detector.py): un
+# client qui essaie plus de STUFFING_THRESHOLD usernames distincts par fenêtre
+# de STUFFING_WINDOW secondes est refusé (429) sur /login, avant le
+# hash du mot de passe
+STUFFING_THRESHOLD = int(os.environ.get("STUFFING_THRESHOLD", "50"))
+STUFFING_WINDOW = float(os.environ.get("STUFFING_WINDOW", "600"))
+stuffing = StuffingDetector(STUFFING_THRESHOLD, STUFFING_WINDOW) if STUFFING_THRESHOLD > 0 else None
+
+# État partagé entre workers (auth_common/state.py): révocations des tokens
+# (POST /logout), visibles par tous les workers et toutes les instances avec
+# STATE_BACKEND_URL=redis://... (mémoire du processus par défaut)
+STATE_BACKEND_URL = os.environ.get("STATE_BACKEND_URL", "memory://")
+state_backend = create_backend(STATE_BACKEND_URL)
+REVOKED_PREFIX = "revoked:"  # revoked:<jti>, expire avec le token
+
 # Initialisation du gestionnaire JWT
 jwt = JWTManager(api)
 
 
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    """Token révoqué par POST /logout (sur n'importe quel worker)"""
+    return state_backend.get(REVOKED_PREFIX + jwt_payload["jti"]) is not None
+
+# Trousseau de clés de signature: kid dans l'en-tête des tokens, rotation sans
+# redémarrage via le fichier JWT_KEYS_FILE (sinon, clé unique JWT_SECRET_KEY)
+keyring = create_keyring(os.environ.get("JWT_KEYS_FILE"), default_secret=api.config["JWT_SECRET_KEY"])
+
+
+@jwt.additional_headers_loader
+def signing_key_header(identity):
+    """
+    En-tête kid des nouveaux tokens.
+    
+    La clé active est lue une fois et gardée pour signing_key (appelé ensuite
+    par flask_jwt_extended): un rechargement du trousseau entre les deux ne
+    peut pas produire un kid et une signature de clés différentes.
+    """
+    g.signing_key = keyring.active_key()
+    return {"kid": g.signing_key[0]}
+
+
+@jwt.encode_key_loader
+def signing_key(identity):
+    """Secret de la clé active (choisie par signing_key_header)"""
+    return g.signing_key[1]
+
+
+@jwt.decode_key_loader
+def verification_key(jwt_header, jwt_payload):
+    """Secret du kid du token (clé "default" pour un token sans kid)"""
+    return keyring.secret(jwt_header.get("kid"))
+
+# Préchauffage au démarrage (hash, JWT, cache des utilisateurs), voir /readyz
+warmup = Warmup()
+WARMUP_PRELOAD_USERS = 1000  # utilisateurs chargés dans user_cache au démarrage
+
+
 def check_password(plain_password, hashed_password):
     """
     Vérifie si un mot de passe en clair correspond au hash stocké.
@@ -50,13 +187,16 @@ def check_password(plain_password, hashed_password):
     Returns:
         bool: True si le mot de passe correspond, False sinon
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return hash_wrap.verify(plain_password, hashed_password, pwd_context.verify)
 
 
 def get_user(database, username):
     """
     Récupère un utilisateur depuis la base de données.
     
+    Les lectures de users_db passent par user_cache (y compris les
+    usernames inconnus, mémorisés comme absents quelques secondes).
+    
     Args:
         database (dict): Base de données des utilisateurs
         username (str): Nom d'utilisateur à rechercher
@@ -64,11 +204,43 @@ def get_user(database, username):
     Returns:
         dict or None: Dictionnaire de l'utilisateur si trouvé, None sinon
     """
+    if database is users_db:
+        return user_cache.get(username)
     if username in database:
         user_dict = database[username]
         return user_dict
 
 
+@warmup.step("hash_verifier")
+def warm_hash_verifier():
+    """Sélectionne le backend pbkdf2 de passlib (hash et vérification)"""
+    check_password("warmup", pwd_context.hash("warmup"))
+
+
+@warmup.step("token_codec")
+def warm_token_codec():
+    """Prépare la clé et l'algorithme JWT (encodage et décodage)"""
+    with api.app_context():
+        decode_token(create_access_token(identity="warmup"))
+
+
+@warmup.step("user_cache")
+def warm_user_cache():
+    """Charge les premiers utilisateurs de users_db dans user_cache"""
+    user_cache.preload(itertools.islice(users_db, WARMUP_PRELOAD_USERS))
+
+
+@api.errorhandler(StuffingBlocked)
+def stuffing_blocked(exc):
+    """
+    Répond 429 + Retry-After à un client qui essaie trop de usernames distincts
+    (credential stuffing), sans calculer de hash.
+    """
+    response = jsonify({"msg": "Too many login attempts from this client, retry later"})
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response, 429
+
+
 @api.route("/login", methods=["POST"])
 def login():
     """
@@ -93,6 +265,8 @@ def login():
         JSONResponse({"msg": "Bad username or password"}, status_code=401): 
             Si l'authentification échoue en raison d'un mauvais nom 
             d'utilisateur ou d'un mot de passe.
+        StuffingBlocked: Si le client essaie trop de usernames distincts
+            (réponse 429 avec Retry-After).
     
     Exemple:
         curl -X POST -H "Content-Type: application/json" \\
@@ -102,16 +276,72 @@ def login():
     username = request.json.get("username", None)
     password = request.json.get("password", None)
     
+    # Refuser un client qui essaie trop de usernames distincts, avant tout calcul
+    if stuffing is not None and username:
+        stuffing.check(request.remote_addr or "", str(username))
+
     # Vérifier l'utilisateur et le mot de passe
     user = get_user(users_db, username)
     if not user or not check_password(password, user['hashed_password']):
         return jsonify({"msg": "Bad username or password"}), 401
 
-    # Créer le token JWT avec l'identité de l'utilisateur
-    access_token = create_access_token(identity=username)
+    # Créer le token JWT avec l'identité de l'utilisateur (durée avec jitter:
+    # des clients connectés ensemble n'expirent pas ensemble)
+    access_token = create_access_token(identity=username,
+                                       expires_delta=timedelta(seconds=token_expiry.lifetime()))
     return jsonify(access_token=access_token)
 
 
+@api.route("/logout", methods=["POST"])
+@jwt_required()
+def logout():
+    """
+    Révoque le token courant.
+    
+    Description:
+    Le jti du token est écrit dans le backend d'état partagé jusqu'à
+    l'expiration du token: les requêtes suivantes avec ce token reçoivent 401
+    sur tous les workers (avec STATE_BACKEND_URL=redis://...).
+
+    Returns:
+        JSON: {"msg": "Token revoked"}
+
+    Raises:
+        Exception JWT: Si le jeton d'accès est absent, invalide ou déjà révoqué
+    
+    Exemple:
+        curl -X POST -H 'Authorization: Bearer <votre_token>' \\
+             http://127.0.0.1:5000/logout
+    """
+    claims = get_jwt()
+    ttl = max(1, math.ceil(claims["exp"] - time.time()))
+    state_backend.set(REVOKED_PREFIX + claims["jti"], "1", ttl=ttl)
+    return jsonify(msg="Token revoked"), 200
+
+
+@api.after_request
+def add_refresh_hint(response):
+    """
+    Ajoute l'en-tête X-Token-Expires-In aux réponses des routes protégées
+    quand le token entre dans sa fenêtre de renouvellement.
+    
+    Args:
+        response: Réponse de la route
+    
+    Returns:
+        Response: La réponse, avec l'en-tête si le token expire bientôt
+    """
+    try:
+        expires_at = get_jwt().get("exp")
+    except RuntimeError:
+        return response  # route sans @jwt_required
+    if expires_at is not None:
+        expires_in = token_expiry.refresh_hint(expires_at)
+        if expires_in is not None:
+            response.headers[REFRESH_HEADER] = str(expires_in)
+    return response
+
+
 @api.route("/user", methods=["GET"])
 @jwt_required()
 def get_current_user():
@@ -173,25 +403,112 @@ def get_resource():
     })
 
 
+@api.route("/users", methods=["GET"])
+@jwt_required()
+def list_users():
+    """
+    Liste des usernames par ordre alphabétique, une page à la fois.
+    
+    Description:
+    Les pages sont lues sur les index des sources (stockage SQLite: index de
+    la clé primaire) et envoyées en flux: l'annuaire n'est jamais chargé en
+    entier (voir auth_common/user_pages.py).
+
+    Args:
+        request.args["cursor"] (str): Curseur opaque renvoyé par la page
+                                      précédente (next_cursor), optionnel
+        request.args["limit"] (int): Taille de la page (100 par défaut)
+
+    Returns:
+        JSON en flux: {"users": [...], "next_cursor": "..." | null}
+
+    Raises:
+        JSONResponse({"msg": ...}, status_code=400): Curseur ou taille de page invalide
+        Exception JWT: Si le jeton d'accès est absent ou invalide
+    
+    Exemple:
+        curl -H 'Authorization: Bearer <votre_token>' 'http://127.0.0.1:5000/users?limit=2'
+    """
+    limit = request.args.get("limit", str(DEFAULT_PAGE_SIZE))
+    if not limit.isdigit():
+        return jsonify({"msg": "limit must be an integer"}), 400
+    try:
+        chunks = user_directory.page(request.args.get("cursor"), int(limit))
+    except ValueError as exc:
+        return jsonify({"msg": str(exc)}), 400
+    return Response(chunks, mimetype="application/json")
+
+
 @api.route("/")
 def index():
     """
     Route publique d'information sur l'API.
     
     Returns:
-        JSON: Informations sur l'API et les endpoints disponibles
+        JSON: Informations sur l'API, endpoints disponibles et nombre
+              d'utilisateurs par source (la liste est sur GET /users)
     """
     return jsonify({
         "message": "Flask JWT Authentication API",
         "endpoints": {
             "/login": "POST - Authenticate and get JWT token",
+            "/logout": "POST - Revoke the current token (requires JWT)",
             "/user": "GET - Get current user (requires JWT)",
-            "/resource": "GET - Get user resource (requires JWT)"
+            "/resource": "GET - Get user resource (requires JWT)",
+            "/users": "GET - Paginated user listing, ?cursor=&limit= (requires JWT)"
         },
-        "users": ["danieldatascientest", "johndatascientest"],
+        "user_counts": user_directory.counts(),
         "token_expiration": "30 minutes"
     })
 
 
+@api.route("/metrics")
+def metrics():
+    """
+    Métriques internes (non protégées, à ne pas exposer publiquement).
+    
+    Returns:
+        JSON: Statistiques du cache des utilisateurs, des rechargements à chaud,
+        du trousseau de clés de signature, réglages d'expiration, détection
+        du credential stuffing et backend d'état
+    """
+    return jsonify({
+        "user_cache": user_cache.snapshot(),
+        "user_reload": [source.snapshot() for source in reloadable_sources],
+        "signing_keys": keyring.snapshot(),
+        "token_expiry": token_expiry.snapshot(),
+        "credential_stuffing": stuffing.snapshot() if stuffing is not None else None,
+        "state_backend": {"shared": state_backend.shared},
+    })
+
+
+@api.route("/healthz")
+def healthz():
+    """
+    Liveness: le processus répond (sans dépendance ni authentification).
+    
+    Returns:
+        JSON: {"status": "ok"}
+    """
+    return jsonify({"status": "ok"})
+
+
+@api.route("/readyz")
+def readyz():
+    """
+    Readiness: le worker peut recevoir du trafic.
+    
+    Returns:
+        JSON: 200 une fois le préchauffage terminé, 503 avant, avec la durée
+              de chaque étape
+    """
+    body = {"status": "ready" if warmup.ready else "starting", "warmup": warmup.snapshot()}
+    return jsonify(body), 200 if warmup.ready else 503
+
+
+# Préchauffage en arrière-plan dès le chargement de l'application
+warmup.start()
+
+
 if __name__ == "__main__":
     api.run(debug=True, host='0.0.0.0', port=5001)
@@ -51,7 +51,7 @@ def test_public_route():
             print_success(f"Status {response.status_code}")
             data = response.json()
             print(f"Message: {data['message']}")
-            print(f"Users: {', '.join(data['users'])}")
+            print(f"Utilisateurs par source: {data['user_counts']}")
             print(f"Token expiration: {data['token_expiration']}")
         else:
             print_error(f"Status {response.status_code}")
@@ -271,6 +271,32 @@ def demo_jwt_cannot_be_modified(tokens):
     print(f"\n{GREEN} Conclusion: Le JWT est protégé contre les modifications !{RESET}")
 
 
+def test_logout():
+    """Test: Révocation d'un token (POST /logout)"""
+    print_test("TEST 9: Déconnexion - token révoqué (401 attendu ensuite)")
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/login",
+            json={"username": "danieldatascientest", "password": "datascientest"}
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        
+        response = requests.post(f"{BASE_URL}/logout", headers=headers)
+        if response.status_code == 200:
+            print_success(f"/logout: {response.json()}")
+        else:
+            print_error(f"/logout: Status {response.status_code}")
+        
+        response = requests.get(f"{BASE_URL}/user", headers=headers)
+        if response.status_code == 401:
+            print_success(f"/user après /logout: Status 401 ({response.json()['msg']})")
+        else:
+            print_error(f"/user après /logout: Status {response.status_code} (attendu: 401)")
+    except Exception as e:
+        print_error(f"/logout: {e}")
+
+
 if __name__ == "__main__":
     print("\n" + "" * 35)
     print("TESTS API FLASK JWT AUTHENTICATION")
@@ -288,6 +314,7 @@ if __name__ == "__main__":
             test_decode_jwt(tokens)
             test_jwt_structure(tokens)
             demo_jwt_cannot_be_modified(tokens)
+            test_logout()
         
         print_separator()
         print(f"{GREEN} TOUS LES TESTS TERMINÉS{RESET}")
@@ -0,0 +1,256 @@
+"""
+Provisioning en masse des utilisateurs (import CSV ou JSONL)
+
+Crée des milliers d'utilisateurs dans le stockage persistant des APIs
+(auth_common.user_store), au format de hash de chaque API:
+- flask-basic    - werkzeug generate_password_hash, champ "password"
+- flask-jwt      - passlib pbkdf2_sha256, champ "hashed_password"
+- fastapi-basic  - passlib pbkdf2_sha256, champ "hashed_password"
+- fastapi-oauth  - passlib pbkdf2_sha256, champ "hashed_password"
+
+Le hachage (volontairement lent) est réparti sur un pool de processus, un
+par cœur. Le fichier est lu en flux par lots: seuls quelques lots sont en
+mémoire à la fois, quelle que soit sa taille. Chaque lot est écrit dans
+une transaction qui avance aussi le checkpoint de l'import: relancer la
+même commande après un crash reprend après le dernier lot écrit.
+
+Format d'entrée:
+- CSV avec en-tête: username,password puis les autres champs
+  (ex: name,email,resource; role et scopes séparés par des espaces)
+- JSONL: un objet par ligne avec username, password et les autres champs
+
+Usage:
+    python provision_users.py users.csv --app fastapi-oauth --db users.db
+    python provision_users.py users.jsonl --app flask-basic --db users.db --workers 8
+
+Avec --breached (liste écrite par build_breached_passwords.py), les
+utilisateurs dont le mot de passe figure dans une fuite connue ne sont pas
+importés: leurs usernames sont listés à la fin de l'import.
+
+Les APIs lisent ensuite ce stockage avec USER_STORE_PATH=users.db.
+"""
+
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from auth_common.breached_passwords import BreachedPasswords
+from auth_common.user_store import UserStore
+
+# nom -> (schéma de hash, champ du hash dans les dicts utilisateurs de l'API)
+# fastapi-jwt n'est pas listée: elle conserve ses utilisateurs en mémoire sans hash.
+APPS = {
+    "flask-basic": ("werkzeug", "password"),
+    "flask-jwt": ("pbkdf2_sha256", "hashed_password"),
+    "fastapi-basic": ("pbkdf2_sha256", "hashed_password"),
+    "fastapi-oauth": ("pbkdf2_sha256", "hashed_password"),
+}
+
+# Champs CSV contenant une liste de valeurs séparées par des espaces
+LIST_FIELDS = ("role", "scopes")
+
+PROGRESS_INTERVAL = 2.0  # secondes
+
+# Listes de mots de passe compromis, projetées une fois par processus du pool
+_breached_lists = {}
+
+
+def hash_password(scheme: str, password: str) -> str:
+    """
+    Hache un mot de passe au format d'une API (appelé dans les processus du pool)
+
+    Args:
+        scheme: "werkzeug" ou "pbkdf2_sha256"
+        password: Mot de passe en clair
+
+    Returns:
+        str: Hash au format modular crypt de la bibliothèque de l'API
+    """
+    if scheme == "werkzeug":
+        from werkzeug.security import generate_password_hash
+        return generate_password_hash(password)
+    from passlib.hash import pbkdf2_sha256
+    return pbkdf2_sha256.hash(password)
+
+
+def breached_list(path: str) -> BreachedPasswords:
+    """Liste de mots de passe compromis du processus courant (ouverte au premier lot)"""
+    if path not in _breached_lists:
+        _breached_lists[path] = BreachedPasswords(path)
+    return _breached_lists[path]
+
+
+def hash_batch(scheme: str, records: list, breached_path: str = None) -> tuple:
+    """
+    Hache un lot d'utilisateurs (exécuté dans un processus du pool)
+
+    Args:
+        scheme: Schéma de hash de l'API
+        records: Dicts utilisateurs contenant "username" et "password"
+        breached_path: Liste de mots de passe compromis à refuser (optionnelle)
+
+    Returns:
+        tuple: (tuples (username, hash, attributs) prêts pour
+        UserStore.upsert_many, usernames refusés pour mot de passe compromis)
+    """
+    breached = breached_list(breached_path) if breached_path else None
+    rows = []
+    rejected = []
+    for record in records:
+        password = record.pop("password")
+        if breached is not None and breached.is_breached(password):
+            rejected.append(record["username"])
+            continue
+        rows.append((record["username"], hash_password(scheme, password), record))
+    return rows, rejected
+
+
+def read_records(path: str):
+    """
+    Lit les utilisateurs d'un fichier CSV ou JSONL, un par un
+
+    Args:
+        path: Chemin du fichier (.csv, sinon JSONL)
+
+    Yields:
+        dict: Utilisateur avec au moins "username" et "password"
+
+    Raises:
+        ValueError: Si un enregistrement n'a pas de username ou de mot de passe
+    """
+    with open(path, newline="", encoding="utf-8") as source:
+        if path.endswith(".csv"):
+            records = csv.DictReader(source)
+        else:
+            records = (json.loads(line) for line in source if line.strip())
+
+        for number, record in enumerate(records, start=1):
+            if not record.get("username") or not record.get("password"):
+                raise ValueError(f"{path}: enregistrement {number} sans username ou password")
+            for field in LIST_FIELDS:
+                if isinstance(record.get(field), str):
+                    record[field] = record[field].split()
+            yield {key: value for key, value in record.items() if value not in (None, "")}
+
+
+def batches(records, size: int, skip: int = 0):
+    """
+    Regroupe les enregistrements en lots, après avoir sauté les `skip` premiers
+
+    Yields:
+        tuple: (position après le lot, lot)
+    """
+    position = 0
+    batch = []
+    for record in records:
+        position += 1
+        if position <= skip:
+            continue
+        batch.append(record)
+        if len(batch) == size:
+            yield position, batch
+            batch = []
+    if batch:
+        yield position, batch
+
+
+def provision(path: str, app: str, store: UserStore, workers: int = None,
+              batch_size: int = 200, report=None, breached_path: str = None,
+              rejected: list = None) -> int:
+    """
+    Importe un fichier d'utilisateurs dans le stockage
+
+    Au plus 2 lots par processus sont en cours de hachage: la mémoire reste
+    constante et les cœurs ne restent pas inactifs pendant les écritures.
+    Les lots sont écrits dans l'ordre du fichier, ce qui rend le checkpoint
+    (nombre d'enregistrements traités) exact.
+
+    Args:
+        path: Fichier CSV ou JSONL
+        app: Clé de APPS (format de hash)
+        store: Stockage de destination
+        workers: Nombre de processus de hachage (défaut: nombre de cœurs)
+        batch_size: Utilisateurs par lot (et par transaction)
+        report: Fonction (traités, débit) appelée périodiquement
+        breached_path: Liste de mots de passe compromis (build_breached_passwords.py):
+                       les utilisateurs dont le mot de passe y figure ne sont pas importés
+        rejected: Liste complétée avec les usernames refusés (une reprise
+                  ne les signale pas de nouveau)
+
+    Returns:
+        int: Nombre d'utilisateurs écrits par cet appel (hors reprise)
+    """
+    scheme, _ = APPS[app]
+    workers = workers or os.cpu_count() or 1
+    checkpoint = f"provision:{app}:{os.path.abspath(path)}"
+    start_position = store.checkpoint(checkpoint)
+
+    written = 0
+    started = last_report = time.monotonic()
+    pending = collections.deque()
+
+    def write_oldest():
+        nonlocal written, last_report
+        position, future = pending.popleft()
+        rows, refused = future.result()
+        written += store.upsert_many(rows, checkpoint, position)
+        if rejected is not None:
+            rejected.extend(refused)
+        now = time.monotonic()
+        if report and now - last_report >= PROGRESS_INTERVAL:
+            report(start_position + written, written / (now - started))
+            last_report = now
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for position, batch in batches(read_records(path), batch_size, start_position):
+            pending.append((position, pool.submit(hash_batch, scheme, batch, breached_path)))
+            if len(pending) >= workers * 2:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    if report:
+        elapsed = time.monotonic() - started
+        report(start_position + written, written / elapsed if elapsed else 0.0)
+    return written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Crée en masse des utilisateurs à partir d'un fichier CSV ou JSONL"
+    )
+    parser.add_argument("input", help="Fichier .csv (avec en-tête) ou .jsonl")
+    parser.add_argument("--app", choices=sorted(APPS), required=True,
+                        help="API cible (détermine le format du hash)")
+    parser.add_argument("--db", required=True, help="Fichier SQLite du stockage (USER_STORE_PATH)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processus de hachage (défaut: nombre de cœurs)")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Utilisateurs par lot et par transaction")
+    parser.add_argument("--breached", default=None,
+                        help="Liste de mots de passe compromis à refuser (build_breached_passwords.py)")
+    return parser.parse_args(argv)
+
+
+def print_progress(done: int, rate: float):
+    print(f"\r{done} utilisateurs importés ({rate:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    user_store = UserStore(arguments.db, hash_field=APPS[arguments.app][1])
+    refused_usernames = []
+    provision(arguments.input, arguments.app, user_store,
+              workers=arguments.workers, batch_size=arguments.batch_size,
+              report=print_progress, breached_path=arguments.breached,
+              rejected=refused_usernames)
+    print(file=sys.stderr)
+    if refused_usernames:
+        print(f"{len(refused_usernames)} utilisateurs refusés (mot de passe compromis): "
+              f"{', '.join(refused_usernames[:20])}{' ...' if len(refused_usernames) > 20 else ''}")
+    print(f"{len(user_store)} utilisateurs dans {arguments.db}")
@@ -0,0 +1,138 @@
+"""
+Renforcement hors ligne des hashes du stockage des utilisateurs
+
+Enveloppe chaque hash du stockage (auth_common.user_store) dans une couche
+PBKDF2-HMAC-SHA256 au coût cible (auth_common.hash_wrap), sans connaître
+les mots de passe: les utilisateurs qui ne se reconnectent jamais atteignent
+eux aussi le coût cible. Les APIs vérifient les deux formats.
+
+Le stockage est parcouru en flux, par lots (pagination par rowid). Les lots
+sont enveloppés en parallèle sur un pool de processus, puis écrits dans
+l'ordre; chaque transaction avance le checkpoint: relancer la commande
+reprend après le dernier lot écrit. Les hashes déjà enveloppés et les
+formats non supportés sont laissés tels quels.
+
+Usage:
+    python wrap_hashes.py --db users.db
+    python wrap_hashes.py --db users.db --rounds 600000 --workers 8
+"""
+
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from auth_common import hash_wrap
+from auth_common.user_store import UserStore
+
+PROGRESS_INTERVAL = 2.0  # secondes
+
+
+def wrap_batch(rows: list, rounds: int) -> tuple:
+    """
+    Enveloppe un lot de hashes (exécuté dans un processus du pool)
+
+    Args:
+        rows: Tuples (rowid, username, password_hash)
+        rounds: Coût cible de la couche externe
+
+    Returns:
+        tuple: (remplacements (username, ancien, nouveau), nombre de hashes ignorés)
+    """
+    replacements = []
+    skipped = 0
+    for _, username, hashed in rows:
+        if hash_wrap.is_wrapped(hashed):
+            # Déjà enveloppé: on n'empile pas de 3e couche
+            skipped += 1
+            continue
+        try:
+            replacements.append((username, hashed, hash_wrap.wrap(hashed, rounds)))
+        except ValueError:
+            skipped += 1
+    return replacements, skipped
+
+
+def upgrade(store: UserStore, rounds: int = hash_wrap.DEFAULT_ROUNDS, workers: int = None,
+            batch_size: int = 200, report=None) -> dict:
+    """
+    Enveloppe tous les hashes du stockage
+
+    Args:
+        store: Stockage des utilisateurs
+        rounds: Coût cible de la couche externe
+        workers: Nombre de processus (défaut: nombre de cœurs)
+        batch_size: Hashes par lot et par transaction
+        report: Fonction (statistiques, débit) appelée périodiquement
+
+    Returns:
+        dict: Nombre de hashes enveloppés, ignorés et modifiés entre-temps
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint = f"wrap_hashes:{rounds}"
+    after = store.checkpoint(checkpoint)
+
+    stats = {"wrapped": 0, "skipped": 0, "changed": 0}
+    started = last_report = time.monotonic()
+    pending = collections.deque()
+
+    def write_oldest():
+        nonlocal last_report
+        position, future = pending.popleft()
+        replacements, skipped = future.result()
+        written = store.replace_hashes(replacements, checkpoint, position)
+        stats["wrapped"] += written
+        stats["changed"] += len(replacements) - written
+        stats["skipped"] += skipped
+        now = time.monotonic()
+        if report and now - last_report >= PROGRESS_INTERVAL:
+            report(stats, stats["wrapped"] / (now - started))
+            last_report = now
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = store.scan_hashes(after, batch_size)
+            if not rows:
+                break
+            after = rows[-1][0]
+            pending.append((after, pool.submit(wrap_batch, rows, rounds)))
+            if len(pending) >= workers * 2:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    if report:
+        elapsed = time.monotonic() - started
+        report(stats, stats["wrapped"] / elapsed if elapsed else 0.0)
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Enveloppe les hashes existants dans une couche KDF au coût cible"
+    )
+    parser.add_argument("--db", required=True, help="Fichier SQLite du stockage (USER_STORE_PATH)")
+    parser.add_argument("--rounds", type=int, default=hash_wrap.DEFAULT_ROUNDS,
+                        help="Tours PBKDF2-HMAC-SHA256 de la couche externe")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processus de calcul (défaut: nombre de cœurs)")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Hashes par lot et par transaction")
+    return parser.parse_args(argv)
+
+
+def print_progress(stats: dict, rate: float):
+    print(f"\r{stats['wrapped']} hashes enveloppés, {stats['skipped']} ignorés ({rate:.0f}/s)",
+          end="", file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    result = upgrade(UserStore(arguments.db), rounds=arguments.rounds,
+                     workers=arguments.workers, batch_size=arguments.batch_size,
+                     report=print_progress)
+    print(file=sys.stderr)
+    print(f"{result['wrapped']} enveloppés, {result['skipped']} ignorés, "
+          f"{result['changed']} modifiés pendant l'opération")